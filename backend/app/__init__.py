@@ -18,6 +18,47 @@ def create_app(config_class=Config):
     migrate.init_app(app, db)
     ma.init_app(app)
     
+    # Initialize outbound clients and Redis-backed services
+    from app.utils.pi_client import init_pi_client
+    from app.utils.redis_store import init_redis
+    from app.utils.leaderboard import init_leaderboard
+    from app.utils.catalog_cache import init_catalog_cache
+    from app.utils.quest_catalog import init_quest_catalog
+    from app.utils.etag import init_etags
+    from app.utils.current_user import init_current_user
+    from app.utils.events import init_events
+    from app.utils.progress_buffer import init_progress_buffer
+    from app.utils.activity import init_activity
+    from app.utils.idempotency import init_idempotency
+    init_pi_client(app)
+    init_redis(app)
+    init_leaderboard(db.session)
+    init_catalog_cache(app, db.session)
+    init_quest_catalog(app, db.session)
+    init_etags(db.session)
+    init_current_user(db.session)
+    init_events(app, db.session)
+    init_progress_buffer(app, db.session)
+    init_activity(app)
+    init_idempotency(db.session)
+    
+    # Per-request SQL statement counting and timing
+    from app.utils.instrumentation import init_instrumentation
+    init_instrumentation(app)
+    
+    # Prometheus request latency and pool metrics
+    from app.utils.metrics import init_metrics
+    init_metrics(app, db)
+    
+    # Per-user token buckets, checked after the timing hooks start so
+    # rejected requests are still measured
+    from app.utils.rate_limit import init_rate_limiting
+    init_rate_limiting(app)
+    
+    # Keep per-user transaction aggregates in step with the ledger
+    from app.models.transaction_aggregate import track_transaction_changes
+    track_transaction_changes(db.session)
+    
     # Configure CORS
     CORS(app, origins=["http://localhost:3000", "https://palace-of-quests.vercel.app"])
     
@@ -27,12 +68,16 @@ def create_app(config_class=Config):
     from app.api.quests import bp as quests_bp
     from app.api.marketplace import bp as marketplace_bp
     from app.api.transactions import bp as transactions_bp
+    from app.api.admin import bp as admin_bp
+    from app.api.events import bp as events_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(quests_bp, url_prefix='/api/quests')
     app.register_blueprint(marketplace_bp, url_prefix='/api/marketplace')
     app.register_blueprint(transactions_bp, url_prefix='/api/transactions')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(events_bp, url_prefix='/api/events')
     
     # Health check endpoint
     @app.route('/health')
@@ -0,0 +1,90 @@
+"""
+Live-ops administration endpoints
+"""
+
+from functools import wraps
+
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.extensions import db
+from app.models.reward_grant import RewardGrant
+from app.utils.errors import ValidationError
+from app.utils.validation import validate_reward_grant
+
+bp = Blueprint('admin', __name__)
+
+def admin_required(view):
+    """Restrict a view to the user ids listed in ADMIN_USER_IDS"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if get_jwt_identity() not in current_app.config.get('ADMIN_USER_IDS', ()):
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def _run_grant(reward_grant):
+    """Run a bounded number of chunks so the request stays short; resume for more"""
+    reward_grant.run(
+        chunk_size=current_app.config.get('REWARD_GRANT_CHUNK_SIZE', 1000),
+        max_chunks=current_app.config.get('REWARD_GRANT_REQUEST_CHUNKS')
+    )
+    return jsonify({
+        'success': True,
+        'reward_grant': reward_grant.to_dict()
+    }), 200 if reward_grant.status == 'completed' else 202
+
+@bp.route('/reward-grants', methods=['POST'])
+@jwt_required()
+@admin_required
+def create_reward_grant():
+    """Grant Pi and experience to every player matching a selector"""
+    try:
+        data = request.get_json()
+        if not data:
+            raise ValidationError("Request body is required")
+        
+        grant = validate_reward_grant(data)
+        reward_grant = RewardGrant.create(grant, created_by=get_jwt_identity())
+        
+        return _run_grant(reward_grant)
+        
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Reward grant failed'}), 500
+
+@bp.route('/reward-grants/<grant_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_reward_grant(grant_id):
+    """Get the progress of a reward grant"""
+    reward_grant = db.session.get(RewardGrant, grant_id)
+    if not reward_grant:
+        return jsonify({'error': 'Reward grant not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'reward_grant': reward_grant.to_dict()
+    }), 200
+
+@bp.route('/reward-grants/<grant_id>/resume', methods=['POST'])
+@jwt_required()
+@admin_required
+def resume_reward_grant(grant_id):
+    """Continue a reward grant from its last committed chunk"""
+    try:
+        reward_grant = db.session.get(RewardGrant, grant_id)
+        if not reward_grant:
+            return jsonify({'error': 'Reward grant not found'}), 404
+        
+        return _run_grant(reward_grant)
+        
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'Reward grant is being run elsewhere'}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Reward grant failed'}), 500
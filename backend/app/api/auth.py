@@ -3,14 +3,16 @@ Authentication endpoints for Pi Network integration
 """
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-import requests
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required
 from datetime import datetime
 
 from app.extensions import db
 from app.models.user import User
 from app.utils.validation import validate_pi_auth
 from app.utils.errors import ValidationError
+from app.utils.pi_client import get_pi_client
+from app.utils.current_user import get_current_user, get_current_claims
+from app.utils.activity import record_activity, load_last_active
 
 bp = Blueprint('auth', __name__)
 
@@ -45,6 +47,8 @@ def login():
             )
             db.session.add(user)
             db.session.commit()
+        elif record_activity(user.id):
+            load_last_active(user)
         else:
             # Update last active
             user.last_active = datetime.utcnow()
@@ -71,13 +75,12 @@ def login():
 def refresh():
     """Refresh access token"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_claims()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        new_token = create_access_token(identity=current_user_id)
+        new_token = create_access_token(identity=user.id)
         
         return jsonify({
             'success': True,
@@ -92,8 +95,7 @@ def refresh():
 def verify_token():
     """Verify current access token"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -109,25 +111,7 @@ def verify_token():
 def verify_pi_user(access_token):
     """Verify user with Pi Network API"""
     try:
-        from app.config import Config
-        
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(
-            f"{Config.PI_API_URL}/v2/me",
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
-            
+        return get_pi_client().verify(access_token)
     except Exception as e:
         print(f"Pi Network verification error: {e}")
         return None
-
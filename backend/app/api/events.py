@@ -0,0 +1,42 @@
+"""
+Server-Sent Events stream of the player's balance, level and quest changes
+"""
+
+from flask import Blueprint, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.utils.events import get_event_broker
+
+bp = Blueprint('events', __name__)
+
+@bp.route('/stream', methods=['GET'])
+@jwt_required()
+def stream_events():
+    """Push the current user's state changes as they commit"""
+    # Only the token identity is used, so the stream never touches the
+    # database and holds no connection while it waits for events
+    user_id = get_jwt_identity()
+    broker = get_event_broker()
+    heartbeat = current_app.config.get('EVENT_STREAM_HEARTBEAT_SECONDS', 15)
+    retry_ms = current_app.config.get('EVENT_STREAM_RETRY_MS', 3000)
+    
+    def stream():
+        subscription = broker.subscribe(user_id)
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            while True:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    # Comment lines keep proxies from timing out idle streams
+                    broker.ensure_listening()
+                    yield ": keepalive\n\n"
+                else:
+                    yield message
+        finally:
+            subscription.close()
+    
+    return current_app.response_class(
+        stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -7,43 +7,70 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 
 from app.extensions import db
-from app.models.user import User
 from app.models.quest import Quest
 from app.models.quest_progress import QuestProgress
 from app.models.user_quest import UserQuest
 from app.models.transaction import Transaction
 from app.utils.errors import ValidationError
+from app.utils.validation import validate_quest_progress_batch
+from app.utils.etag import conditional, mark_changed, user_scope
+from app.utils.current_user import get_current_user, get_current_claims
+from app.utils.idempotency import idempotent
+from app.utils.quest_catalog import get_quest_catalog
+from app.utils.progress_buffer import (
+    write_behind_enabled, buffer_increment, pending_increments, flush_user_progress,
+    record_direct_increments, forget_quest
+)
 
 bp = Blueprint('quests', __name__)
 
+def _buffer_quest_progress(user_id, quest_progress, quest, progress_increment):
+    """Add an increment to the write-behind buffer and build the progress response"""
+    progress, quest_completed, flushed = buffer_increment(
+        user_id, quest['id'], progress_increment, quest_progress.current_progress, quest['max_progress']
+    )
+    
+    # After a synchronous flush the row reloads with its written state
+    progress_data = quest_progress.to_dict()
+    if not flushed:
+        progress_data['current_progress'] = progress
+    
+    response_data = {
+        'success': True,
+        'quest_progress': progress_data,
+        'quest_completed': quest_completed
+    }
+    if quest_completed:
+        response_data['message'] = 'Quest completed! Claim your rewards.'
+    return response_data
+
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@conditional(lambda: ['quests', user_scope(get_jwt_identity())], bucket_seconds=60)
 def get_available_quests():
     """Get available quests for current user"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_claims()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get quests available for user's level
-        available_quests = Quest.query.filter(
-            Quest.is_active == True,
-            Quest.level_requirement <= user.level
-        ).all()
-        
-        # Get user's quest progress
-        user_quest_ids = [uq.quest_id for uq in user.user_quests.filter(
-            UserQuest.status.in_(['accepted', 'in_progress', 'completed'])
-        ).all()]
+        # Quests available at the user's level come from the in-process
+        # catalog; only the user's own quest state is read from the database
+        quests = get_quest_catalog().available_at(user.level)
+        user_quests = {
+            row.quest_id: row for row in db.session.query(
+                UserQuest.quest_id, UserQuest.status, UserQuest.accepted_at, UserQuest.completed_at
+            ).filter(UserQuest.user_id == user.id)
+        }
         
+        now = datetime.utcnow()
         quests_data = []
-        for quest in available_quests:
-            quest_data = quest.to_dict()
+        for quest in quests:
+            quest_data = dict(quest)
+            user_quest = user_quests.get(quest['id'])
             
             # Add user-specific information
-            user_quest = user.user_quests.filter_by(quest_id=quest.id).first()
             if user_quest:
                 quest_data['user_status'] = user_quest.status
                 quest_data['accepted_at'] = user_quest.accepted_at.isoformat()
@@ -53,9 +80,9 @@ def get_available_quests():
                 quest_data['can_accept'] = True
             
             # Check if quest is on cooldown
-            if quest.is_repeatable and user_quest and user_quest.completed_at:
-                cooldown_end = user_quest.completed_at + timedelta(hours=quest.cooldown_hours)
-                if datetime.utcnow() < cooldown_end:
+            if quest['is_repeatable'] and user_quest and user_quest.completed_at:
+                cooldown_end = user_quest.completed_at + timedelta(hours=quest['cooldown_hours'])
+                if now < cooldown_end:
                     quest_data['can_accept'] = False
                     quest_data['cooldown_ends_at'] = cooldown_end.isoformat()
             
@@ -74,18 +101,17 @@ def get_available_quests():
 def accept_quest(quest_id):
     """Accept a quest"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        quest = Quest.query.get(quest_id)
-        if not quest:
+        quest = get_quest_catalog().get(quest_id)
+        if not quest or not quest['is_active']:
             return jsonify({'error': 'Quest not found'}), 404
         
         # Check if user meets requirements
-        if user.level < quest.level_requirement:
+        if user.level < quest['level_requirement']:
             return jsonify({'error': 'Level requirement not met'}), 400
         
         # Check if quest is already accepted
@@ -94,18 +120,23 @@ def accept_quest(quest_id):
             return jsonify({'error': 'Quest already accepted'}), 400
         
         # Check cooldown for repeatable quests
-        if quest.is_repeatable and existing_user_quest and existing_user_quest.completed_at:
-            cooldown_end = existing_user_quest.completed_at + timedelta(hours=quest.cooldown_hours)
+        if quest['is_repeatable'] and existing_user_quest and existing_user_quest.completed_at:
+            cooldown_end = existing_user_quest.completed_at + timedelta(hours=quest['cooldown_hours'])
             if datetime.utcnow() < cooldown_end:
                 return jsonify({'error': 'Quest is on cooldown'}), 400
         
+        if write_behind_enabled():
+            # Buffered counters belong to the progress row about to be replaced;
+            # they are dropped only if the new rows commit
+            forget_quest(db.session, user.id, quest_id)
+        
         # Create user quest
         user_quest = UserQuest(
             user_id=user.id,
-            quest_id=quest.id,
+            quest_id=quest_id,
             status='accepted',
-            pi_reward_amount=quest.pi_reward,
-            experience_reward_amount=quest.experience_reward
+            pi_reward_amount=quest['pi_reward'],
+            experience_reward_amount=quest['experience_reward']
         )
         
         # Set expiration if needed (24 hours default)
@@ -114,7 +145,7 @@ def accept_quest(quest_id):
         # Create quest progress tracker
         quest_progress = QuestProgress(
             user_id=user.id,
-            quest_id=quest.id
+            quest_id=quest_id
         )
         
         db.session.add(user_quest)
@@ -136,8 +167,7 @@ def accept_quest(quest_id):
 def update_quest_progress(quest_id):
     """Update quest progress"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_claims()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -155,6 +185,15 @@ def update_quest_progress(quest_id):
         if not quest_progress:
             return jsonify({'error': 'Quest not found or not accepted'}), 404
         
+        # Plain increments are buffered in write-behind mode; the one that
+        # completes the quest is flushed before responding
+        write_behind = write_behind_enabled()
+        quest = get_quest_catalog().get(quest_id) if write_behind else None
+        if quest and not completion_data:
+            return jsonify(_buffer_quest_progress(user.id, quest_progress, quest, progress_increment)), 200
+        if write_behind:
+            flush_user_progress(user.id, wait=True)
+        
         # Update progress
         quest_completed = quest_progress.update_progress(progress_increment, completion_data)
         
@@ -171,6 +210,8 @@ def update_quest_progress(quest_id):
             user_quest.status = 'in_progress'
         
         db.session.commit()
+        if write_behind:
+            record_direct_increments(user.id, {quest_id: (progress_increment, completion_data)})
         
         response_data = {
             'success': True,
@@ -186,13 +227,74 @@ def update_quest_progress(quest_id):
     except Exception as e:
         return jsonify({'error': 'Failed to update quest progress'}), 500
 
+@bp.route('/progress/batch', methods=['POST'])
+@jwt_required()
+def update_quest_progress_batch():
+    """Apply many quest progress updates in a single transaction"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        data = request.get_json()
+        if not data:
+            raise ValidationError("Request body is required")
+        
+        from app.config import Config
+        batch = validate_quest_progress_batch(data, Config.QUEST_PROGRESS_BATCH_MAX)
+        
+        # Coalesce repeated quest ids so each row is written once
+        increments = {}
+        for entry in batch['updates']:
+            progress, completion_data = increments.get(entry['quest_id'], (0, {}))
+            completion_data.update(entry['completion_data'])
+            increments[entry['quest_id']] = (progress + entry['progress'], completion_data)
+        
+        # Buffered increments are written first so completion sees them
+        write_behind = write_behind_enabled()
+        if write_behind:
+            flush_user_progress(current_user_id, wait=True)
+        
+        results = QuestProgress.apply_increments(current_user_id, increments)
+        mark_changed(db.session, user_scope(current_user_id))
+        db.session.commit()
+        if write_behind:
+            record_direct_increments(current_user_id, increments)
+        
+        quests_data = []
+        for quest_id in increments:
+            if quest_id in results:
+                quests_data.append(results[quest_id])
+            else:
+                quests_data.append({
+                    'quest_id': quest_id,
+                    'error': 'Quest not found or not accepted'
+                })
+        
+        completed_quest_ids = [r['quest_id'] for r in results.values() if r['quest_completed']]
+        
+        response_data = {
+            'success': True,
+            'results': quests_data,
+            'completed_quests': completed_quest_ids
+        }
+        
+        if completed_quest_ids:
+            response_data['message'] = 'Quest completed! Claim your rewards.'
+        
+        return jsonify(response_data), 200
+        
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update quest progress'}), 500
+
 @bp.route('/<quest_id>/claim', methods=['POST'])
 @jwt_required()
+@idempotent
 def claim_quest_rewards(quest_id):
     """Claim quest completion rewards"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -208,16 +310,17 @@ def claim_quest_rewards(quest_id):
         if not user_quest.can_claim_rewards():
             return jsonify({'error': 'Cannot claim rewards for this quest'}), 400
         
+        # Flip the claimed flag first so concurrent claims pay out once
+        if not user_quest.mark_rewards_claimed():
+            return jsonify({'error': 'Cannot claim rewards for this quest'}), 400
+        
         # Award rewards
         pi_reward = float(user_quest.pi_reward_amount)
         exp_reward = user_quest.experience_reward_amount
         
-        user.add_pi(pi_reward)
+        user.add_pi(user_quest.pi_reward_amount)
         leveled_up = user.add_experience(exp_reward)
         
-        # Mark rewards as claimed
-        user_quest.rewards_claimed = True
-        
         # Create transaction record
         transaction = Transaction(
             user_id=user.id,
@@ -249,6 +352,7 @@ def claim_quest_rewards(quest_id):
         return jsonify(response_data), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': 'Failed to claim rewards'}), 500
 
 @bp.route('/my-quests', methods=['GET'])
@@ -256,23 +360,32 @@ def claim_quest_rewards(quest_id):
 def get_my_quests():
     """Get current user's accepted quests"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_claims()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
         status_filter = request.args.get('status', 'all')
         
-        query = user.user_quests
+        # Quest definition and progress are joined in so the whole list is
+        # served by one statement
+        query = db.session.query(UserQuest, Quest, QuestProgress).join(
+            Quest, Quest.id == UserQuest.quest_id
+        ).outerjoin(
+            QuestProgress,
+            db.and_(QuestProgress.user_id == UserQuest.user_id,
+                    QuestProgress.quest_id == UserQuest.quest_id)
+        ).filter(UserQuest.user_id == user.id)
+        
         if status_filter != 'all':
-            query = query.filter_by(status=status_filter)
+            query = query.filter(UserQuest.status == status_filter)
         
-        user_quests = query.all()
+        # Increments still in the write-behind buffer are added on top
+        pending = pending_increments(user.id) if write_behind_enabled() else {}
         
         quests_data = []
-        for user_quest in user_quests:
-            quest_data = user_quest.quest.to_dict()
+        for user_quest, quest, quest_progress in query.all():
+            quest_data = quest.to_dict()
             quest_data.update({
                 'user_quest_id': user_quest.id,
                 'status': user_quest.status,
@@ -284,13 +397,13 @@ def get_my_quests():
             })
             
             # Add progress information
-            quest_progress = QuestProgress.query.filter_by(
-                user_id=user.id,
-                quest_id=user_quest.quest_id
-            ).first()
-            
             if quest_progress:
-                quest_data['progress'] = quest_progress.to_dict()
+                progress_data = quest_progress.to_dict()
+                if pending.get(quest.id):
+                    progress_data['current_progress'] += pending[quest.id]
+                    if user_quest.status == 'accepted':
+                        quest_data['status'] = 'in_progress'
+                quest_data['progress'] = progress_data
             
             quests_data.append(quest_data)
         
@@ -2,130 +2,179 @@
 Transaction management endpoints
 """
 
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required
 from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
 
 from app.extensions import db
-from app.models.user import User
 from app.models.transaction import Transaction
+from app.models.transaction_aggregate import TransactionAggregate
 from app.utils.errors import ValidationError
+from app.utils.pagination import keyset_page
+from app.utils.serializers import (
+    TRANSACTION_PROJECTION, json_response, ndjson_lines, csv_lines, batched_bytes
+)
+from app.utils.current_user import get_current_user, get_current_claims
+from app.utils.idempotency import idempotent
 
 bp = Blueprint('transactions', __name__)
 
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv')
+}
+
+def _filtered_history(user_id):
+    """Projected transaction query with the history filters from the query string"""
+    query = TRANSACTION_PROJECTION.query().filter(Transaction.user_id == user_id)
+    
+    transaction_type = request.args.get('type')
+    status = request.args.get('status')
+    days = request.args.get('days', type=int)
+    
+    if transaction_type:
+        query = query.filter(Transaction.transaction_type == transaction_type)
+    if status:
+        query = query.filter(Transaction.status == status)
+    if days:
+        since_date = datetime.utcnow() - timedelta(days=days)
+        query = query.filter(Transaction.created_at >= since_date)
+    return query
+
 @bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_transaction_history():
     """Get user's transaction history"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_claims()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
         # Query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
-        transaction_type = request.args.get('type')
-        status = request.args.get('status')
-        days = request.args.get('days', type=int)
-        
-        # Build query
-        query = Transaction.query.filter(Transaction.user_id == user.id)
-        
-        # Apply filters
-        if transaction_type:
-            query = query.filter(Transaction.transaction_type == transaction_type)
-        if status:
-            query = query.filter(Transaction.status == status)
-        if days:
-            since_date = datetime.utcnow() - timedelta(days=days)
-            query = query.filter(Transaction.created_at >= since_date)
-        
-        # Order by most recent first
-        query = query.order_by(Transaction.created_at.desc())
-        
-        # Paginate
-        transactions = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
-        
-        transactions_data = [transaction.to_dict() for transaction in transactions.items]
-        
-        return jsonify({
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        cursor = request.args.get('cursor')
+        page = request.args.get('page', type=int)
+        
+        # Requests without a cursor keep the original page/total/pages
+        # contract; cursor pages skip the COUNT unless include_total=true
+        include_total = request.args.get('include_total', 'false' if cursor else 'true').lower() == 'true'
+        
+        # Build filtered query over just the serialized columns
+        query = _filtered_history(user.id)
+        
+        total = query.order_by(None).count() if include_total else None
+        
+        pagination = {'per_page': per_page}
+        
+        if page and page > 1 and not cursor:
+            # Legacy offset pagination for clients that still send ?page=
+            transactions = query.order_by(
+                Transaction.created_at.desc(), Transaction.id.desc()
+            ).offset((page - 1) * per_page).limit(per_page).all()
+            pagination['page'] = page
+        else:
+            # Keyset pagination on (created_at, id), newest first; the first
+            # page is also page 1 of the offset contract
+            transactions, next_cursor = keyset_page(
+                query, Transaction.created_at, Transaction.id, per_page, cursor
+            )
+            if not cursor:
+                pagination['page'] = 1
+            pagination['next_cursor'] = next_cursor
+            pagination['has_more'] = next_cursor is not None
+        
+        if total is not None:
+            pagination['total'] = total
+            if 'page' in pagination:
+                pagination['pages'] = -(-total // per_page)
+        
+        return json_response({
             'success': True,
-            'transactions': transactions_data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': transactions.total,
-                'pages': transactions.pages
-            }
-        }), 200
+            'transactions': TRANSACTION_PROJECTION.serialize(transactions),
+            'pagination': pagination
+        })
         
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to fetch transaction history'}), 500
 
-@bp.route('/summary', methods=['GET'])
+@bp.route('/export', methods=['GET'])
 @jwt_required()
-def get_transaction_summary():
-    """Get user's transaction summary and statistics"""
+def export_transactions():
+    """Stream the user's full filtered transaction history as NDJSON or CSV"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_claims()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Calculate summary statistics
-        total_earned = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user.id,
-            Transaction.transaction_type == 'quest_reward',
-            Transaction.status == 'completed'
-        ).scalar() or 0
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(f"Unsupported export format: {export_format}")
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        
+        # Rows are fetched through a server-side cursor and encoded one at a
+        # time, so memory stays flat however long the history is
+        batch_size = current_app.config.get('TRANSACTION_EXPORT_BATCH_SIZE', 1000)
+        rows = _filtered_history(user.id).order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()
+        ).yield_per(batch_size)
+        records = TRANSACTION_PROJECTION.iter_serialized(rows)
+        
+        if export_format == 'csv':
+            lines = csv_lines(TRANSACTION_PROJECTION.keys, records)
+        else:
+            lines = ndjson_lines(records)
+        
+        filename = f"transactions-{datetime.utcnow().strftime('%Y%m%d')}.{extension}"
+        return current_app.response_class(
+            stream_with_context(batched_bytes(lines, batch_size)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
         
-        total_spent = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user.id,
-            Transaction.transaction_type.in_(['item_purchase', 'premium_subscription']),
-            Transaction.status == 'completed'
-        ).scalar() or 0
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Failed to export transactions'}), 500
+
+@bp.route('/summary', methods=['GET'])
+@jwt_required()
+def get_transaction_summary():
+    """Get user's transaction summary and statistics"""
+    try:
+        user = get_current_user()
         
-        quest_rewards_count = Transaction.query.filter(
-            Transaction.user_id == user.id,
-            Transaction.transaction_type == 'quest_reward',
-            Transaction.status == 'completed'
-        ).count()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
-        items_purchased_count = Transaction.query.filter(
-            Transaction.user_id == user.id,
-            Transaction.transaction_type == 'item_purchase',
-            Transaction.status == 'completed'
-        ).count()
+        # Summary statistics come from the incrementally maintained aggregates
+        totals = TransactionAggregate.summarize(user.id)
         
         # Recent activity (last 7 days)
         week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_transactions = Transaction.query.filter(
+        recent_transactions = TRANSACTION_PROJECTION.query().filter(
             Transaction.user_id == user.id,
             Transaction.created_at >= week_ago
         ).order_by(Transaction.created_at.desc()).limit(10).all()
         
         summary = {
             'current_balance': float(user.pi_balance),
-            'total_earned': float(total_earned),
-            'total_spent': float(total_spent),
-            'net_balance': float(total_earned - total_spent),
-            'quest_rewards_received': quest_rewards_count,
-            'items_purchased': items_purchased_count,
-            'recent_activity': [transaction.to_dict() for transaction in recent_transactions]
+            'total_earned': totals['total_earned'],
+            'total_spent': totals['total_spent'],
+            'net_balance': round(totals['total_earned'] - totals['total_spent'], 2),
+            'quest_rewards_received': totals['quest_rewards_count'],
+            'items_purchased': totals['items_purchased_count'],
+            'recent_activity': TRANSACTION_PROJECTION.serialize(recent_transactions)
         }
         
-        return jsonify({
+        return json_response({
             'success': True,
             'summary': summary
-        }), 200
+        })
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch transaction summary'}), 500
@@ -135,8 +184,7 @@ def get_transaction_summary():
 def get_transaction_details(transaction_id):
     """Get detailed information about a specific transaction"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_claims()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -183,11 +231,11 @@ def get_transaction_details(transaction_id):
 
 @bp.route('/pi-deposit', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_pi_deposit():
     """Create a Pi Network deposit transaction"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -202,12 +250,8 @@ def create_pi_deposit():
         if amount <= 0:
             raise ValidationError('Amount must be positive')
         
-        # Check if payment ID already exists
-        existing_transaction = Transaction.query.filter_by(pi_payment_id=pi_payment_id).first()
-        if existing_transaction:
-            return jsonify({'error': 'Payment ID already processed'}), 400
-        
-        # Create pending transaction
+        # Create pending transaction; the unique pi_payment_id rejects a
+        # payment that was already processed, even by a concurrent retry
         transaction = Transaction(
             user_id=user.id,
             transaction_type='pi_deposit',
@@ -218,12 +262,16 @@ def create_pi_deposit():
         )
         
         db.session.add(transaction)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'Payment ID already processed'}), 400
         
         # In a real implementation, you would verify the payment with Pi Network API here
         # For now, we'll simulate successful verification
         
-        # Process the deposit
+        # Credit the balance in one conditional UPDATE
         user.add_pi(amount)
         transaction.mark_completed()
         
@@ -239,4 +287,5 @@ def create_pi_deposit():
     except ValidationError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': 'Deposit failed'}), 500
@@ -9,17 +9,23 @@ from datetime import datetime, timedelta
 from app.extensions import db
 from app.models.user import User
 from app.models.transaction import Transaction
+from app.models.transaction_aggregate import TransactionAggregate
 from app.utils.errors import ValidationError
+from app.utils.leaderboard import current_leaderboard, backfill_if_empty, BOARDS, DEFAULT_BOARD
+from app.utils.etag import conditional, user_scope
+from app.utils.current_user import get_current_user
+from app.utils.idempotency import idempotent
+from app.utils.activity import freshest, last_active_map, load_last_active
 
 bp = Blueprint('users', __name__)
 
 @bp.route('/profile', methods=['GET'])
 @jwt_required()
+@conditional(lambda: [user_scope(get_jwt_identity())])
 def get_profile():
     """Get current user profile"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -37,8 +43,7 @@ def get_profile():
 def update_profile():
     """Update user profile"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -77,11 +82,11 @@ def update_profile():
 
 @bp.route('/premium/subscribe', methods=['POST'])
 @jwt_required()
+@idempotent
 def subscribe_premium():
     """Subscribe to premium features"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -89,37 +94,35 @@ def subscribe_premium():
         from app.config import Config
         subscription_cost = Config.PREMIUM_SUBSCRIPTION_PRICE
         
-        if not user.can_afford(subscription_cost):
+        # Debit in one conditional UPDATE; refused if the balance is too low
+        if not user.deduct_pi(subscription_cost):
             return jsonify({'error': 'Insufficient Pi balance'}), 400
         
-        # Process payment
-        if user.deduct_pi(subscription_cost):
-            # Set premium status
-            user.is_premium = True
-            user.premium_expires_at = datetime.utcnow() + timedelta(days=365)  # 1 year
-            
-            # Create transaction record
-            transaction = Transaction(
-                user_id=user.id,
-                transaction_type='premium_subscription',
-                amount=subscription_cost,
-                status='completed',
-                description='Premium subscription purchase',
-                completed_at=datetime.utcnow()
-            )
-            
-            db.session.add(transaction)
-            db.session.commit()
-            
-            return jsonify({
-                'success': True,
-                'message': 'Premium subscription activated',
-                'user': user.to_dict()
-            }), 200
-        else:
-            return jsonify({'error': 'Payment processing failed'}), 500
+        # Set premium status
+        user.is_premium = True
+        user.premium_expires_at = datetime.utcnow() + timedelta(days=365)  # 1 year
+        
+        # Create transaction record
+        transaction = Transaction(
+            user_id=user.id,
+            transaction_type='premium_subscription',
+            amount=subscription_cost,
+            status='completed',
+            description='Premium subscription purchase',
+            completed_at=datetime.utcnow()
+        )
+        
+        db.session.add(transaction)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Premium subscription activated',
+            'user': user.to_dict()
+        }), 200
             
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': 'Subscription failed'}), 500
 
 @bp.route('/stats', methods=['GET'])
@@ -127,19 +130,17 @@ def subscribe_premium():
 def get_user_stats():
     """Get detailed user statistics"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        # Include activity not flushed to the users table yet
+        load_last_active(user)
+        
         # Calculate additional stats
         completed_quests = user.user_quests.filter_by(status='completed').count()
-        total_pi_earned = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user.id,
-            Transaction.transaction_type == 'quest_reward',
-            Transaction.status == 'completed'
-        ).scalar() or 0
+        total_pi_earned = TransactionAggregate.summarize(user.id)['total_earned']
         
         stats = {
             'level': user.level,
@@ -166,38 +167,23 @@ def get_user_stats():
 def get_leaderboard():
     """Get user leaderboard"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 10, type=int), 100)
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
         sort_by = request.args.get('sort_by', 'level')  # level, experience, pi_balance
         
-        # Build query based on sort criteria
-        if sort_by == 'level':
-            query = User.query.order_by(User.level.desc(), User.experience.desc())
-        elif sort_by == 'experience':
-            query = User.query.order_by(User.experience.desc())
-        elif sort_by == 'pi_balance':
-            query = User.query.order_by(User.pi_balance.desc())
-        else:
-            query = User.query.order_by(User.level.desc())
-        
-        users = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        if sort_by not in BOARDS:
+            sort_by = DEFAULT_BOARD
         
-        leaderboard = []
-        for i, user in enumerate(users.items):
-            rank = (page - 1) * per_page + i + 1
-            leaderboard.append({
-                'rank': rank,
-                'username': user.username,
-                'level': user.level,
-                'experience': user.experience,
-                'pi_balance': float(user.pi_balance),
-                'is_premium': user.is_premium,
-                'avatar_url': user.avatar_url
-            })
+        try:
+            # Empty boards are backfilled rather than served as having no players
+            if not backfill_if_empty(sort_by):
+                raise RuntimeError('Leaderboard rebuild in progress')
+            board = current_leaderboard()
+            leaderboard = board.page(page, per_page, sort_by)
+            total = board.total(sort_by)
+        except Exception as e:
+            # Serve from the database while Redis is unavailable or rebuilding
+            leaderboard, total = _leaderboard_from_db(page, per_page, sort_by)
         
         return jsonify({
             'success': True,
@@ -205,10 +191,73 @@ def get_leaderboard():
             'pagination': {
                 'page': page,
                 'per_page': per_page,
-                'total': users.total,
-                'pages': users.pages
+                'total': total,
+                'pages': -(-total // per_page)
             }
         }), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch leaderboard'}), 500
+
+@bp.route('/leaderboard/me', methods=['GET'])
+@jwt_required()
+def get_my_leaderboard_rank():
+    """Get current user's rank and the players around them"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        from app.config import Config
+        sort_by = request.args.get('sort_by', 'level')
+        radius = min(max(request.args.get('radius', Config.LEADERBOARD_DEFAULT_RADIUS, type=int), 0), 50)
+        
+        if sort_by not in BOARDS:
+            sort_by = DEFAULT_BOARD
+        
+        backfill_if_empty(sort_by)
+        board = current_leaderboard()
+        rank, neighbours = board.around(current_user_id, radius, sort_by)
+        
+        if rank is None:
+            return jsonify({'error': 'User is not ranked yet'}), 404
+        
+        return jsonify({
+            'success': True,
+            'rank': rank + 1,
+            'total': board.total(sort_by),
+            'neighbours': neighbours
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch leaderboard rank'}), 500
+
+def _leaderboard_from_db(page, per_page, sort_by):
+    """Build a leaderboard page straight from the users table"""
+    if sort_by == 'experience':
+        query = User.query.order_by(User.experience.desc())
+    elif sort_by == 'pi_balance':
+        query = User.query.order_by(User.pi_balance.desc())
+    else:
+        query = User.query.order_by(User.level.desc(), User.experience.desc())
+    
+    users = query.paginate(
+        page=page, 
+        per_page=per_page, 
+        error_out=False
+    )
+    
+    activity = last_active_map([user.id for user in users.items])
+    leaderboard = []
+    for i, user in enumerate(users.items):
+        leaderboard.append({
+            'rank': (page - 1) * per_page + i + 1,
+            'user_id': user.id,
+            'username': user.username,
+            'level': user.level,
+            'experience': user.experience,
+            'pi_balance': float(user.pi_balance),
+            'is_premium': user.is_premium,
+            'avatar_url': user.avatar_url,
+            'last_active': freshest(user.last_active, activity.get(user.id)).isoformat()
+        })
+    
+    return leaderboard, users.total
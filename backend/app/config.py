@@ -25,15 +25,92 @@ class Config:
     PI_API_KEY = os.environ.get('PI_API_KEY')
     PI_API_URL = os.environ.get('PI_API_URL') or 'https://api.minepi.com'
     PI_SANDBOX_MODE = os.environ.get('PI_SANDBOX_MODE', 'true').lower() == 'true'
+    PI_VERIFY_TIMEOUT = 10
+    PI_VERIFY_CACHE_TTL = 300  # seconds an accepted token is trusted
+    PI_VERIFY_NEGATIVE_TTL = 30  # seconds a rejected token is remembered
+    PI_VERIFY_CACHE_SIZE = 10000
+    PI_HTTP_POOL_SIZE = 20
     
     # Game settings
     MAX_LEVEL = 250
     PREMIUM_SUBSCRIPTION_PRICE = 9.99
     LEVEL_UP_EXPERIENCE_BASE = 1000
+    QUEST_PROGRESS_BATCH_MAX = 200
+    
+    # Write-behind quest progress: buffer plain increments in Redis and
+    # flush them in batches (per process with memory:// Redis)
+    QUEST_PROGRESS_WRITE_BEHIND = os.environ.get('QUEST_PROGRESS_WRITE_BEHIND', 'false').lower() == 'true'
+    QUEST_PROGRESS_FLUSH_INTERVAL = 1.0  # seconds between background flushes
+    QUEST_PROGRESS_FLUSH_THRESHOLD = 50  # unflushed increments that force a flush
+    QUEST_PROGRESS_BUFFER_TTL = 3600  # seconds an idle user's counters are kept
+    TRANSACTION_EXPORT_BATCH_SIZE = 1000  # rows per server-side fetch and streamed write
+    
+    # Live-ops settings
+    ADMIN_USER_IDS = frozenset(filter(None, os.environ.get('ADMIN_USER_IDS', '').split(',')))
+    REWARD_GRANT_CHUNK_SIZE = 1000  # players granted per committed chunk
+    REWARD_GRANT_REQUEST_CHUNKS = 20  # chunks one admin request runs before returning 202
     
     # Redis settings (for caching and real-time features)
+    # Use memory:// for an in-process stand-in
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Leaderboard settings
+    LEADERBOARD_ENABLED = True
+    LEADERBOARD_DEFAULT_RADIUS = 5
+    
+    # Activity tracking: last_active touches are kept in Redis and written
+    # in bulk, at most one touch per user and worker per resolution
+    ACTIVITY_TRACKING_ENABLED = True
+    ACTIVITY_TOUCH_RESOLUTION = 60  # seconds between recorded touches of a user
+    ACTIVITY_FLUSH_INTERVAL = 60  # seconds between bulk last_active updates
+    ACTIVITY_TTL = 3600  # seconds an unflushed touch is kept
+    
+    # Rate limiting: token buckets per user and endpoint, by blueprint.
+    # capacity is the burst size, refill_rate the sustained requests/second
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+    RATE_LIMITS = {
+        'quests': {'capacity': 20, 'refill_rate': 2.0},
+        'marketplace': {'capacity': 10, 'refill_rate': 0.5},
+        'transactions': {'capacity': 10, 'refill_rate': 0.5},
+        'users': {'capacity': 10, 'refill_rate': 0.5}
+    }
+    
+    # Idempotency-Key settings
+    IDEMPOTENCY_ENABLED = True
+    IDEMPOTENCY_KEY_TTL = 86400  # seconds a key's response is replayed
+    IDEMPOTENCY_WAIT_SECONDS = 10  # how long a duplicate waits for the first request
+    IDEMPOTENCY_LOCK_TIMEOUT = 60  # seconds before an unfinished claim can be taken over
+    
+    # Server-Sent Events stream settings
+    EVENT_STREAM_HEARTBEAT_SECONDS = 15  # keepalive interval of idle streams
+    EVENT_STREAM_RETRY_MS = 3000  # client reconnect delay
+    EVENT_STREAM_QUEUE_SIZE = 100  # undelivered events kept per stream
+    
+    # Item and quest catalog cache settings
+    CATALOG_VERSION_CHECK_INTERVAL = 1.0  # seconds between shared version checks
+    CATALOG_CACHE_MAX_AGE = 60.0  # reload age while the version is unavailable
+    
+    # Seconds read-only routes may trust cached user claims (0 disables)
+    USER_CLAIMS_CACHE_TTL = 30
+    
+    # Conditional GET settings
+    ETAGS_ENABLED = True
+    
+    # Encode list responses with orjson when it is installed
+    FAST_JSON_ENABLED = True
+    
+    # Instrumentation settings
+    SQL_INSTRUMENTATION_ENABLED = True
+    SERVER_TIMING_ENABLED = True
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+    
+    # Prometheus metrics (set PROMETHEUS_MULTIPROC_DIR under gunicorn);
+    # scrapers authenticate with METRICS_TOKEN as a bearer token
+    METRICS_ENABLED = True
+    METRICS_PATH = '/metrics'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
     # File upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
@@ -52,6 +129,7 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    REDIS_URL = 'memory://'
     WTF_CSRF_ENABLED = False
 
 config = {
@@ -8,5 +8,9 @@ from .quest_progress import QuestProgress
 from .user_quest import UserQuest
 from .item import Item
 from .transaction import Transaction
+from .transaction_aggregate import TransactionAggregate
+from .reward_grant import RewardGrant
+from .idempotency_key import IdempotencyKey
 
-__all__ = ['User', 'Quest', 'QuestProgress', 'UserQuest', 'Item', 'Transaction']
+__all__ = ['User', 'Quest', 'QuestProgress', 'UserQuest', 'Item', 'Transaction',
+           'TransactionAggregate', 'RewardGrant', 'IdempotencyKey']
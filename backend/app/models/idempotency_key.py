@@ -0,0 +1,146 @@
+"""
+Stored results of requests sent with an Idempotency-Key header
+"""
+
+from datetime import datetime, timedelta
+import uuid
+
+from app.extensions import db
+
+
+class IdempotencyKey(db.Model):
+    """One client-chosen key per user, claimed before its request runs
+
+    The unique ``(user_id, key)`` constraint makes the claim the only check
+    needed: a retry either finds the stored response or sees the first
+    request still in progress. The view's first commit also moves the claim
+    to ``applied``, so a claim left ``in_progress`` is known to have changed
+    nothing and ``locked_at`` lets a retry take it over if its worker died.
+    """
+
+    __tablename__ = 'idempotency_keys'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+
+    # Outcome
+    status = db.Column(db.Enum('in_progress', 'applied', 'completed', name='idempotency_status_enum'),
+                       default='in_progress', nullable=False)
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key}:{self.status}>'
+
+    @classmethod
+    def claim(cls, user_id, key, endpoint, fingerprint, ttl_seconds):
+        """Insert an in-progress claim and commit; returns None if the key exists"""
+        from sqlalchemy.exc import IntegrityError
+
+        now = datetime.utcnow()
+        record = cls(
+            user_id=user_id,
+            key=key,
+            endpoint=endpoint,
+            fingerprint=fingerprint,
+            created_at=now,
+            locked_at=now,
+            expires_at=now + timedelta(seconds=ttl_seconds)
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+        return record
+
+    @classmethod
+    def find(cls, user_id, key):
+        """Plain row of a key's state, unaffected by later rollbacks"""
+        return db.session.execute(
+            db.select(cls.id, cls.fingerprint, cls.status, cls.response_status,
+                      cls.response_body, cls.locked_at, cls.expires_at)
+            .where(cls.user_id == user_id, cls.key == key)
+        ).first()
+
+    @classmethod
+    def take_over(cls, record_id, stale_before):
+        """Re-lock an abandoned in-progress claim; returns True if this caller won it"""
+        taken = db.session.execute(
+            db.update(cls).where(
+                cls.id == record_id,
+                cls.status == 'in_progress',
+                cls.locked_at < stale_before
+            ).values(locked_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        ).rowcount == 1
+        db.session.commit()
+        return taken
+
+    @classmethod
+    def mark_applied(cls, session, record_id):
+        """Flag a claim as applied inside the transaction committing its writes"""
+        session.execute(
+            db.update(cls).where(cls.id == record_id, cls.status == 'in_progress').values(status='applied'),
+            execution_options={'synchronize_session': False}
+        )
+
+    @classmethod
+    def complete(cls, record_id, status_code, body):
+        """Record the response of a claimed request"""
+        db.session.execute(
+            db.update(cls).where(cls.id == record_id).values(
+                status='completed',
+                response_status=status_code,
+                response_body=body,
+                completed_at=datetime.utcnow()
+            ),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+
+    @classmethod
+    def release(cls, record_id):
+        """Drop a claim none of whose writes committed; returns False if some did"""
+        db.session.rollback()
+        released = db.session.execute(
+            db.delete(cls).where(cls.id == record_id, cls.status == 'in_progress'),
+            execution_options={'synchronize_session': False}
+        ).rowcount == 1
+        db.session.commit()
+        return released
+
+    @classmethod
+    def discard(cls, record_id):
+        """Delete an expired key whatever its state"""
+        db.session.execute(db.delete(cls).where(cls.id == record_id))
+        db.session.commit()
+
+    @classmethod
+    def purge_expired(cls, batch_size=10000):
+        """Delete expired keys in batches; returns how many were removed"""
+        removed = 0
+        while True:
+            ids = db.session.execute(
+                db.select(cls.id).where(cls.expires_at <= datetime.utcnow()).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return removed
+            db.session.execute(db.delete(cls).where(cls.id.in_(ids)))
+            db.session.commit()
+            removed += len(ids)
@@ -47,6 +47,12 @@ class Item(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Indexes for the marketplace listing filters
+    __table_args__ = (
+        db.Index('ix_items_available_rarity_created_at', 'is_available', 'rarity', 'created_at'),
+        db.Index('ix_items_available_level', 'is_available', 'level_requirement'),
+    )
+    
     def __repr__(self):
         return f'<Item {self.name}>'
     
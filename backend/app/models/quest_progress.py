@@ -45,6 +45,11 @@ class QuestProgress(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
     
+    @staticmethod
+    def reaches_completion(current_progress, max_progress, is_completed):
+        """Check whether a progress value completes a not yet completed quest"""
+        return current_progress >= max_progress and not is_completed
+    
     def update_progress(self, progress_increment=1, completion_data=None):
         """Update quest progress"""
         self.current_progress += progress_increment
@@ -53,9 +58,143 @@ class QuestProgress(db.Model):
             self.completion_data.update(completion_data)
         
         # Check if quest is completed
-        if self.current_progress >= self.quest.max_progress and not self.is_completed:
+        quest_completed = self.reaches_completion(self.current_progress, self.quest.max_progress, self.is_completed)
+        if quest_completed:
             self.is_completed = True
             self.completed_at = datetime.utcnow()
-            return True  # Quest completed
         
-        return False  # Quest not yet completed
+        self.publish_progress(self.user_id, {
+            'quest_id': self.quest_id,
+            'current_progress': self.current_progress,
+            'max_progress': self.quest.max_progress,
+            'is_completed': self.is_completed,
+            'quest_completed': quest_completed
+        })
+        return quest_completed
+    
+    @staticmethod
+    def publish_progress(user_id, state):
+        """Queue a quest progress event for the user's event stream"""
+        from app.utils.events import publish_event
+        publish_event(db.session, user_id, 'quest_progress', state)
+    
+    @classmethod
+    def apply_increments(cls, user_id, increments):
+        """Apply many progress increments for one user with bulk UPDATEs
+        
+        ``increments`` maps quest_id to ``(progress_increment, completion_data)``.
+        Rows are read once with a single joined SELECT, then written back with
+        one executemany UPDATE per table. Completion follows the same rules as
+        ``update_progress``. The caller owns the commit.
+        
+        Returns a dict mapping each found quest_id to its resulting state.
+        """
+        from app.models.quest import Quest
+        from app.models.user_quest import UserQuest
+        
+        if not increments:
+            return {}
+        
+        rows = db.session.query(
+            cls.id,
+            cls.quest_id,
+            cls.current_progress,
+            cls.is_completed,
+            cls.completion_data,
+            cls.completed_at,
+            Quest.max_progress,
+            UserQuest.id,
+            UserQuest.status
+        ).join(
+            Quest, Quest.id == cls.quest_id
+        ).outerjoin(
+            UserQuest, db.and_(UserQuest.user_id == cls.user_id, UserQuest.quest_id == cls.quest_id)
+        ).filter(
+            cls.user_id == user_id,
+            cls.quest_id.in_(list(increments.keys()))
+        ).with_for_update(of=cls).all()
+        
+        now = datetime.utcnow()
+        progress_params = []
+        user_quest_params = []
+        results = {}
+        
+        for (progress_id, quest_id, current_progress, is_completed, completion_data,
+             completed_at, max_progress, user_quest_id, user_quest_status) in rows:
+            progress_increment, extra_data = increments[quest_id]
+            
+            new_progress = current_progress + progress_increment
+            merged_data = dict(completion_data or {})
+            if extra_data:
+                merged_data.update(extra_data)
+            
+            quest_completed = cls.reaches_completion(new_progress, max_progress, is_completed)
+            if quest_completed:
+                is_completed = True
+                completed_at = now
+            
+            progress_params.append({
+                'b_id': progress_id,
+                'b_increment': progress_increment,
+                'b_completion_data': merged_data,
+                'b_is_completed': is_completed,
+                'b_completed_at': completed_at,
+                'b_updated_at': now
+            })
+            
+            # Mirror the UserQuest status transitions of the single-quest endpoint
+            new_status = None
+            if quest_completed and user_quest_id:
+                new_status = 'completed'
+            elif user_quest_id and user_quest_status == 'accepted':
+                new_status = 'in_progress'
+            
+            if new_status:
+                user_quest_params.append({
+                    'b_id': user_quest_id,
+                    'b_status': new_status,
+                    'b_completed_at': now if new_status == 'completed' else None
+                })
+                user_quest_status = new_status
+            
+            results[quest_id] = {
+                'quest_id': quest_id,
+                'current_progress': new_progress,
+                'max_progress': max_progress,
+                'is_completed': is_completed,
+                'quest_completed': quest_completed,
+                'user_status': user_quest_status
+            }
+        
+        if progress_params:
+            table = cls.__table__
+            db.session.execute(
+                table.update()
+                .where(table.c.id == db.bindparam('b_id'))
+                .values(
+                    current_progress=table.c.current_progress + db.bindparam('b_increment'),
+                    completion_data=db.bindparam('b_completion_data'),
+                    is_completed=db.bindparam('b_is_completed'),
+                    completed_at=db.bindparam('b_completed_at'),
+                    updated_at=db.bindparam('b_updated_at')
+                ),
+                progress_params
+            )
+        
+        if user_quest_params:
+            table = UserQuest.__table__
+            db.session.execute(
+                table.update()
+                .where(table.c.id == db.bindparam('b_id'))
+                .values(
+                    status=db.bindparam('b_status'),
+                    completed_at=db.func.coalesce(db.bindparam('b_completed_at'), table.c.completed_at)
+                ),
+                user_quest_params
+            )
+        
+        # Events carry the same fields as ``update_progress`` publishes
+        for state in results.values():
+            cls.publish_progress(user_id, {key: value for key, value in state.items() if key != 'user_status'})
+        
+        return results
@@ -14,29 +14,36 @@ class Transaction(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     
-    # Transaction details
-    transaction_type = db.Column(db.Enum('quest_reward', 'item_purchase', 'premium_subscription', 
-                                        'marketplace_sale', 'marketplace_purchase', 'pi_deposit',
-                                        name='transaction_type_enum'), nullable=False)
+    # Transaction details (type, amount and status keep their previous value
+    # loaded on change so the per-user aggregates can move it between buckets)
+    transaction_type = db.column_property(
+        db.Column(db.Enum('quest_reward', 'item_purchase', 'premium_subscription', 
+                          'marketplace_sale', 'marketplace_purchase', 'pi_deposit',
+                          name='transaction_type_enum'), nullable=False),
+        active_history=True
+    )
     
     # Pi Network integration
     pi_payment_id = db.Column(db.String(100), unique=True, nullable=True)
     pi_transaction_hash = db.Column(db.String(255), nullable=True)
     
     # Amount and currency
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    amount = db.column_property(db.Column(db.Numeric(10, 2), nullable=False), active_history=True)
     currency = db.Column(db.String(10), default='PI', nullable=False)
     
     # Transaction status
-    status = db.Column(db.Enum('pending', 'completed', 'failed', 'cancelled', name='transaction_status_enum'),
-                      default='pending', nullable=False)
+    status = db.column_property(
+        db.Column(db.Enum('pending', 'completed', 'failed', 'cancelled', name='transaction_status_enum'),
+                  default='pending', nullable=False),
+        active_history=True
+    )
     
     # Related entities
     related_quest_id = db.Column(db.String(36), nullable=True)
     related_item_id = db.Column(db.String(36), nullable=True)
     
-    # Metadata
-    metadata = db.Column(db.JSON, default=dict, nullable=False)
+    # Metadata (``metadata`` is reserved on declarative models)
+    metadata_ = db.Column('metadata', db.JSON, default=dict, nullable=False)
     description = db.Column(db.String(255), nullable=True)
     
     # Timestamps
@@ -44,6 +51,16 @@ class Transaction(db.Model):
     completed_at = db.Column(db.DateTime, nullable=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Indexes for per-user history and summaries, and a partial index over
+    # the few pending rows that reconciliation scans by age
+    __table_args__ = (
+        db.Index('ix_transactions_user_type_status', 'user_id', 'transaction_type', 'status'),
+        db.Index('ix_transactions_user_created_at', 'user_id', 'created_at', 'id'),
+        db.Index('ix_transactions_pending_created_at', 'created_at',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+    )
+    
     def __repr__(self):
         return f'<Transaction {self.id}:{self.transaction_type}:{self.amount}>'
     
@@ -60,7 +77,7 @@ class Transaction(db.Model):
             'status': self.status,
             'related_quest_id': self.related_quest_id,
             'related_item_id': self.related_item_id,
-            'metadata': self.metadata,
+            'metadata': self.metadata_,
             'description': self.description,
             'created_at': self.created_at.isoformat(),
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
@@ -76,4 +93,4 @@ class Transaction(db.Model):
         """Mark transaction as failed"""
         self.status = 'failed'
         if reason:
-            self.metadata['failure_reason'] = reason
+            self.metadata_ = dict(self.metadata_ or {}, failure_reason=reason)
@@ -0,0 +1,209 @@
+"""
+Per-user transaction aggregates maintained alongside the ledger
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+from sqlalchemy import event, inspect
+from app.extensions import db
+
+CENT = Decimal('0.01')
+
+class TransactionAggregate(db.Model):
+    """Running count and amount of a user's transactions per type and status
+
+    Rows are adjusted in the same database transaction that inserts or
+    updates a ``Transaction`` (see ``track_transaction_changes``), so reads can
+    use them instead of aggregating the ledger.
+    """
+
+    __tablename__ = 'transaction_aggregates'
+
+    user_id = db.Column(db.String(36), primary_key=True)
+    transaction_type = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), primary_key=True)
+
+    count = db.Column(db.Integer, default=0, nullable=False)
+    total_amount = db.Column(db.Numeric(14, 2), default=0.00, nullable=False)
+
+    def __repr__(self):
+        return f'<TransactionAggregate {self.user_id}:{self.transaction_type}:{self.status}>'
+
+    @classmethod
+    def for_user(cls, user_id):
+        """Get a user's aggregates as {(transaction_type, status): (count, amount)}"""
+        rows = db.session.query(
+            cls.transaction_type, cls.status, cls.count, cls.total_amount
+        ).filter(cls.user_id == user_id).all()
+        return {(row[0], row[1]): (row[2], float(row[3])) for row in rows}
+
+    @classmethod
+    def summarize(cls, user_id):
+        """Get the economy totals shown on the wallet and stats screens"""
+        aggregates = cls.for_user(user_id)
+
+        def completed(*transaction_types):
+            count, amount = 0, 0.0
+            for transaction_type in transaction_types:
+                row_count, row_amount = aggregates.get((transaction_type, 'completed'), (0, 0.0))
+                count += row_count
+                amount += row_amount
+            return count, amount
+
+        quest_rewards_count, total_earned = completed('quest_reward')
+        items_purchased_count, _ = completed('item_purchase')
+        _, total_spent = completed('item_purchase', 'premium_subscription')
+
+        return {
+            'total_earned': round(total_earned, 2),
+            'total_spent': round(total_spent, 2),
+            'quest_rewards_count': quest_rewards_count,
+            'items_purchased_count': items_purchased_count
+        }
+
+    @classmethod
+    def apply_deltas(cls, connection, deltas):
+        """Add {(user_id, transaction_type, status): (count, amount)} deltas"""
+        rows = [
+            {
+                'user_id': user_id,
+                'transaction_type': transaction_type,
+                'status': status,
+                'count': count,
+                'total_amount': amount
+            }
+            for (user_id, transaction_type, status), (count, amount) in deltas.items()
+            if count or amount
+        ]
+        if not rows:
+            return
+
+        table = cls.__table__
+        dialect = connection.dialect.name
+
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.transaction_type, table.c.status],
+                set_={
+                    'count': table.c.count + stmt.excluded.count,
+                    'total_amount': table.c.total_amount + stmt.excluded.total_amount
+                }
+            )
+            connection.execute(stmt, rows)
+            return
+
+        # Portable fallback: update, then insert the rows that did not exist
+        for row in rows:
+            result = connection.execute(
+                table.update().where(
+                    table.c.user_id == row['user_id'],
+                    table.c.transaction_type == row['transaction_type'],
+                    table.c.status == row['status']
+                ).values(
+                    count=table.c.count + row['count'],
+                    total_amount=table.c.total_amount + row['total_amount']
+                )
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert(), row)
+
+    @classmethod
+    def _ledger_query(cls):
+        from app.models.transaction import Transaction
+
+        return db.session.query(
+            Transaction.user_id,
+            Transaction.transaction_type,
+            Transaction.status,
+            db.func.count(Transaction.id),
+            db.func.coalesce(db.func.sum(Transaction.amount), 0)
+        ).group_by(Transaction.user_id, Transaction.transaction_type, Transaction.status)
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every aggregate from the transactions ledger"""
+        table = cls.__table__
+        db.session.execute(table.delete())
+        db.session.execute(
+            table.insert().from_select(
+                ['user_id', 'transaction_type', 'status', 'count', 'total_amount'],
+                cls._ledger_query().statement
+            )
+        )
+        db.session.commit()
+        return db.session.query(db.func.count()).select_from(table).scalar()
+
+    @classmethod
+    def verify(cls):
+        """Compare stored aggregates with the ledger and list mismatches"""
+        expected = {
+            (row[0], row[1], row[2]): (row[3], Decimal(str(row[4])).quantize(CENT))
+            for row in cls._ledger_query().all()
+        }
+        stored = {
+            (row.user_id, row.transaction_type, row.status): (row.count, Decimal(str(row.total_amount)).quantize(CENT))
+            for row in db.session.query(cls).all()
+            if row.count or row.total_amount
+        }
+
+        mismatches = []
+        for key in sorted(set(expected) | set(stored)):
+            if expected.get(key) != stored.get(key):
+                mismatches.append({
+                    'user_id': key[0],
+                    'transaction_type': key[1],
+                    'status': key[2],
+                    'expected': expected.get(key),
+                    'stored': stored.get(key)
+                })
+        return mismatches
+
+def _transaction_deltas(session):
+    """Collect aggregate deltas for Transaction rows in a flush"""
+    from app.models.transaction import Transaction
+
+    deltas = defaultdict(lambda: (0, Decimal('0')))
+
+    def add(key, count, amount):
+        current_count, current_amount = deltas[key]
+        deltas[key] = (current_count + count, current_amount + Decimal(str(amount)))
+
+    def previous(state, attr):
+        history = state.attrs[attr].history
+        return history.deleted[0] if history.deleted else getattr(state.obj(), attr)
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            add((obj.user_id, obj.transaction_type, obj.status or 'pending'), 1, obj.amount)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Transaction):
+            continue
+        state = inspect(obj)
+        fields = ('transaction_type', 'status', 'amount')
+        if not any(state.attrs[field].history.has_changes() for field in fields):
+            continue
+        add((obj.user_id, previous(state, 'transaction_type'), previous(state, 'status')),
+            -1, -previous(state, 'amount'))
+        add((obj.user_id, obj.transaction_type, obj.status), 1, obj.amount)
+
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            add((obj.user_id, obj.transaction_type, obj.status), -1, -obj.amount)
+
+    return deltas
+
+def _apply_flushed_transactions(session, flush_context):
+    deltas = _transaction_deltas(session)
+    if deltas:
+        TransactionAggregate.apply_deltas(session.connection(), deltas)
+
+def track_transaction_changes(session):
+    """Keep transaction aggregates in step with every flushed Transaction"""
+    if not event.contains(session, 'after_flush', _apply_flushed_transactions):
+        event.listen(session, 'after_flush', _apply_flushed_transactions)
@@ -3,10 +3,15 @@ User model for Palace of Quests players
 """
 
 from datetime import datetime
+from decimal import Decimal
 from app.extensions import db
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
 
+def pi_amount(value):
+    """Convert an amount to the exact Decimal stored in pi_balance"""
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
 class User(db.Model):
     """User model representing game players"""
     
@@ -75,47 +80,138 @@ class User(db.Model):
     
     def calculate_level_from_experience(self):
         """Calculate level based on experience points"""
-        from app.config import Config
-        base_exp = Config.LEVEL_UP_EXPERIENCE_BASE
-        return min(int((self.experience / base_exp) ** 0.5) + 1, Config.MAX_LEVEL)
+        from app.utils.leveling import current_level_table
+        return current_level_table().level_for(self.experience)
     
     def experience_to_next_level(self):
         """Calculate experience needed for next level"""
-        from app.config import Config
-        base_exp = Config.LEVEL_UP_EXPERIENCE_BASE
-        next_level = min(self.level + 1, Config.MAX_LEVEL)
-        return (next_level - 1) ** 2 * base_exp - self.experience
+        from app.utils.leveling import current_level_table
+        return current_level_table().threshold(self.level + 1) - self.experience
     
     def add_experience(self, exp_amount):
         """Add experience and handle level ups"""
+        from app.utils.leveling import HEALTH_PER_LEVEL, MANA_PER_LEVEL
         old_level = self.level
         self.experience += exp_amount
         new_level = self.calculate_level_from_experience()
+        leveled_up = new_level > old_level
         
-        if new_level > old_level:
+        if leveled_up:
             self.level = new_level
             # Level up bonuses
-            health_bonus = (new_level - old_level) * 10
-            mana_bonus = (new_level - old_level) * 5
+            health_bonus = (new_level - old_level) * HEALTH_PER_LEVEL
+            mana_bonus = (new_level - old_level) * MANA_PER_LEVEL
             self.max_health += health_bonus
             self.max_mana += mana_bonus
             self.health = self.max_health  # Full heal on level up
             self.mana = self.max_mana
-            return True  # Leveled up
         
-        return False  # No level up
+        self._publish_experience(exp_amount, leveled_up)
+        return leveled_up
+    
+    def _publish_experience(self, exp_amount, leveled_up):
+        """Queue an experience event for the user's event stream"""
+        from app.utils.events import publish_event
+        
+        publish_event(db.session, self.id, 'experience', {
+            'experience': self.experience,
+            'experience_gained': exp_amount,
+            'experience_to_next_level': self.experience_to_next_level(),
+            'level': self.level,
+            'leveled_up': leveled_up,
+            'health': self.health,
+            'max_health': self.max_health,
+            'mana': self.mana,
+            'max_mana': self.max_mana
+        })
     
     def can_afford(self, amount):
         """Check if user can afford a purchase"""
         return float(self.pi_balance) >= float(amount)
     
     def deduct_pi(self, amount):
-        """Deduct Pi coins from user balance"""
-        if self.can_afford(amount):
-            self.pi_balance -= amount
-            return True
-        return False
+        """Atomically deduct Pi coins; returns False if the balance is too low"""
+        delta = -pi_amount(amount)
+        balance = User.apply_balance_delta(self.id, delta)
+        if balance is None:
+            return False
+        self._balance_changed(balance, delta)
+        return True
     
     def add_pi(self, amount):
-        """Add Pi coins to user balance"""
-        self.pi_balance += amount
+        """Atomically add Pi coins to user balance"""
+        delta = pi_amount(amount)
+        balance = User.apply_balance_delta(self.id, delta)
+        if balance is not None:
+            self._balance_changed(balance, delta)
+    
+    @classmethod
+    def apply_balance_delta(cls, user_id, delta):
+        """Add ``delta`` to a balance in one conditional UPDATE
+        
+        Debits only apply while the balance covers them, so concurrent
+        purchases and rewards neither lose updates nor hold a row lock across
+        a read. Returns the new balance, or None if the debit was refused or
+        the user does not exist.
+        """
+        delta = pi_amount(delta)
+        stmt = db.update(cls).where(cls.id == user_id).values(pi_balance=cls.pi_balance + delta)
+        if delta < 0:
+            stmt = stmt.where(cls.pi_balance >= -delta)
+        options = {'synchronize_session': False}
+        
+        if db.session.get_bind().dialect.update_returning:
+            return db.session.execute(stmt.returning(cls.pi_balance), execution_options=options).scalar_one_or_none()
+        
+        if db.session.execute(stmt, execution_options=options).rowcount != 1:
+            return None
+        return db.session.execute(db.select(cls.pi_balance).where(cls.id == user_id)).scalar_one()
+    
+    def _balance_changed(self, balance, delta):
+        """Sync the loaded balance, derived caches and event stream after an atomic update"""
+        from sqlalchemy.orm.attributes import set_committed_value
+        from app.utils.etag import mark_changed, user_scope
+        from app.utils.events import publish_event
+        from app.utils.leaderboard import mark_user_changed
+        
+        set_committed_value(self, 'pi_balance', balance)
+        mark_changed(db.session, user_scope(self.id))
+        mark_user_changed(db.session, self)
+        if delta:
+            publish_event(db.session, self.id, 'balance', {
+                'pi_balance': float(balance),
+                'delta': float(delta)
+            })
+    
+    @classmethod
+    def touch_many(cls, last_active):
+        """Move ``last_active`` forward for many users in one statement
+        
+        ``last_active`` maps user ids to datetimes; values older than the
+        stored one are ignored. PostgreSQL gets a single
+        ``UPDATE ... FROM (VALUES ...)``; other databases an executemany.
+        Activity is not a profile change, so ``updated_at`` is left as is.
+        """
+        if not last_active:
+            return
+        options = {'synchronize_session': False}
+        
+        if db.session.get_bind().dialect.name == 'postgresql':
+            touches = db.values(
+                db.column('id', db.String), db.column('last_active', db.DateTime), name='touches'
+            ).data(list(last_active.items()))
+            db.session.execute(
+                db.update(cls)
+                .where(cls.id == touches.c.id, cls.last_active < touches.c.last_active)
+                .values(last_active=touches.c.last_active, updated_at=cls.updated_at),
+                execution_options=options
+            )
+            return
+        
+        table = cls.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == db.bindparam('user_id'), table.c.last_active < db.bindparam('touched_at'))
+            .values(last_active=db.bindparam('touched_at'), updated_at=table.c.updated_at),
+            [{'user_id': user_id, 'touched_at': touched_at} for user_id, touched_at in last_active.items()]
+        )
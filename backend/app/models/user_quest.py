@@ -32,6 +32,7 @@ class UserQuest(db.Model):
     # Unique constraint for active quests
     __table_args__ = (
         db.UniqueConstraint('user_id', 'quest_id', name='unique_active_user_quest'),
+        db.Index('ix_user_quests_user_status', 'user_id', 'status'),
     )
     
     def __repr__(self):
@@ -65,3 +66,25 @@ class UserQuest(db.Model):
     def set_expiration(self, hours=24):
         """Set quest expiration time"""
         self.expires_at = datetime.utcnow() + timedelta(hours=hours)
+    
+    def mark_rewards_claimed(self):
+        """Atomically flag rewards as claimed; returns False if already claimed"""
+        from sqlalchemy.orm.attributes import set_committed_value
+        
+        claimed = db.session.execute(
+            db.update(UserQuest).where(
+                UserQuest.id == self.id,
+                UserQuest.rewards_claimed == False
+            ).values(rewards_claimed=True),
+            execution_options={'synchronize_session': False}
+        ).rowcount == 1
+        if claimed:
+            from app.utils.events import publish_event
+            set_committed_value(self, 'rewards_claimed', True)
+            publish_event(db.session, self.user_id, 'quest_claimed', {
+                'quest_id': self.quest_id,
+                'user_quest_id': self.id,
+                'pi_reward': float(self.pi_reward_amount),
+                'experience_reward': self.experience_reward_amount
+            })
+        return claimed
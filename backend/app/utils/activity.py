@@ -0,0 +1,175 @@
+"""
+Coalesced ``last_active`` tracking
+
+Every authenticated request touches its user, but instead of an UPDATE per
+request the touch is written to a short-lived Redis key and the user added
+to a dirty set. A background thread flushes the dirty users every
+``ACTIVITY_FLUSH_INTERVAL`` seconds with one ``User.touch_many`` statement
+per batch. Each worker also skips touches of users it recorded less than
+``ACTIVITY_TOUCH_RESOLUTION`` seconds ago, so a busy user costs at most one
+Redis write per worker per interval.
+
+Readers merge the Redis keys over the stored column with
+``last_active_map`` and ``load_last_active``, so the stats endpoint and
+leaderboard show activity before it is flushed.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from flask_jwt_extended import get_jwt_identity
+
+from app.utils.flusher import PeriodicFlusher
+from app.utils.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'activity:dirty'
+
+
+def activity_key(user_id):
+    """Redis key of a user's unflushed last activity"""
+    return f'activity:last_active:{user_id}'
+
+
+def parse_activity(value):
+    """Datetime of a stored touch, or None"""
+    return datetime.fromisoformat(value) if value else None
+
+
+class ActivityTracker:
+    """Records touches in Redis, at most once per user per resolution"""
+
+    def __init__(self, resolution, ttl, max_entries=100000):
+        self.resolution = resolution
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._recorded = {}
+        self._lock = threading.Lock()
+
+    def touch(self, user_id):
+        """Record activity now; returns False if it was recorded recently"""
+        now = time.monotonic()
+        with self._lock:
+            recorded = self._recorded.get(user_id)
+            if recorded is not None and now - recorded < self.resolution:
+                return False
+            self._recorded[user_id] = now
+            if len(self._recorded) > self.max_entries:
+                self._prune(now)
+
+        pipe = get_redis().pipeline()
+        pipe.set(activity_key(user_id), datetime.utcnow().isoformat(), ex=self.ttl)
+        pipe.sadd(DIRTY_KEY, user_id)
+        pipe.execute()
+        return True
+
+    def _prune(self, now):
+        for user_id in [user_id for user_id, recorded in self._recorded.items()
+                        if now - recorded >= self.resolution]:
+            del self._recorded[user_id]
+
+
+def tracking_enabled():
+    return 'activity_tracker' in current_app.extensions
+
+
+def record_activity(user_id):
+    """Touch a user's last activity; returns False if tracking is disabled"""
+    if not tracking_enabled():
+        return False
+    try:
+        if current_app.extensions['activity_tracker'].touch(user_id):
+            current_app.extensions['activity_flusher'].start()
+    except Exception as e:
+        # Activity is best effort; the request itself must not fail
+        logger.warning("Activity touch failed for user %s: %s", user_id, e)
+    return True
+
+
+def last_active_map(user_ids):
+    """Unflushed last activity by user id, for the users that have any"""
+    if not user_ids or not tracking_enabled():
+        return {}
+    try:
+        values = get_redis().mget([activity_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning("Activity lookup failed: %s", e)
+        return {}
+    return {
+        user_id: parse_activity(value)
+        for user_id, value in zip(user_ids, values)
+        if value
+    }
+
+
+def freshest(stored, touched):
+    """Later of a stored ``last_active`` and an unflushed touch"""
+    if touched is None or (stored is not None and stored >= touched):
+        return stored
+    return touched
+
+
+def load_last_active(user):
+    """Show a loaded user's unflushed activity without marking it dirty"""
+    from sqlalchemy.orm.attributes import set_committed_value
+
+    touched = last_active_map([user.id]).get(user.id)
+    last_active = freshest(user.last_active, touched)
+    if last_active is not user.last_active:
+        set_committed_value(user, 'last_active', last_active)
+    return user
+
+
+def flush_activity(batch_size=1000):
+    """Write unflushed activity to the users table; returns how many users were updated"""
+    from app.extensions import db
+    from app.models.user import User
+    from app.utils.etag import mark_changed, user_scope
+
+    redis = get_redis()
+    flushed = 0
+    while True:
+        user_ids = redis.spop(DIRTY_KEY, batch_size)
+        if not user_ids:
+            return flushed
+        touches = last_active_map(list(user_ids))
+        try:
+            User.touch_many(touches)
+            # The bulk UPDATE bypasses the unit of work, so profile tags
+            # would otherwise keep matching the old last_active
+            mark_changed(db.session, *(user_scope(user_id) for user_id in touches))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            redis.sadd(DIRTY_KEY, *user_ids)
+            raise
+        flushed += len(touches)
+
+
+def _record_request_activity(response):
+    try:
+        user_id = get_jwt_identity()
+    except RuntimeError:
+        # The view did not verify a token
+        return response
+    if user_id is not None:
+        record_activity(user_id)
+    return response
+
+
+def init_activity(app):
+    """Touch the user of every authenticated request and flush touches on an interval"""
+    if not app.config.get('ACTIVITY_TRACKING_ENABLED', True):
+        return
+    app.extensions['activity_tracker'] = ActivityTracker(
+        app.config.get('ACTIVITY_TOUCH_RESOLUTION', 60),
+        app.config.get('ACTIVITY_TTL', 3600)
+    )
+    app.extensions['activity_flusher'] = PeriodicFlusher(
+        app, app.config.get('ACTIVITY_FLUSH_INTERVAL', 60), flush_activity, 'activity-flusher'
+    )
+    app.after_request(_record_request_activity)
@@ -0,0 +1,219 @@
+"""
+Versioned in-process cache of the item catalog
+
+Every worker keeps an immutable snapshot of the ``items`` table with
+secondary indexes, and reloads it when the shared catalog version in Redis
+moves. The version is bumped after any commit that inserts, updates or
+deletes an ``Item``.
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+
+from app.utils.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'catalog:items:version'
+
+SORT_KEYS = {
+    'name': (lambda item: item['name'], False),
+    'pi_price': (lambda item: item['pi_price'], False),
+    'level_requirement': (lambda item: item['level_requirement'], False),
+    'created_at': (lambda item: item['created_at_raw'], True)
+}
+
+_PENDING_KEY = 'catalog_changed'
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog with secondary indexes"""
+
+    def __init__(self, items, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.items = items
+
+        self.available = set()
+        self.by_type = {}
+        self.by_rarity = {}
+        for position, item in enumerate(items):
+            if item['is_available']:
+                self.available.add(position)
+            self.by_type.setdefault(item['item_type'], set()).add(position)
+            self.by_rarity.setdefault(item['rarity'], set()).add(position)
+
+        by_level = sorted(range(len(items)), key=lambda position: items[position]['level_requirement'])
+        self.level_positions = by_level
+        self.level_values = [items[position]['level_requirement'] for position in by_level]
+
+        self.orders = {
+            sort_by: sorted(range(len(items)), key=lambda position: key(items[position]), reverse=reverse)
+            for sort_by, (key, reverse) in SORT_KEYS.items()
+        }
+
+    def level_range(self, min_level=None, max_level=None):
+        """Positions of items whose level requirement is within the bounds"""
+        lo = bisect.bisect_left(self.level_values, min_level) if min_level else 0
+        hi = bisect.bisect_right(self.level_values, max_level) if max_level else len(self.level_values)
+        return set(self.level_positions[lo:hi])
+
+    def query(self, item_type=None, rarities=None, min_level=None, max_level=None,
+              include_premium=True, available_only=True, sort_by='created_at'):
+        """Filter and sort the catalog; returns item dicts"""
+        candidates = set(self.available) if available_only else set(range(len(self.items)))
+
+        if item_type:
+            candidates &= self.by_type.get(item_type, set())
+        if rarities:
+            matching = set()
+            for rarity in rarities:
+                matching |= self.by_rarity.get(rarity, set())
+            candidates &= matching
+        if min_level or max_level:
+            candidates &= self.level_range(min_level, max_level)
+        if not include_premium:
+            candidates = {position for position in candidates
+                          if not self.items[position]['is_premium_only']}
+
+        order = self.orders.get(sort_by, self.orders['created_at'])
+        return [self.items[position] for position in order if position in candidates]
+
+    def distinct(self, field):
+        """Distinct values of an indexed field"""
+        index = {'item_type': self.by_type, 'rarity': self.by_rarity}[field]
+        return list(index.keys())
+
+
+class CatalogCache:
+    """Process-local holder of the current snapshot of a versioned catalog
+
+    ``loader`` builds a snapshot for a version; ``version_key`` is the shared
+    Redis counter that tells workers to reload it.
+    """
+
+    def __init__(self, loader, version_key=VERSION_KEY, version_check_interval=1.0, max_age=60.0):
+        self.loader = loader
+        self.version_key = version_key
+        self.version_check_interval = version_check_interval
+        self.max_age = max_age
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current_version(self):
+        """Shared catalog version, or None when Redis is unavailable"""
+        try:
+            return int(get_redis().get(self.version_key) or 0)
+        except Exception as e:
+            logger.warning("Catalog version check failed: %s", e)
+            return None
+
+    def snapshot(self):
+        """Get an up-to-date snapshot, reloading it if the version moved"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+
+        if snapshot is not None and now - self._checked_at < self.version_check_interval:
+            return snapshot
+
+        version = self.current_version()
+        self._checked_at = now
+        if snapshot is not None:
+            if version is not None and version == snapshot.version:
+                return snapshot
+            if version is None and now - snapshot.loaded_at < self.max_age:
+                return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and self._snapshot is not snapshot:
+                return self._snapshot
+            self._snapshot = self.loader(version)
+            return self._snapshot
+
+    def request_snapshot(self):
+        """Snapshot pinned to the current request by its first read
+
+        ETags are computed from the pinned snapshot's version, so a tag always
+        describes the body built from the same snapshot.
+        """
+        if not has_request_context():
+            return self.snapshot()
+        pinned = g.setdefault('catalog_snapshots', {})
+        if self.version_key not in pinned:
+            pinned[self.version_key] = self.snapshot()
+        return pinned[self.version_key]
+
+    def invalidate(self):
+        """Drop the local snapshot so the next read reloads it"""
+        self._snapshot = None
+        if has_request_context():
+            g.get('catalog_snapshots', {}).pop(self.version_key, None)
+
+
+def load_item_snapshot(version):
+    """Build a catalog snapshot from the items table"""
+    from app.utils.serializers import ITEM_PROJECTION
+
+    rows = ITEM_PROJECTION.query().all()
+    items = ITEM_PROJECTION.serialize(rows)
+    for data, row in zip(items, rows):
+        data['created_at_raw'] = row.created_at
+    return CatalogSnapshot(items, version)
+
+
+def public_item(item):
+    """Item dict as returned by the API"""
+    data = dict(item)
+    data.pop('created_at_raw', None)
+    return data
+
+
+def bump_catalog_version():
+    """Tell every worker that the catalog changed"""
+    try:
+        get_redis().incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning("Catalog version bump failed: %s", e)
+    cache = current_app.extensions.get('catalog_cache')
+    if cache is not None:
+        cache.invalidate()
+
+
+def get_catalog():
+    """Get the catalog snapshot of the current request"""
+    return current_app.extensions['catalog_cache'].request_snapshot()
+
+
+def _collect_item_changes(session, flush_context):
+    from app.models.item import Item
+
+    if any(isinstance(obj, Item) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info[_PENDING_KEY] = True
+
+
+def _bump_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        bump_catalog_version()
+
+
+def _discard_item_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_catalog_cache(app, session):
+    """Attach the catalog cache and bump its version on Item commits"""
+    app.extensions['catalog_cache'] = CatalogCache(
+        load_item_snapshot,
+        version_check_interval=app.config.get('CATALOG_VERSION_CHECK_INTERVAL', 1.0),
+        max_age=app.config.get('CATALOG_CACHE_MAX_AGE', 60.0)
+    )
+    if not event.contains(session, 'after_flush', _collect_item_changes):
+        event.listen(session, 'after_flush', _collect_item_changes)
+        event.listen(session, 'after_commit', _bump_after_commit)
+        event.listen(session, 'after_rollback', _discard_item_changes)
@@ -0,0 +1,140 @@
+"""
+Request-scoped current user resolution
+
+``get_current_user`` loads the ``User`` behind the request's JWT identity at
+most once per request. Read-only routes that only need the id, premium flag
+and level can use ``get_current_claims`` instead, which trusts a short-lived
+cache of those claims in Redis and skips the database entirely on a hit.
+Cached claims are dropped after any commit that changes them.
+"""
+
+import logging
+from collections import namedtuple
+
+from flask import current_app, g
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, inspect
+
+from app.utils.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+CLAIM_FIELDS = ('level', 'is_premium')
+
+_PENDING_KEY = 'user_claims_changed'
+_MISSING = object()
+
+UserClaims = namedtuple('UserClaims', ('id', 'is_premium', 'level'))
+
+
+def claims_key(user_id):
+    """Redis key of a user's cached claims"""
+    return f'user:claims:{user_id}'
+
+
+def claims_of(user):
+    """Claims of a loaded user"""
+    return UserClaims(id=user.id, is_premium=user.is_premium, level=user.level)
+
+
+def get_current_user():
+    """User for the request's JWT identity, or None if it no longer exists"""
+    user = g.get('current_user', _MISSING)
+    if user is _MISSING:
+        from app.extensions import db
+        from app.models.user import User
+
+        user = db.session.get(User, get_jwt_identity())
+        g.current_user = user
+    return user
+
+
+def get_current_claims():
+    """Id, premium flag and level of the current user, or None if it does not exist
+
+    Served from the claims cache when ``USER_CLAIMS_CACHE_TTL`` is set, falling
+    back to loading the user (and caching its claims) on a miss.
+    """
+    claims = g.get('current_claims', _MISSING)
+    if claims is not _MISSING:
+        return claims
+
+    ttl = current_app.config.get('USER_CLAIMS_CACHE_TTL')
+    if 'current_user' in g or not ttl:
+        user = get_current_user()
+        claims = claims_of(user) if user else None
+    else:
+        claims = _cached_claims(get_jwt_identity(), ttl)
+
+    g.current_claims = claims
+    return claims
+
+
+def _cached_claims(user_id, ttl):
+    key = claims_key(user_id)
+    try:
+        cached = get_redis().hgetall(key)
+    except Exception as e:
+        logger.warning("User claims lookup failed: %s", e)
+        cached = None
+
+    if cached:
+        return UserClaims(id=user_id, is_premium=cached['is_premium'] == '1', level=int(cached['level']))
+
+    user = get_current_user()
+    if user is None:
+        return None
+
+    claims = claims_of(user)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(key, mapping={'is_premium': int(claims.is_premium), 'level': claims.level})
+        pipe.expire(key, ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("User claims store failed: %s", e)
+    return claims
+
+
+def invalidate_claims(session, *user_ids):
+    """Drop cached claims after commit for users changed outside the ORM"""
+    session.info.setdefault(_PENDING_KEY, set()).update(user_ids)
+
+
+def _collect_changed_claims(session, flush_context):
+    from app.models.user import User
+
+    changed = set()
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in CLAIM_FIELDS):
+                changed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+    if changed:
+        invalidate_claims(session, *changed)
+
+
+def _drop_after_commit(session):
+    user_ids = session.info.pop(_PENDING_KEY, None)
+    if not user_ids:
+        return
+    try:
+        get_redis().delete(*[claims_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        # Entries expire on their own within USER_CLAIMS_CACHE_TTL
+        logger.warning("User claims invalidation failed: %s", e)
+
+
+def _discard_changed_claims(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_current_user(session):
+    """Drop cached user claims after commits that change them"""
+    if not event.contains(session, 'after_flush', _collect_changed_claims):
+        event.listen(session, 'after_flush', _collect_changed_claims)
+        event.listen(session, 'after_commit', _drop_after_commit)
+        event.listen(session, 'after_rollback', _discard_changed_claims)
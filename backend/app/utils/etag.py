@@ -0,0 +1,170 @@
+"""
+Version-based ETags and conditional GET handling
+
+Responses are tagged from content version counters kept in Redis instead of
+hashing the body, so ``If-None-Match`` can be answered with ``304`` before a
+view queries or serializes anything. Counters are bumped after commits that
+touch the underlying rows.
+"""
+
+import hashlib
+import logging
+import time
+import uuid
+from functools import wraps
+
+from flask import current_app, request, make_response
+from sqlalchemy import event
+
+from app.utils.catalog_cache import VERSION_KEY as CATALOG_VERSION_KEY, get_catalog
+from app.utils.quest_catalog import VERSION_KEY as QUEST_CATALOG_VERSION_KEY, get_quest_catalog
+from app.utils.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+EPOCH_KEY = 'content:epoch'
+
+_PENDING_KEY = 'content_scopes_changed'
+
+
+def version_key(scope):
+    """Redis key of a content version counter"""
+    if scope == 'catalog':
+        return CATALOG_VERSION_KEY
+    if scope == 'quests':
+        return QUEST_CATALOG_VERSION_KEY
+    return f'content:version:{scope}'
+
+
+def snapshot_version(scope):
+    """Version of the in-process snapshot a scope's responses are built from"""
+    if scope == 'catalog':
+        version = get_catalog().version
+    elif scope == 'quests':
+        version = get_quest_catalog().version
+    else:
+        return None
+    if version is None:
+        # Loaded while Redis was unavailable; such a body gets no tag
+        raise RuntimeError(f'The {scope} snapshot has no version')
+    return version
+
+
+def user_scope(user_id):
+    """Content scope covering everything shown about one user"""
+    return f'user:{user_id}'
+
+
+def content_versions(scopes):
+    """Current epoch and version counters of the given scopes
+
+    The epoch changes whenever Redis loses its data, so tags issued before a
+    flush can never match again. Cached catalogs report the version of the
+    snapshot the request is served from, not the shared counter, which other
+    workers may already have moved past it.
+    """
+    client = get_redis()
+    epoch = client.get(EPOCH_KEY)
+    if epoch is None:
+        client.set(EPOCH_KEY, uuid.uuid4().hex, nx=True)
+        epoch = client.get(EPOCH_KEY)
+    versions = {scope: snapshot_version(scope) for scope in scopes}
+    stored = [scope for scope, version in versions.items() if version is None]
+    if stored:
+        versions.update(zip(stored, (int(version or 0) for version in
+                                     client.mget([version_key(scope) for scope in stored]))))
+    return epoch, [versions[scope] for scope in scopes]
+
+
+def bump_versions(scopes):
+    """Invalidate every ETag derived from the given scopes"""
+    if not scopes:
+        return
+    pipe = get_redis().pipeline()
+    for scope in scopes:
+        pipe.incr(version_key(scope))
+    pipe.execute()
+
+
+def compute_etag(scopes, vary=None, bucket_seconds=None):
+    """Build a strong ETag for the current request from content versions"""
+    epoch, versions = content_versions(scopes)
+    parts = [epoch, request.path, sorted(request.args.items(multi=True)), list(zip(scopes, versions))]
+    if vary is not None:
+        parts.append(vary)
+    if bucket_seconds:
+        parts.append(int(time.time() // bucket_seconds))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def conditional(scopes, bucket_seconds=None):
+    """Answer matching ``If-None-Match`` requests with 304 before the view runs
+
+    ``scopes`` is a callable returning the content scopes the response is
+    built from. ``bucket_seconds`` rotates the tag for responses that also
+    depend on the clock (e.g. cooldowns).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('ETAGS_ENABLED', True):
+                return view(*args, **kwargs)
+
+            try:
+                etag = compute_etag(scopes(), bucket_seconds=bucket_seconds)
+            except Exception as e:
+                logger.warning("ETag computation failed: %s", e)
+                return view(*args, **kwargs)
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers.setdefault('Cache-Control', 'private, no-cache')
+            return response
+        return wrapper
+    return decorator
+
+
+def mark_changed(session, *scopes):
+    """Record scopes changed by statements that bypass the ORM unit of work"""
+    session.info.setdefault(_PENDING_KEY, set()).update(scopes)
+
+
+def _collect_changed_scopes(session, flush_context):
+    from app.models.user import User
+
+    scopes = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            scopes.add(user_scope(obj.id))
+        elif getattr(obj, 'user_id', None):
+            scopes.add(user_scope(obj.user_id))
+    if scopes:
+        mark_changed(session, *scopes)
+
+
+def _bump_after_commit(session):
+    scopes = session.info.pop(_PENDING_KEY, None)
+    if not scopes:
+        return
+    try:
+        bump_versions(sorted(scopes))
+    except Exception as e:
+        logger.warning("Content version bump failed: %s", e)
+
+
+def _discard_changed_scopes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_etags(session):
+    """Bump content versions after commits that change tagged content"""
+    if not event.contains(session, 'after_flush', _collect_changed_scopes):
+        event.listen(session, 'after_flush', _collect_changed_scopes)
+        event.listen(session, 'after_commit', _bump_after_commit)
+        event.listen(session, 'after_rollback', _discard_changed_scopes)
@@ -0,0 +1,192 @@
+"""
+Per-user change events for the Server-Sent Events stream
+
+Models queue events with ``publish_event`` while they change balances,
+experience and quest state; the events are published only after the
+transaction commits (and dropped on rollback), so clients never see a change
+that did not happen. Each worker fans events out to its connected streams
+through a broker: ``InProcessBroker`` keeps everything in memory for tests
+and ``memory://`` Redis, ``RedisBroker`` relays through Redis pub/sub so a
+change committed on one worker reaches streams held by every other one.
+"""
+
+import json
+import logging
+import queue
+import threading
+
+from flask import current_app
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'events:user:'
+
+_PENDING_KEY = 'user_events'
+
+
+def channel_for(user_id):
+    """Redis pub/sub channel of a user's events"""
+    return f'{CHANNEL_PREFIX}{user_id}'
+
+
+class Subscription:
+    """Queue of rendered events for one open stream"""
+
+    def __init__(self, broker, user_id, maxsize):
+        self.broker = broker
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # A client that stopped reading loses events rather than memory
+            logger.warning("Dropping event for slow stream of user %s", self.user_id)
+
+    def get(self, timeout=None):
+        """Next rendered event, or None if none arrived within ``timeout``"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Delivers events to the streams open in this process"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, message):
+        self.deliver(user_id, message)
+
+    def deliver(self, user_id, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def ensure_listening(self):
+        """Restart any background listener that stopped; no-op in process"""
+
+
+class RedisBroker(InProcessBroker):
+    """Publishes through Redis and relays every user's channel to local streams
+
+    Each worker holds a single pattern subscription, started with its first
+    stream, instead of one Redis connection per open stream.
+    """
+
+    def __init__(self, client, queue_size=100):
+        super().__init__(queue_size)
+        self.client = client
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, user_id, message):
+        self.client.publish(channel_for(user_id), message)
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        self.ensure_listening()
+        return subscription
+
+    def ensure_listening(self):
+        with self._listener_lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(**{f'{CHANNEL_PREFIX}*': self._on_message})
+            self._listener = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+            )
+
+    def _on_message(self, message):
+        self.deliver(message['channel'][len(CHANNEL_PREFIX):], message['data'])
+
+    @staticmethod
+    def _on_listener_error(error, pubsub, thread):
+        # The next stream heartbeat starts a fresh listener
+        logger.warning("Event listener stopped: %s", error)
+        thread.stop()
+        pubsub.close()
+
+
+def encode_event(event_type, data):
+    """Render an event as a Server-Sent Events frame"""
+    return f"event: {event_type}\ndata: {json.dumps(data, sort_keys=True, separators=(',', ':'))}\n\n"
+
+
+def publish_event(session, user_id, event_type, data):
+    """Queue an event for a user, published once the session commits"""
+    session.info.setdefault(_PENDING_KEY, []).append((user_id, encode_event(event_type, data)))
+
+
+def publish_now(user_id, event_type, data):
+    """Publish an event for state that is not written in a transaction"""
+    _publish([(user_id, encode_event(event_type, data))])
+
+
+def get_event_broker():
+    """Get the event broker for the current app"""
+    return current_app.extensions['event_broker']
+
+
+def _publish(events):
+    broker = current_app.extensions.get('event_broker')
+    if broker is None:
+        return
+    for user_id, message in events:
+        try:
+            broker.publish(user_id, message)
+        except Exception as e:
+            # Clients resynchronize from the REST endpoints on reconnect
+            logger.warning("Event publish failed: %s", e)
+
+
+def _publish_after_commit(session):
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        _publish(events)
+
+
+def _discard_events(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_events(app, session):
+    """Attach the event broker and publish queued events after commit"""
+    from app.utils.redis_store import InMemoryRedis
+
+    queue_size = app.config.get('EVENT_STREAM_QUEUE_SIZE', 100)
+    client = app.extensions['redis']
+    if isinstance(client, InMemoryRedis):
+        broker = InProcessBroker(queue_size)
+    else:
+        broker = RedisBroker(client, queue_size)
+    app.extensions['event_broker'] = broker
+
+    if not event.contains(session, 'after_commit', _publish_after_commit):
+        event.listen(session, 'after_commit', _publish_after_commit)
+        event.listen(session, 'after_rollback', _discard_events)
@@ -0,0 +1,53 @@
+"""
+Background threads that periodically write buffered state to the database
+"""
+
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    """Runs ``flush`` in an app context every ``interval`` seconds
+
+    The thread starts with the first ``start`` call, so processes that never
+    buffer anything (CLI commands, idle workers) never run one. At exit it
+    stops and flushes once more.
+    """
+
+    def __init__(self, app, interval, flush, name):
+        self.app = app
+        self.interval = interval
+        self.name = name
+        self._flush = flush
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        with self.app.app_context():
+            try:
+                return self._flush()
+            except Exception as e:
+                logger.warning("%s failed: %s", self.name, e)
+                return 0
+
+    def stop(self):
+        """Stop the thread and flush what is still buffered"""
+        self._stopped.set()
+        self.flush()
@@ -0,0 +1,190 @@
+"""
+Idempotency-Key support for endpoints that move Pi or grant rewards
+
+A request carrying an ``Idempotency-Key`` header first claims the key in the
+``idempotency_keys`` table. The first request runs the view and stores its
+response; retries with the same key get that response replayed (with an
+``Idempotent-Replayed`` header) without running the view again. Retries that
+arrive while the first request is still running wait for its result instead
+of doing the work twice. Completed responses are also cached in Redis so most
+replays never reach the database.
+
+The view's writes and the claim's move to ``applied`` commit together. If the
+worker dies before the response is stored, a retry of an ``applied`` claim is
+answered with 409 rather than run again; only claims that changed nothing are
+taken over.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+
+from app.utils.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+_CLAIM_KEY = 'idempotency_claim'
+
+
+def cache_key(user_id, key):
+    """Redis key of a stored idempotent response"""
+    return f'idempotency:{user_id}:{key}'
+
+
+def request_fingerprint():
+    """Hash of the method, path and body a key was first used with"""
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\0'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _cached_result(user_id, key):
+    try:
+        cached = get_redis().get(cache_key(user_id, key))
+    except Exception as e:
+        logger.warning("Idempotency cache lookup failed: %s", e)
+        return None
+    return json.loads(cached) if cached else None
+
+
+def _cache_result(user_id, key, result, ttl):
+    try:
+        get_redis().set(cache_key(user_id, key), json.dumps(result), ex=ttl)
+    except Exception as e:
+        logger.warning("Idempotency cache store failed: %s", e)
+
+
+def _replay(result, fingerprint):
+    if result['fingerprint'] != fingerprint:
+        return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+    response = current_app.response_class(result['body'], status=result['status'], mimetype='application/json')
+    response.headers[REPLAY_HEADER] = 'true'
+    return response
+
+
+def _run_claimed(view, record_id, user_id, key, fingerprint, ttl, args, kwargs):
+    from app.extensions import db
+    from app.models.idempotency_key import IdempotencyKey
+
+    # The view's first commit marks the claim applied in the same transaction
+    db.session.info[_CLAIM_KEY] = record_id
+    try:
+        response = make_response(view(*args, **kwargs))
+    except Exception:
+        db.session.info.pop(_CLAIM_KEY, None)
+        IdempotencyKey.release(record_id)
+        raise
+    db.session.info.pop(_CLAIM_KEY, None)
+
+    # Server errors are not final: free the key so the client can retry,
+    # unless the view already committed part of its work
+    if response.status_code >= 500 and IdempotencyKey.release(record_id):
+        return response
+
+    body = response.get_data(as_text=True)
+    IdempotencyKey.complete(record_id, response.status_code, body)
+    _cache_result(user_id, key, {'fingerprint': fingerprint, 'status': response.status_code, 'body': body}, ttl)
+    return response
+
+
+def idempotent(view):
+    """Replay stored responses for requests retried with the same Idempotency-Key
+
+    Must be applied inside ``jwt_required``; keys are scoped to the user.
+    Requests without the header run unchanged.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from app.extensions import db
+        from app.models.idempotency_key import IdempotencyKey
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not current_app.config.get('IDEMPOTENCY_ENABLED', True):
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        user_id = get_jwt_identity()
+        fingerprint = request_fingerprint()
+        ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL', 86400)
+        lock_timeout = current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60)
+        deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 10)
+        delay = 0.025
+
+        while True:
+            cached = _cached_result(user_id, key)
+            if cached:
+                return _replay(cached, fingerprint)
+
+            record = IdempotencyKey.claim(user_id, key, request.endpoint, fingerprint, ttl)
+            if record is not None:
+                return _run_claimed(view, record.id, user_id, key, fingerprint, ttl, args, kwargs)
+
+            existing = IdempotencyKey.find(user_id, key)
+            # End the read so no connection is held while waiting
+            db.session.rollback()
+            if existing is None:
+                continue
+
+            now = datetime.utcnow()
+            if existing.expires_at <= now:
+                IdempotencyKey.discard(existing.id)
+                continue
+            if existing.status == 'completed':
+                result = {
+                    'fingerprint': existing.fingerprint,
+                    'status': existing.response_status,
+                    'body': existing.response_body
+                }
+                _cache_result(user_id, key, result, ttl)
+                return _replay(result, fingerprint)
+            if existing.fingerprint != fingerprint:
+                return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+
+            # The first request died without recording a response
+            stale_before = now - timedelta(seconds=lock_timeout)
+            if existing.locked_at < stale_before:
+                if existing.status == 'applied':
+                    # Its writes committed; running it again would apply them twice
+                    return jsonify({'error': 'A request with this Idempotency-Key was applied '
+                                             'but its response was lost'}), 409
+                if IdempotencyKey.take_over(existing.id, stale_before):
+                    return _run_claimed(view, existing.id, user_id, key, fingerprint, ttl, args, kwargs)
+
+            if time.monotonic() >= deadline:
+                return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    return wrapper
+
+
+def _mark_claim_applied(session):
+    from app.models.idempotency_key import IdempotencyKey
+
+    record_id = session.info.get(_CLAIM_KEY)
+    if record_id is not None:
+        IdempotencyKey.mark_applied(session, record_id)
+
+
+def _claim_committed(session):
+    session.info.pop(_CLAIM_KEY, None)
+
+
+def init_idempotency(session):
+    """Commit a claimed request's writes together with its move to applied"""
+    if not event.contains(session, 'before_commit', _mark_claim_applied):
+        event.listen(session, 'before_commit', _mark_claim_applied)
+        event.listen(session, 'after_commit', _claim_committed)
@@ -0,0 +1,140 @@
+"""
+Per-request SQL instrumentation
+
+Counts the statements each request issues and how long they take, exposes
+the totals as ``Server-Timing`` headers and structured log lines, and logs
+slow statements with their SQL text and parameter shape (never the values).
+"""
+
+import json
+import logging
+import time
+
+from flask import g, request, has_request_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+request_logger = logging.getLogger('palace.requests')
+slow_query_logger = logging.getLogger('palace.slow_queries')
+
+
+class RequestSQLStats:
+    """SQL statistics gathered during one request"""
+
+    __slots__ = ('count', 'total_seconds', 'slowest_seconds', 'slowest_statement')
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_seconds += elapsed
+        if elapsed > self.slowest_seconds:
+            self.slowest_seconds = elapsed
+            self.slowest_statement = statement
+
+
+def parameter_shape(parameters, executemany=False):
+    """Describe bound parameters by name and type without their values"""
+    if executemany and isinstance(parameters, (list, tuple)):
+        return {
+            'executemany': len(parameters),
+            'row': parameter_shape(parameters[0]) if parameters else None
+        }
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in sorted(parameters.items())}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    if not has_request_context():
+        return
+    stats = g.get('sql_stats')
+    if stats is None:
+        return
+    stats.record(statement, elapsed)
+
+    threshold = current_app.config.get('SLOW_QUERY_THRESHOLD_MS')
+    if threshold is not None and elapsed * 1000 >= threshold:
+        slow_query_logger.warning(json.dumps({
+            'event': 'slow_query',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'duration_ms': round(elapsed * 1000, 2),
+            'statement': statement,
+            'parameters': parameter_shape(parameters, executemany)
+        }, default=str))
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # so the connection's next statement is not timed from it
+    connection = context.connection
+    if connection is None or context.statement is None:
+        return
+    started = connection.info.get('query_started')
+    if started:
+        started.pop()
+
+
+def _start_request():
+    g.sql_stats = RequestSQLStats()
+    g.request_started = time.perf_counter()
+
+
+def _finish_request(response):
+    stats = g.pop('sql_stats', None)
+    started = g.pop('request_started', None)
+    if stats is None or started is None:
+        return response
+
+    total_ms = (time.perf_counter() - started) * 1000
+    db_ms = stats.total_seconds * 1000
+    slowest_ms = stats.slowest_seconds * 1000
+
+    if current_app.config.get('SERVER_TIMING_ENABLED', True):
+        response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{stats.count} queries"')
+        response.headers.add('Server-Timing', f'db-slowest;dur={slowest_ms:.2f}')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.2f}')
+
+    request_logger.info(json.dumps({
+        'event': 'request',
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'duration_ms': round(total_ms, 2),
+        'sql_count': stats.count,
+        'sql_ms': round(db_ms, 2),
+        'sql_slowest_ms': round(slowest_ms, 2)
+    }))
+    return response
+
+
+def init_instrumentation(app):
+    """Hook SQL statement timing into every engine and request"""
+    if not app.config.get('SQL_INSTRUMENTATION_ENABLED', True):
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
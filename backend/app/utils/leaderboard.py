@@ -0,0 +1,291 @@
+"""
+Sorted-set leaderboard kept in Redis
+
+Each board is a sorted set of user ids; player card data lives in a single
+hash so a page is one ZREVRANGE plus one pipelined HMGET (and MGET of the
+players' unflushed activity). User changes are collected from flushed
+sessions and pushed to Redis only after the commit succeeds.
+"""
+
+import json
+import logging
+
+from flask import current_app
+from sqlalchemy import event, inspect
+
+from app.utils.activity import activity_key
+from app.utils.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'leaderboard'
+PROFILES_KEY = f'{KEY_PREFIX}:profiles'
+
+# Level board score packs (level, experience) into one exact float
+LEVEL_SCORE_FACTOR = 10 ** 10
+
+BOARDS = ('level', 'experience', 'pi_balance')
+DEFAULT_BOARD = 'level'
+
+TRACKED_FIELDS = ('username', 'level', 'experience', 'pi_balance', 'is_premium', 'avatar_url')
+
+_PENDING_KEY = 'leaderboard_pending'
+
+BACKFILL_LOCK_KEY = f'{KEY_PREFIX}:backfill'
+BACKFILL_LOCK_TTL = 300
+
+
+def board_key(board):
+    """Redis key of a leaderboard sorted set"""
+    return f'{KEY_PREFIX}:{board}'
+
+
+def snapshot(user):
+    """Capture the leaderboard fields of a user as plain values"""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'level': user.level,
+        'experience': user.experience,
+        'pi_balance': float(user.pi_balance),
+        'is_premium': user.is_premium,
+        'avatar_url': user.avatar_url,
+        'last_active': user.last_active.isoformat() if user.last_active else None
+    }
+
+
+def scores(entry):
+    """Compute the score of a snapshot on every board"""
+    return {
+        'level': entry['level'] * LEVEL_SCORE_FACTOR + entry['experience'],
+        'experience': entry['experience'],
+        'pi_balance': entry['pi_balance']
+    }
+
+
+class Leaderboard:
+    """Read and write access to the Redis leaderboards"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def update(self, entries):
+        """Upsert snapshots on every board in one round trip"""
+        if not entries:
+            return
+
+        pipe = self.client.pipeline()
+        for entry in entries:
+            for board, score in scores(entry).items():
+                pipe.zadd(board_key(board), {entry['id']: score})
+        pipe.hset(PROFILES_KEY, mapping={
+            entry['id']: json.dumps(entry) for entry in entries
+        })
+        pipe.execute()
+
+    def remove(self, user_id):
+        """Drop a user from every board"""
+        pipe = self.client.pipeline()
+        for board in BOARDS:
+            pipe.zrem(board_key(board), user_id)
+        pipe.hdel(PROFILES_KEY, user_id)
+        pipe.execute()
+
+    def total(self, board=DEFAULT_BOARD):
+        """Number of ranked players"""
+        return self.client.zcard(board_key(board))
+
+    def rank(self, user_id, board=DEFAULT_BOARD):
+        """Zero-based rank of a user, or None when unranked"""
+        return self.client.zrevrank(board_key(board), user_id)
+
+    def page(self, page=1, per_page=10, board=DEFAULT_BOARD):
+        """Get one page of ranked entries"""
+        start = (page - 1) * per_page
+        return self.window(start, start + per_page - 1, board)
+
+    def around(self, user_id, radius=5, board=DEFAULT_BOARD):
+        """Get the user's rank and the entries surrounding it"""
+        rank = self.rank(user_id, board)
+        if rank is None:
+            return None, []
+        start = max(rank - radius, 0)
+        return rank, self.window(start, rank + radius, board)
+
+    def window(self, start, end, board=DEFAULT_BOARD):
+        """Get ranked entries between two zero-based positions (inclusive)"""
+        if start < 0 or end < start:
+            return []
+
+        user_ids = self.client.zrevrange(board_key(board), start, end)
+        if not user_ids:
+            return []
+
+        pipe = self.client.pipeline()
+        pipe.hmget(PROFILES_KEY, user_ids)
+        pipe.mget([activity_key(user_id) for user_id in user_ids])
+        profiles, touches = pipe.execute()
+
+        entries = []
+        for offset, (user_id, profile, touched) in enumerate(zip(user_ids, profiles, touches)):
+            if not profile:
+                continue
+            entry = json.loads(profile)
+            entries.append({
+                'rank': start + offset + 1,
+                'user_id': user_id,
+                'username': entry['username'],
+                'level': entry['level'],
+                'experience': entry['experience'],
+                'pi_balance': entry['pi_balance'],
+                'is_premium': entry['is_premium'],
+                'avatar_url': entry['avatar_url'],
+                # Profiles are only rewritten when a ranked field changes
+                'last_active': max(filter(None, (touched, entry.get('last_active'))), default=None)
+            })
+        return entries
+
+    def rebuild(self, rows, chunk_size=1000):
+        """Rebuild every board from an iterable of snapshots
+
+        Boards are written to temporary keys and swapped in with RENAME, so
+        readers never see a partially built leaderboard.
+        """
+        suffix = ':rebuild'
+        temp_keys = [board_key(board) + suffix for board in BOARDS] + [PROFILES_KEY + suffix]
+        self.client.delete(*temp_keys)
+
+        count = 0
+        chunk = []
+        for entry in rows:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                self._write_chunk(chunk, suffix)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            self._write_chunk(chunk, suffix)
+            count += len(chunk)
+
+        pipe = self.client.pipeline()
+        for board in BOARDS:
+            if count:
+                pipe.rename(board_key(board) + suffix, board_key(board))
+            else:
+                pipe.delete(board_key(board))
+        if count:
+            pipe.rename(PROFILES_KEY + suffix, PROFILES_KEY)
+        else:
+            pipe.delete(PROFILES_KEY)
+        pipe.execute()
+        return count
+
+    def _write_chunk(self, entries, suffix):
+        pipe = self.client.pipeline()
+        for board in BOARDS:
+            pipe.zadd(board_key(board) + suffix, {
+                entry['id']: scores(entry)[board] for entry in entries
+            })
+        pipe.hset(PROFILES_KEY + suffix, mapping={
+            entry['id']: json.dumps(entry) for entry in entries
+        })
+        pipe.execute()
+
+
+def current_leaderboard():
+    """Get the leaderboard bound to the current app's Redis client"""
+    return Leaderboard(get_redis())
+
+
+def iter_user_snapshots(chunk_size=1000):
+    """Stream leaderboard snapshots for every user straight from the table"""
+    from app.extensions import db
+    from app.models.user import User
+
+    fields = ('id',) + TRACKED_FIELDS + ('last_active',)
+    columns = [getattr(User, field) for field in fields]
+    query = db.session.query(*columns).order_by(User.id).yield_per(chunk_size)
+    for row in query:
+        entry = dict(zip(fields, row))
+        entry['pi_balance'] = float(entry['pi_balance'])
+        entry['last_active'] = entry['last_active'].isoformat() if entry['last_active'] else None
+        yield entry
+
+
+def rebuild_from_database(chunk_size=1000):
+    """Backfill every leaderboard from the users table"""
+    return current_leaderboard().rebuild(iter_user_snapshots(chunk_size), chunk_size)
+
+
+def backfill_if_empty(board=DEFAULT_BOARD, chunk_size=1000):
+    """Rebuild the boards when they are empty but the users table is not
+
+    Covers a deploy (or a Redis flush) before ``flask rebuild-leaderboard``
+    has run. Returns False while another worker holds the rebuild, so the
+    caller can serve from the database instead of an empty board.
+    """
+    from app.extensions import db
+    from app.models.user import User
+
+    leaderboard = current_leaderboard()
+    if leaderboard.total(board) or db.session.query(User.id).limit(1).scalar() is None:
+        return True
+
+    client = get_redis()
+    if not client.set(BACKFILL_LOCK_KEY, '1', nx=True, ex=BACKFILL_LOCK_TTL):
+        return False
+    try:
+        logger.warning("Leaderboards are empty but users exist; rebuilding from the users table")
+        rebuild_from_database(chunk_size)
+    finally:
+        client.delete(BACKFILL_LOCK_KEY)
+    return True
+
+
+def mark_user_changed(session, user):
+    """Queue a user changed by a statement that bypasses the ORM unit of work"""
+    queue_snapshots(session, [snapshot(user)])
+
+
+def queue_snapshots(session, entries):
+    """Queue leaderboard snapshots to publish once the session commits"""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for entry in entries:
+        pending[entry['id']] = entry
+
+
+def _collect_flushed_users(session, flush_context):
+    from app.models.user import User
+
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if obj in session.new or any(
+            state.attrs[field].history.has_changes() for field in TRACKED_FIELDS
+        ):
+            pending[obj.id] = snapshot(obj)
+
+
+def _publish_committed_users(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not current_app.config.get('LEADERBOARD_ENABLED', True):
+        return
+    try:
+        current_leaderboard().update(list(pending.values()))
+    except Exception as e:
+        # The rebuild command repairs anything missed while Redis was down
+        logger.warning("Leaderboard update failed: %s", e)
+
+
+def _discard_pending_users(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_leaderboard(session):
+    """Keep the leaderboards in sync with committed User changes"""
+    if not event.contains(session, 'after_flush', _collect_flushed_users):
+        event.listen(session, 'after_flush', _collect_flushed_users)
+        event.listen(session, 'after_commit', _publish_committed_users)
+        event.listen(session, 'after_rollback', _discard_pending_users)
@@ -0,0 +1,209 @@
+"""
+Level curve lookups and bulk re-leveling
+
+The experience curve is precomputed into a table of level thresholds, so a
+single user's level is a bisect instead of a square root. ``relevel_users``
+applies the current ``LEVEL_UP_EXPERIENCE_BASE`` and ``MAX_LEVEL`` to every
+player, computing whole chunks at once with NumPy when it is installed.
+"""
+
+import bisect
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+BASE_MAX_HEALTH = 100
+HEALTH_PER_LEVEL = 10
+BASE_MAX_MANA = 50
+MANA_PER_LEVEL = 5
+
+
+class LevelTable:
+    """Experience thresholds of every level on the square-root curve"""
+
+    def __init__(self, base_experience, max_level):
+        self.base_experience = base_experience
+        self.max_level = max_level
+        # thresholds[n] is the experience at which level n + 1 is reached
+        self.thresholds = [level * level * base_experience for level in range(max_level)]
+        self._array = np.array(self.thresholds, dtype=np.int64) if np is not None else None
+
+    def level_for(self, experience):
+        """Level reached with the given experience"""
+        return max(bisect.bisect_right(self.thresholds, experience), 1)
+
+    def levels_for(self, experience):
+        """Levels for a NumPy array of experience values"""
+        return np.maximum(np.searchsorted(self._array, experience, side='right'), 1)
+
+    def threshold(self, level):
+        """Experience at which a level is reached"""
+        return self.thresholds[min(max(level, 1), self.max_level) - 1]
+
+
+@lru_cache(maxsize=8)
+def level_table(base_experience, max_level):
+    """Shared table for a curve; rebuilt only when the settings change"""
+    return LevelTable(base_experience, max_level)
+
+
+def current_level_table():
+    """Level table for the configured curve"""
+    from app.config import Config
+    return level_table(Config.LEVEL_UP_EXPERIENCE_BASE, Config.MAX_LEVEL)
+
+
+def max_health_for(level):
+    return BASE_MAX_HEALTH + (level - 1) * HEALTH_PER_LEVEL
+
+
+def max_mana_for(level):
+    return BASE_MAX_MANA + (level - 1) * MANA_PER_LEVEL
+
+
+RELEVEL_COLUMNS = ('id', 'experience', 'level', 'max_health', 'max_mana', 'health', 'mana',
+                   'username', 'pi_balance', 'is_premium', 'avatar_url')
+
+
+def _relevel_chunk(table, rows):
+    """Bind parameters for the rows of a chunk whose derived stats changed"""
+    if np is not None:
+        columns = {
+            name: np.fromiter((row[position] for row in rows), dtype=np.int64, count=len(rows))
+            for position, name in enumerate(RELEVEL_COLUMNS[1:7], start=1)
+        }
+        levels = table.levels_for(columns['experience'])
+        max_health = BASE_MAX_HEALTH + (levels - 1) * HEALTH_PER_LEVEL
+        max_mana = BASE_MAX_MANA + (levels - 1) * MANA_PER_LEVEL
+        changed = np.flatnonzero(
+            (levels != columns['level'])
+            | (max_health != columns['max_health'])
+            | (max_mana != columns['max_mana'])
+        )
+        # Level ups heal fully, as in User.add_experience
+        leveled_up = levels > columns['level']
+        health = np.where(leveled_up, max_health, np.minimum(columns['health'], max_health))
+        mana = np.where(leveled_up, max_mana, np.minimum(columns['mana'], max_mana))
+        return [
+            (rows[i], {
+                'b_id': rows[i].id,
+                'b_level': int(levels[i]),
+                'b_max_health': int(max_health[i]),
+                'b_max_mana': int(max_mana[i]),
+                'b_health': int(health[i]),
+                'b_mana': int(mana[i])
+            })
+            for i in changed
+        ]
+
+    changes = []
+    for row in rows:
+        level = table.level_for(row.experience)
+        max_health = max_health_for(level)
+        max_mana = max_mana_for(level)
+        if (level, max_health, max_mana) != (row.level, row.max_health, row.max_mana):
+            leveled_up = level > row.level
+            changes.append((row, {
+                'b_id': row.id,
+                'b_level': level,
+                'b_max_health': max_health,
+                'b_max_mana': max_mana,
+                'b_health': max_health if leveled_up else min(row.health, max_health),
+                'b_mana': max_mana if leveled_up else min(row.mana, max_mana)
+            }))
+    return changes
+
+
+def _apply_relevel(rows, touched=False):
+    """Write a chunk's changed stats and queue the cache updates they need
+
+    With ``touched`` every row is treated as changed by the caller (e.g. its
+    experience or balance was incremented), not just re-leveled ones.
+    Does not commit.
+    """
+    from app.extensions import db
+    from app.models.user import User
+    from app.utils.current_user import invalidate_claims
+    from app.utils.etag import mark_changed, user_scope
+    from app.utils.leaderboard import queue_snapshots
+
+    users = User.__table__
+    changes = _relevel_chunk(current_level_table(), rows)
+    if changes:
+        db.session.execute(
+            users.update().where(users.c.id == db.bindparam('b_id')).values(
+                level=db.bindparam('b_level'),
+                max_health=db.bindparam('b_max_health'),
+                max_mana=db.bindparam('b_max_mana'),
+                health=db.bindparam('b_health'),
+                mana=db.bindparam('b_mana')
+            ),
+            [params for _, params in changes]
+        )
+        invalidate_claims(db.session, *[params['b_id'] for _, params in changes])
+
+    levels = {params['b_id']: params['b_level'] for _, params in changes}
+    affected = rows if touched else [row for row, _ in changes]
+    if affected:
+        mark_changed(db.session, *[user_scope(row.id) for row in affected])
+        queue_snapshots(db.session, [{
+            'id': row.id,
+            'username': row.username,
+            'level': levels.get(row.id, row.level),
+            'experience': row.experience,
+            'pi_balance': float(row.pi_balance),
+            'is_premium': row.is_premium,
+            'avatar_url': row.avatar_url
+        } for row in affected])
+    return len(changes)
+
+
+def _relevel_query():
+    from app.extensions import db
+    from app.models.user import User
+
+    users = User.__table__
+    return db.select(*[users.c[name] for name in RELEVEL_COLUMNS]).order_by(users.c.id)
+
+
+def relevel_users(chunk_size=10000):
+    """Recompute level, max_health and max_mana from experience for every user
+
+    Reads users in primary-key ranges of ``chunk_size`` and writes each
+    chunk's changed rows with one executemany UPDATE, committing per chunk.
+    Returns ``(scanned, updated)``.
+    """
+    from app.extensions import db
+    from app.models.user import User
+
+    scanned = updated = 0
+    last_id = None
+    while True:
+        query = _relevel_query().limit(chunk_size)
+        if last_id is not None:
+            query = query.where(User.__table__.c.id > last_id)
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+        updated += _apply_relevel(rows)
+        db.session.commit()
+
+    return scanned, updated
+
+
+def relevel_user_ids(user_ids):
+    """Re-level users whose experience or balance the caller just changed
+
+    Runs inside the caller's transaction and queues leaderboard and ETag
+    updates for every listed user. Returns the number re-leveled.
+    """
+    from app.extensions import db
+    from app.models.user import User
+
+    rows = db.session.execute(_relevel_query().where(User.__table__.c.id.in_(user_ids))).all()
+    return _apply_relevel(rows, touched=True)
@@ -0,0 +1,167 @@
+"""
+Prometheus metrics
+
+Request latency histograms labelled by blueprint and route, in-flight and
+error counts, and database pool gauges, served from ``/metrics``.
+
+Under gunicorn every worker is a separate process, so ``PROMETHEUS_MULTIPROC_DIR``
+must point at a directory shared by the workers (see ``gunicorn.conf.py``).
+Each worker then writes its samples to memory-mapped files there and the
+scrape aggregates them, whichever worker happens to serve it. ``/metrics`` is
+independent of user auth: scrapers send the static ``METRICS_TOKEN`` as a
+bearer token, and without a configured token every scrape is refused.
+"""
+
+import hmac
+import logging
+import os
+import time
+
+from flask import g, jsonify, request
+from sqlalchemy import event
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+        REGISTRY, generate_latest, multiprocess
+    )
+except ImportError:  # pragma: no cover - optional dependency
+    generate_latest = None
+
+logger = logging.getLogger(__name__)
+
+ROUTE_LABELS = ('blueprint', 'route', 'method')
+
+if generate_latest is not None:
+    REQUEST_LATENCY = Histogram(
+        'palace_http_request_duration_seconds',
+        'Request latency by blueprint and route',
+        ROUTE_LABELS,
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    )
+    REQUESTS_IN_FLIGHT = Gauge(
+        'palace_http_requests_in_flight',
+        'Requests currently being handled',
+        ('blueprint', 'route'),
+        multiprocess_mode='livesum'
+    )
+    REQUEST_ERRORS = Counter(
+        'palace_http_request_errors_total',
+        'Responses with a 4xx or 5xx status',
+        ROUTE_LABELS + ('status',)
+    )
+    DB_POOL_CHECKED_OUT = Gauge(
+        'palace_db_pool_checked_out',
+        'Database connections currently checked out of the pool',
+        ('bind',),
+        multiprocess_mode='livesum'
+    )
+    DB_POOL_OVERFLOW = Gauge(
+        'palace_db_pool_overflow',
+        'Connections opened beyond the pool size',
+        ('bind',),
+        multiprocess_mode='livesum'
+    )
+
+
+def _route_labels():
+    rule = request.url_rule
+    return (
+        request.blueprint or 'app',
+        rule.rule if rule is not None else 'unmatched'
+    )
+
+
+def _start_request():
+    labels = _route_labels()
+    REQUESTS_IN_FLIGHT.labels(*labels).inc()
+    g.metrics_labels = labels
+    g.metrics_started = time.perf_counter()
+
+
+def _record_response(response):
+    labels = g.get('metrics_labels')
+    started = g.get('metrics_started')
+    if labels is None or started is None:
+        return response
+
+    REQUEST_LATENCY.labels(*labels, request.method).observe(time.perf_counter() - started)
+    if response.status_code >= 400:
+        REQUEST_ERRORS.labels(*labels, request.method, str(response.status_code)).inc()
+    return response
+
+
+def _finish_request(exc):
+    # Runs even when the response could not be built
+    labels = g.pop('metrics_labels', None)
+    if labels is not None:
+        REQUESTS_IN_FLIGHT.labels(*labels).dec()
+
+
+def _overflow(pool):
+    overflow = getattr(pool, 'overflow', None)
+    return max(overflow(), 0) if overflow is not None else 0
+
+
+def _watch_pool(bind, engine):
+    pool = engine.pool
+    checked_out = DB_POOL_CHECKED_OUT.labels(bind)
+    overflow = DB_POOL_OVERFLOW.labels(bind)
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+        overflow.set(_overflow(pool))
+
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+        overflow.set(_overflow(pool))
+
+    event.listen(pool, 'checkout', on_checkout)
+    event.listen(pool, 'checkin', on_checkin)
+
+
+def render_metrics():
+    """Current metrics in the Prometheus text format"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def scrape_authorized(token):
+    """Whether the request carries the configured metrics bearer token"""
+    if not token:
+        return False
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), token.encode())
+
+
+def init_metrics(app, db):
+    """Record request and pool metrics and expose them on ``/metrics``"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    if generate_latest is None:
+        logger.warning("prometheus_client is not installed; metrics are disabled")
+        return
+
+    # gunicorn's on_starting hook empties the directory; CLI commands and
+    # run.py only go through here and need it to exist too
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            _watch_pool(bind or 'default', engine)
+
+    @app.route(app.config.get('METRICS_PATH', '/metrics'))
+    def metrics():
+        if not scrape_authorized(app.config.get('METRICS_TOKEN')):
+            return jsonify({'error': 'Invalid metrics token'}), 401, {'WWW-Authenticate': 'Bearer'}
+        return render_metrics(), 200, {'Content-Type': CONTENT_TYPE_LATEST}
@@ -0,0 +1,52 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from app.extensions import db
+from app.utils.errors import ValidationError
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque cursor"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode an opaque cursor into a (created_at, id) position"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid pagination cursor")
+
+
+def keyset_page(query, created_at_column, id_column, limit, cursor=None):
+    """Fetch one page of a query ordered newest first by (created_at, id)
+
+    Returns the rows and the cursor of the next page (None on the last page).
+    One extra row is fetched to detect whether another page exists, so no
+    COUNT query is needed.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(
+            db.tuple_(created_at_column, id_column) < db.tuple_(created_at, row_id)
+        )
+
+    rows = query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            getattr(last, created_at_column.key), getattr(last, id_column.key)
+        )
+
+    return rows, next_cursor
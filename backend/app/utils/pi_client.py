@@ -0,0 +1,209 @@
+"""
+Pi Network API client with pooled connections and verification caching
+"""
+
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean the token itself was rejected and may be cached as such
+REJECTED_STATUS_CODES = (400, 401, 403, 404)
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a per-entry TTL"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, value, ttl):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _InflightCall:
+    """A verification in progress that identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PiNetworkClient:
+    """Verifies Pi Network access tokens against the ``/v2/me`` endpoint
+
+    Uses one keep-alive ``requests.Session`` per process, caches accepted
+    tokens for ``cache_ttl`` seconds and rejected ones for ``negative_ttl``
+    seconds, and collapses concurrent verifications of the same token into a
+    single outbound call. Only a SHA-256 of the token is kept in memory.
+    """
+
+    def __init__(self, base_url, timeout=10, cache_ttl=300, negative_ttl=30,
+                 cache_size=10000, pool_size=20):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.negative_ttl = negative_ttl
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Content-Type'] = 'application/json'
+
+        self._cache = TTLCache(cache_size)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'errors': 0,
+            'requests': 0,
+            'request_seconds_total': 0.0,
+            'request_seconds_max': 0.0
+        }
+
+    @staticmethod
+    def token_key(access_token):
+        return hashlib.sha256(access_token.encode()).hexdigest()
+
+    def verify(self, access_token):
+        """Get the Pi user for an access token, or None when it is not valid"""
+        key = self.token_key(access_token)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                user = entry[1]
+                self._stats['hits' if user is not None else 'negative_hits'] += 1
+                return copy.deepcopy(user)
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            # The leader always completes the call, however long its request
+            # takes, so followers share its outcome instead of giving up
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        user, cacheable = None, False
+        try:
+            user, cacheable = self._fetch(access_token)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if cacheable:
+                    ttl = self.cache_ttl if user is not None else self.negative_ttl
+                    self._cache.set(key, user, ttl)
+                del self._inflight[key]
+            call.result = user
+            call.done.set()
+
+        return copy.deepcopy(user)
+
+    def _fetch(self, access_token):
+        """Call the Pi API; returns (user, cacheable)"""
+        started = time.perf_counter()
+        try:
+            response = self.session.get(
+                f"{self.base_url}/v2/me",
+                headers={'Authorization': f'Bearer {access_token}'},
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            self._record_request(started, error=True)
+            logger.warning("Pi Network verification error: %s", e)
+            return None, False
+
+        self._record_request(started)
+
+        if response.status_code == 200:
+            return response.json(), True
+        if response.status_code in REJECTED_STATUS_CODES:
+            return None, True
+
+        # Server-side failures are not the token's fault, so are not cached
+        with self._lock:
+            self._stats['errors'] += 1
+        return None, False
+
+    def _record_request(self, started, error=False):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['request_seconds_total'] += elapsed
+            self._stats['request_seconds_max'] = max(self._stats['request_seconds_max'], elapsed)
+            if error:
+                self._stats['errors'] += 1
+
+    def stats(self):
+        """Snapshot of cache and latency counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cache_size'] = len(self._cache)
+        return stats
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def init_pi_client(app):
+    """Attach a Pi Network client configured from the app config"""
+    client = PiNetworkClient(
+        app.config['PI_API_URL'],
+        timeout=app.config.get('PI_VERIFY_TIMEOUT', 10),
+        cache_ttl=app.config.get('PI_VERIFY_CACHE_TTL', 300),
+        negative_ttl=app.config.get('PI_VERIFY_NEGATIVE_TTL', 30),
+        cache_size=app.config.get('PI_VERIFY_CACHE_SIZE', 10000),
+        pool_size=app.config.get('PI_HTTP_POOL_SIZE', 20)
+    )
+    app.extensions['pi_client'] = client
+    return client
+
+
+def get_pi_client():
+    """Get the Pi Network client for the current app"""
+    return current_app.extensions['pi_client']
@@ -0,0 +1,251 @@
+"""
+Write-behind buffer for quest progress increments
+
+With ``QUEST_PROGRESS_WRITE_BEHIND`` on, plain progress increments are added
+to a per-user Redis hash instead of being committed one by one, and flushed
+to ``quest_progress`` with ``QuestProgress.apply_increments`` every
+``QUEST_PROGRESS_FLUSH_INTERVAL`` seconds or once a user has
+``QUEST_PROGRESS_FLUSH_THRESHOLD`` unflushed increments. With the
+``memory://`` Redis stand-in the buffer is per process, which is only
+consistent for a single worker.
+
+For every buffered quest the hash keeps three counters:
+
+* ``<quest_id>:base``: ``current_progress`` in the database when buffering
+  started, plus any increments written directly since
+* ``<quest_id>:pending``: every increment buffered since then
+* ``<quest_id>:flushed``: the part of ``pending`` already written
+
+so the true progress is always ``base + pending``. The increment that takes
+it to ``max_progress`` is known exactly from ``HINCRBY``'s result and flushes
+synchronously, so completion and the ``UserQuest`` status are written before
+the request returns. Flushes hold a per-user lock and write only
+``pending - flushed``.
+"""
+
+import logging
+import time
+import uuid
+
+from flask import current_app
+from sqlalchemy import event
+
+from app.utils.flusher import PeriodicFlusher
+from app.utils.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'quest_progress:dirty'
+LOCK_TTL = 30
+LOCK_WAIT_SECONDS = 5.0
+
+_FORGET_KEY = 'forgotten_quest_progress'
+
+
+def buffer_key(user_id):
+    """Redis hash of a user's buffered progress"""
+    return f'quest_progress:buffer:{user_id}'
+
+
+def lock_key(user_id):
+    return f'quest_progress:flush:{user_id}'
+
+
+def write_behind_enabled():
+    return current_app.config.get('QUEST_PROGRESS_WRITE_BEHIND', False)
+
+
+def _counters(state):
+    """Parse a buffer hash into ``{quest_id: {'base', 'pending', 'flushed'}}``"""
+    counters = {}
+    for field, value in state.items():
+        quest_id, _, name = field.rpartition(':')
+        counters.setdefault(quest_id, {'base': 0, 'pending': 0, 'flushed': 0})[name] = int(value)
+    return counters
+
+
+def buffer_increment(user_id, quest_id, increment, current_progress, max_progress):
+    """Buffer an increment; returns ``(progress, completes, flushed)``
+
+    ``current_progress`` is the row's value, used as the base when the quest
+    is not buffered yet. ``completes`` is True for the one increment that
+    takes the quest to ``max_progress``; it and any increment reaching the
+    flush threshold are flushed before returning, with ``flushed`` True.
+    """
+    redis = get_redis()
+    key = buffer_key(user_id)
+
+    redis.hsetnx(key, f'{quest_id}:base', current_progress)
+    pipe = redis.pipeline()
+    pipe.hincrby(key, f'{quest_id}:pending', increment)
+    pipe.hget(key, f'{quest_id}:base')
+    pipe.hget(key, f'{quest_id}:flushed')
+    pipe.expire(key, current_app.config.get('QUEST_PROGRESS_BUFFER_TTL', 3600))
+    pipe.sadd(DIRTY_KEY, user_id)
+    pending, base, flushed, _, _ = pipe.execute()
+
+    progress = int(base) + pending
+    completes = progress - increment < max_progress <= progress
+    unflushed = pending - int(flushed or 0)
+    if completes or unflushed >= current_app.config.get('QUEST_PROGRESS_FLUSH_THRESHOLD', 50):
+        # Whichever flush writes it, completion is committed once this returns
+        flush_user_progress(user_id, wait=True)
+        return progress, completes, True
+
+    from app.utils.events import publish_now
+    publish_now(user_id, 'quest_progress', {
+        'quest_id': quest_id,
+        'current_progress': progress,
+        'max_progress': max_progress,
+        'is_completed': False,
+        'quest_completed': False
+    })
+    _flusher().start()
+    return progress, False, False
+
+
+def pending_increments(user_id):
+    """Unflushed increments of a user by quest_id"""
+    counters = _counters(get_redis().hgetall(buffer_key(user_id)))
+    return {
+        quest_id: counter['pending'] - counter['flushed']
+        for quest_id, counter in counters.items()
+        if counter['pending'] > counter['flushed']
+    }
+
+
+def flush_user_progress(user_id, wait=False):
+    """Write a user's unflushed increments and commit
+
+    Returns the ``apply_increments`` results, or None if another flush holds
+    the user's lock and ``wait`` is False.
+    """
+    from app.extensions import db
+    from app.models.quest_progress import QuestProgress
+    from app.utils.etag import mark_changed, user_scope
+
+    redis = get_redis()
+    lock = lock_key(user_id)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while not redis.set(lock, token, ex=LOCK_TTL, nx=True):
+        if not wait:
+            return None
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Timed out waiting to flush quest progress of user {user_id}")
+        time.sleep(0.02)
+
+    try:
+        counters = _counters(redis.hgetall(buffer_key(user_id)))
+        increments = {
+            quest_id: (counter['pending'] - counter['flushed'], None)
+            for quest_id, counter in counters.items()
+            if counter['pending'] > counter['flushed']
+        }
+        if not increments:
+            return {}
+
+        results = QuestProgress.apply_increments(user_id, increments)
+        mark_changed(db.session, user_scope(user_id))
+        db.session.commit()
+
+        # Only what was read is marked flushed; later increments stay pending
+        redis.hset(buffer_key(user_id), mapping={
+            f'{quest_id}:flushed': counters[quest_id]['pending'] for quest_id in increments
+        })
+        return results
+    except Exception:
+        db.session.rollback()
+        redis.sadd(DIRTY_KEY, user_id)
+        raise
+    finally:
+        if redis.get(lock) == token:
+            redis.delete(lock)
+
+
+def record_direct_increments(user_id, increments):
+    """Keep buffered bases in step with increments written straight to the database
+
+    ``increments`` maps quest_id to ``(progress_increment, completion_data)``;
+    call after their commit.
+    """
+    key = buffer_key(user_id)
+    redis = get_redis()
+    buffered = _counters(redis.hgetall(key))
+    pipe = redis.pipeline()
+    for quest_id, (increment, _) in increments.items():
+        if quest_id in buffered:
+            pipe.hincrby(key, f'{quest_id}:base', increment)
+    pipe.execute()
+
+
+def forget_quest(session, user_id, quest_id):
+    """Flush a quest's counters now and drop them once ``session`` commits
+
+    For a progress row about to be replaced: buffered increments are written
+    to the old row first, and the counters stay if the replacement rolls back.
+    """
+    redis = get_redis()
+    if redis.hget(buffer_key(user_id), f'{quest_id}:base') is None:
+        return
+    flush_user_progress(user_id, wait=True)
+    session.info.setdefault(_FORGET_KEY, set()).add((user_id, quest_id))
+
+
+def _drop_forgotten(session):
+    forgotten = session.info.pop(_FORGET_KEY, None)
+    if not forgotten:
+        return
+    try:
+        pipe = get_redis().pipeline()
+        for user_id, quest_id in forgotten:
+            pipe.hdel(buffer_key(user_id), f'{quest_id}:base', f'{quest_id}:pending', f'{quest_id}:flushed')
+        pipe.execute()
+    except Exception as e:
+        # Stale counters only hold already flushed increments
+        logger.warning("Dropping buffered quest progress failed: %s", e)
+
+
+def _keep_forgotten(session):
+    session.info.pop(_FORGET_KEY, None)
+
+
+def flush_dirty_progress(batch_size=100):
+    """Flush every user with buffered increments; returns how many were flushed"""
+    redis = get_redis()
+    flushed = 0
+    busy = []
+    while True:
+        user_ids = redis.spop(DIRTY_KEY, batch_size)
+        if not user_ids:
+            break
+        for user_id in user_ids:
+            try:
+                if flush_user_progress(user_id) is None:
+                    busy.append(user_id)
+                else:
+                    flushed += 1
+            except Exception as e:
+                logger.warning("Quest progress flush failed for user %s: %s", user_id, e)
+    # Users another flush held the lock for are picked up by the next pass
+    if busy:
+        redis.sadd(DIRTY_KEY, *busy)
+    return flushed
+
+
+def _flusher():
+    return current_app.extensions['progress_flusher']
+
+
+def init_progress_buffer(app, session):
+    """Attach the flusher and drop forgotten counters after commit
+
+    The flusher thread starts with the first buffered increment.
+    """
+    app.extensions['progress_flusher'] = PeriodicFlusher(
+        app, app.config.get('QUEST_PROGRESS_FLUSH_INTERVAL', 1.0), flush_dirty_progress, 'quest-progress-flusher'
+    )
+
+    if not event.contains(session, 'after_commit', _drop_forgotten):
+        event.listen(session, 'after_commit', _drop_forgotten)
+        event.listen(session, 'after_rollback', _keep_forgotten)
@@ -0,0 +1,101 @@
+"""
+Versioned in-process cache of the quest catalog
+
+Every worker keeps an immutable snapshot of the ``quests`` table with the
+active quests sorted by level requirement, so the quests available at a
+level are a bisect and a slice. Snapshots are reloaded through the same
+version check as the item catalog; the version is bumped after any commit
+that inserts, updates or deletes a ``Quest``.
+"""
+
+import bisect
+import logging
+import time
+
+from flask import current_app
+from sqlalchemy import event
+
+from app.utils.catalog_cache import CatalogCache
+from app.utils.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'catalog:quests:version'
+
+_PENDING_KEY = 'quest_catalog_changed'
+
+
+class QuestCatalogSnapshot:
+    """Immutable view of the quest catalog indexed by level requirement"""
+
+    def __init__(self, quests, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.by_id = {quest['id']: quest for quest in quests}
+
+        self.active = sorted(
+            (quest for quest in quests if quest['is_active']),
+            key=lambda quest: (quest['level_requirement'], quest['created_at'])
+        )
+        self.level_values = [quest['level_requirement'] for quest in self.active]
+
+    def available_at(self, level):
+        """Active quests whose level requirement is at most ``level``"""
+        return self.active[:bisect.bisect_right(self.level_values, level)]
+
+    def get(self, quest_id):
+        """Quest dict by id, active or not"""
+        return self.by_id.get(quest_id)
+
+
+def load_quest_snapshot(version):
+    """Build a quest catalog snapshot from the quests table"""
+    from app.models.quest import Quest
+
+    return QuestCatalogSnapshot([quest.to_dict() for quest in Quest.query.all()], version)
+
+
+def bump_quest_catalog_version():
+    """Tell every worker that the quest catalog changed"""
+    try:
+        get_redis().incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning("Quest catalog version bump failed: %s", e)
+    cache = current_app.extensions.get('quest_catalog')
+    if cache is not None:
+        cache.invalidate()
+
+
+def get_quest_catalog():
+    """Get the quest catalog snapshot of the current request"""
+    return current_app.extensions['quest_catalog'].request_snapshot()
+
+
+def _collect_quest_changes(session, flush_context):
+    from app.models.quest import Quest
+
+    if any(isinstance(obj, Quest) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info[_PENDING_KEY] = True
+
+
+def _bump_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        bump_quest_catalog_version()
+
+
+def _discard_quest_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_quest_catalog(app, session):
+    """Attach the quest catalog and bump its version on Quest commits"""
+    app.extensions['quest_catalog'] = CatalogCache(
+        load_quest_snapshot,
+        version_key=VERSION_KEY,
+        version_check_interval=app.config.get('CATALOG_VERSION_CHECK_INTERVAL', 1.0),
+        max_age=app.config.get('CATALOG_CACHE_MAX_AGE', 60.0)
+    )
+    if not event.contains(session, 'after_flush', _collect_quest_changes):
+        event.listen(session, 'after_flush', _collect_quest_changes)
+        event.listen(session, 'after_commit', _bump_after_commit)
+        event.listen(session, 'after_rollback', _discard_quest_changes)
@@ -0,0 +1,142 @@
+"""
+Per-user token-bucket rate limiting of write requests
+
+Each user gets one bucket per endpoint for the blueprints listed in
+``RATE_LIMITS``. Buckets live in Redis and are updated by a Lua script, so
+every worker shares them and a check is one atomic round trip. When Redis is
+the in-process stand-in or unreachable, an in-process table of buckets
+enforces the same limits per worker. The check runs in ``before_request``
+using only the JWT, so rejected requests never touch the database.
+"""
+
+import logging
+import math
+import threading
+import time
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+logger = logging.getLogger(__name__)
+
+# Refills the bucket for the time since its last update, then takes a token.
+# Returns {allowed, seconds until a token is available}; the wait is a string
+# because Lua numbers are truncated to integers in replies.
+TOKEN_BUCKET_SCRIPT = """
+-- Needed before Redis 5 to write after reading the non-deterministic TIME
+redis.replicate_commands()
+
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+def bucket_key(user_id, endpoint):
+    """Redis key of a user's bucket for an endpoint"""
+    return f'ratelimit:{user_id}:{endpoint}'
+
+
+class LocalTokenBuckets:
+    """Thread-safe in-process token buckets"""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        """Take a token; returns ``(allowed, seconds until a token is available)``"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                allowed, wait = True, 0.0
+            else:
+                allowed, wait = False, (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.max_entries:
+                self._prune(now)
+        return allowed, wait
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+
+
+class RateLimiter:
+    """Token buckets in Redis, falling back to in-process buckets"""
+
+    def __init__(self, client=None):
+        self.local = LocalTokenBuckets()
+        register = getattr(client, 'register_script', None)
+        self._script = register(TOKEN_BUCKET_SCRIPT) if register is not None else None
+
+    def take(self, key, capacity, rate):
+        """Take a token; returns ``(allowed, seconds until a token is available)``"""
+        if self._script is not None:
+            try:
+                allowed, wait = self._script(keys=[key], args=[capacity, rate])
+                return bool(int(allowed)), float(wait)
+            except Exception as e:
+                logger.warning("Rate limit check failed, using local buckets: %s", e)
+        return self.local.take(key, capacity, rate)
+
+
+def _check_rate_limit():
+    if request.method not in current_app.config.get('RATE_LIMIT_METHODS', ()):
+        return None
+    limit = current_app.config.get('RATE_LIMITS', {}).get(request.blueprint)
+    if not limit:
+        return None
+
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        # Invalid tokens are rejected by the view's own jwt_required
+        return None
+    user_id = get_jwt_identity()
+    if user_id is None:
+        return None
+
+    allowed, wait = current_app.extensions['rate_limiter'].take(
+        bucket_key(user_id, request.endpoint), limit['capacity'], limit['refill_rate']
+    )
+    if allowed:
+        return None
+
+    retry_after = max(1, math.ceil(wait))
+    response = jsonify({'error': 'Rate limit exceeded', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_rate_limiting(app):
+    """Attach the rate limiter and check limits before every request"""
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+    app.extensions['rate_limiter'] = RateLimiter(app.extensions.get('redis'))
+    app.before_request(_check_rate_limit)
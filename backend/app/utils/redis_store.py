@@ -0,0 +1,275 @@
+"""
+Redis connection handling with an in-process stand-in for tests
+"""
+
+import fnmatch
+import threading
+import time
+
+from flask import current_app
+
+
+class InMemoryRedis:
+    """Minimal thread-safe stand-in for the subset of Redis commands we use
+
+    Selected by setting ``REDIS_URL`` to ``memory://``. Values are stored as
+    strings, mirroring a client created with ``decode_responses=True``.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    # Keyspace
+
+    def _purge(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def _get(self, key, factory=None):
+        self._purge(key)
+        if key not in self._data and factory is not None:
+            self._data[key] = factory()
+        return self._data.get(key)
+
+    def exists(self, key):
+        with self._lock:
+            self._purge(key)
+            return int(key in self._data)
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                self._purge(key)
+                if self._data.pop(key, None) is not None:
+                    removed += 1
+                self._expires.pop(key, None)
+            return removed
+
+    def rename(self, src, dst):
+        with self._lock:
+            self._purge(src)
+            if src not in self._data:
+                raise KeyError(src)
+            self._data[dst] = self._data.pop(src)
+            self._expires.pop(dst, None)
+            if src in self._expires:
+                self._expires[dst] = self._expires.pop(src)
+            return True
+
+    def expire(self, key, seconds):
+        with self._lock:
+            self._purge(key)
+            if key not in self._data:
+                return False
+            self._expires[key] = time.time() + seconds
+            return True
+
+    def keys(self, pattern='*'):
+        with self._lock:
+            for key in list(self._data):
+                self._purge(key)
+            return [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            return True
+
+    # Strings
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            self._purge(key)
+            if nx and key in self._data:
+                return None
+            self._data[key] = str(value)
+            self._expires.pop(key, None)
+            if ex is not None:
+                self._expires[key] = time.time() + ex
+            return True
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self._get(key) or 0) + amount
+            self._data[key] = str(value)
+            return value
+
+    # Hashes
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            bucket = self._get(key, dict)
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            added = 0
+            for name, item in items.items():
+                added += name not in bucket
+                bucket[name] = str(item)
+            return added
+
+    def hget(self, key, field):
+        with self._lock:
+            return (self._get(key) or {}).get(field)
+
+    def hmget(self, key, fields):
+        with self._lock:
+            bucket = self._get(key) or {}
+            return [bucket.get(field) for field in fields]
+
+    def hsetnx(self, key, field, value):
+        with self._lock:
+            bucket = self._get(key, dict)
+            if field in bucket:
+                return 0
+            bucket[field] = str(value)
+            return 1
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._get(key) or {})
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            bucket = self._get(key) or {}
+            return sum(bucket.pop(field, None) is not None for field in fields)
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            bucket = self._get(key, dict)
+            value = int(bucket.get(field, 0)) + amount
+            bucket[field] = str(value)
+            return value
+
+    # Sets
+
+    def sadd(self, key, *members):
+        with self._lock:
+            members_set = self._get(key, set)
+            members = {str(member) for member in members}
+            added = len(members - members_set)
+            members_set.update(members)
+            return added
+
+    def spop(self, key, count=None):
+        with self._lock:
+            members_set = self._get(key) or set()
+            popped = [members_set.pop() for _ in range(min(count or 1, len(members_set)))]
+            if not members_set:
+                self._data.pop(key, None)
+            if count is None:
+                return popped[0] if popped else None
+            return popped
+
+    def scard(self, key):
+        with self._lock:
+            return len(self._get(key) or ())
+
+    # Sorted sets
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            zset = self._get(key, dict)
+            added = 0
+            for member, score in mapping.items():
+                added += member not in zset
+                zset[member] = float(score)
+            return added
+
+    def zrem(self, key, *members):
+        with self._lock:
+            zset = self._get(key) or {}
+            return sum(zset.pop(member, None) is not None for member in members)
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._get(key) or {})
+
+    def zscore(self, key, member):
+        with self._lock:
+            return (self._get(key) or {}).get(member)
+
+    def _ordered(self, key):
+        # Redis orders equal scores lexicographically; reversed for ZREV*
+        zset = self._get(key) or {}
+        return sorted(zset.items(), key=lambda pair: (pair[1], pair[0]), reverse=True)
+
+    def zrevrange(self, key, start, end, withscores=False):
+        with self._lock:
+            ordered = self._ordered(key)
+            end = len(ordered) if end == -1 else end + 1
+            window = ordered[start:end]
+            return window if withscores else [member for member, _ in window]
+
+    def zrevrank(self, key, member):
+        with self._lock:
+            for rank, (candidate, _) in enumerate(self._ordered(key)):
+                if candidate == member:
+                    return rank
+            return None
+
+    # Transactions
+
+    def pipeline(self, transaction=True):
+        return _InMemoryPipeline(self)
+
+
+class _InMemoryPipeline:
+    """Buffers commands and runs them under the store lock on ``execute``"""
+
+    def __init__(self, store):
+        self._store = store
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._store, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._store._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands = []
+
+
+def init_redis(app):
+    """Attach a Redis client (or the in-process stand-in) to the app"""
+    url = app.config.get('REDIS_URL') or 'memory://'
+
+    if url.startswith('memory://'):
+        client = InMemoryRedis()
+    else:
+        import redis
+        client = redis.Redis.from_url(url, decode_responses=True)
+
+    app.extensions['redis'] = client
+    return client
+
+
+def get_redis():
+    """Get the Redis client for the current app"""
+    return current_app.extensions['redis']
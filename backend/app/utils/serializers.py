@@ -0,0 +1,194 @@
+"""
+Column-projection serializers for list endpoints
+
+List endpoints select only the columns they return, as plain tuples, and
+turn whole pages into dicts in one pass instead of hydrating ORM objects and
+calling ``to_dict`` row by row. The produced dicts (and the encoded JSON)
+are identical to the models' ``to_dict`` output.
+"""
+
+import csv
+import io
+import json
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from app.extensions import db
+from app.models.item import Item
+from app.models.transaction import Transaction
+
+
+def _as_float(value):
+    return float(value)
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _optional_isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+CONVERTERS = {
+    'float': _as_float,
+    'datetime': _isoformat,
+    'optional_datetime': _optional_isoformat
+}
+
+
+class Projection:
+    """Selects and serializes a fixed set of model columns
+
+    ``fields`` is a sequence of ``(output_key, attribute, kind)`` where kind
+    names a converter in ``CONVERTERS`` or is None for values passed through
+    unchanged.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.keys = tuple(key for key, _, _ in fields)
+        self.columns = tuple(getattr(model, attribute) for _, attribute, _ in fields)
+        self._converters = tuple(
+            (position, CONVERTERS[kind])
+            for position, (_, _, kind) in enumerate(fields) if kind
+        )
+
+    def query(self):
+        """Query selecting just the projected columns"""
+        return db.session.query(*self.columns)
+
+    def serialize(self, rows):
+        """Convert a page of projected rows to API dicts"""
+        return list(self.iter_serialized(rows))
+
+    def iter_serialized(self, rows):
+        """Convert projected rows to API dicts one at a time"""
+        keys = self.keys
+        converters = self._converters
+        for row in rows:
+            values = list(row)
+            for position, convert in converters:
+                values[position] = convert(values[position])
+            yield dict(zip(keys, values))
+
+
+ITEM_PROJECTION = Projection(Item, [
+    ('id', 'id', None),
+    ('name', 'name', None),
+    ('description', 'description', None),
+    ('item_type', 'item_type', None),
+    ('rarity', 'rarity', None),
+    ('stats', 'stats', None),
+    ('effects', 'effects', None),
+    ('pi_price', 'pi_price', 'float'),
+    ('is_tradeable', 'is_tradeable', None),
+    ('is_stackable', 'is_stackable', None),
+    ('max_stack_size', 'max_stack_size', None),
+    ('level_requirement', 'level_requirement', None),
+    ('class_requirement', 'class_requirement', None),
+    ('image_url', 'image_url', None),
+    ('icon_url', 'icon_url', None),
+    ('is_available', 'is_available', None),
+    ('is_premium_only', 'is_premium_only', None),
+    ('created_at', 'created_at', 'datetime')
+])
+
+TRANSACTION_PROJECTION = Projection(Transaction, [
+    ('id', 'id', None),
+    ('user_id', 'user_id', None),
+    ('transaction_type', 'transaction_type', None),
+    ('pi_payment_id', 'pi_payment_id', None),
+    ('pi_transaction_hash', 'pi_transaction_hash', None),
+    ('amount', 'amount', 'float'),
+    ('currency', 'currency', None),
+    ('status', 'status', None),
+    ('related_quest_id', 'related_quest_id', None),
+    ('related_item_id', 'related_item_id', None),
+    ('metadata', 'metadata_', None),
+    ('description', 'description', None),
+    ('created_at', 'created_at', 'datetime'),
+    ('completed_at', 'completed_at', 'optional_datetime'),
+    ('updated_at', 'updated_at', 'datetime')
+])
+
+
+def _use_fast_encoder(provider):
+    """Whether orjson can reproduce the provider's compact, sorted output"""
+    compact = provider.compact is True or (provider.compact is None and not current_app.debug)
+    return (orjson is not None and compact
+            and current_app.config.get('FAST_JSON_ENABLED', True)
+            and getattr(provider, 'sort_keys', True)
+            and getattr(provider, 'ensure_ascii', True))
+
+
+def json_response(payload, status=200):
+    """Build the same response as ``jsonify``, encoded with orjson when possible
+
+    The stdlib encoder escapes non-ASCII characters while orjson writes them
+    raw, so orjson output is only used when it is pure ASCII; anything else
+    falls back to the app's JSON provider. Either way the bytes are identical.
+    """
+    provider = current_app.json
+    if _use_fast_encoder(provider):
+        try:
+            body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            body = None
+        if body is not None and body.isascii():
+            return current_app.response_class(body + b'\n', status=status, mimetype=provider.mimetype)
+
+    response = provider.response(payload)
+    response.status_code = status
+    return response
+
+
+def ndjson_lines(records):
+    """Encode dicts as newline-delimited JSON, yielding one UTF-8 line each"""
+    if orjson is not None and current_app.config.get('FAST_JSON_ENABLED', True):
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE
+        for record in records:
+            yield orjson.dumps(record, option=option)
+    else:
+        for record in records:
+            yield (json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False) + '\n').encode()
+
+
+def csv_lines(keys, records):
+    """Encode dicts as CSV with a header row, yielding one UTF-8 line each
+
+    Nested values (e.g. transaction metadata) are written as JSON.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        encoded = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return encoded
+
+    yield line(keys)
+    for record in records:
+        yield line([
+            json.dumps(value, sort_keys=True, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+            for value in (record[key] for key in keys)
+        ])
+
+
+def batched_bytes(chunks, size):
+    """Join encoded chunks into writes of ``size`` chunks each"""
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= size:
+            yield b''.join(batch)
+            batch = []
+    if batch:
+        yield b''.join(batch)
@@ -2,7 +2,8 @@
 Input validation utilities
 """
 
-from marshmallow import Schema, fields, ValidationError as MarshmallowValidationError
+from decimal import Decimal
+from marshmallow import Schema, fields, validate, ValidationError as MarshmallowValidationError
 from app.utils.errors import ValidationError
 
 class PiAuthSchema(Schema):
@@ -15,6 +16,35 @@ class QuestProgressSchema(Schema):
     progress = fields.Int(missing=1, validate=lambda x: x > 0)
     completion_data = fields.Dict(missing=dict)
 
+class QuestProgressEntrySchema(QuestProgressSchema):
+    """Schema for a single entry of a batched quest progress update"""
+    quest_id = fields.Str(required=True)
+
+class QuestProgressBatchSchema(Schema):
+    """Schema for batched quest progress updates"""
+    updates = fields.List(fields.Nested(QuestProgressEntrySchema), required=True,
+                          validate=lambda x: len(x) > 0)
+
+class RewardSelectorSchema(Schema):
+    """Schema for choosing the players a reward grant applies to"""
+    all_players = fields.Bool(missing=False)
+    quest_id = fields.Str()
+    quest_title = fields.Str()
+    quest_status = fields.Str(missing='completed',
+                              validate=validate.OneOf(['accepted', 'in_progress', 'completed', 'failed', 'abandoned']))
+    completed_after = fields.DateTime()
+    completed_before = fields.DateTime()
+    min_level = fields.Int(validate=lambda x: x > 0)
+    max_level = fields.Int(validate=lambda x: x > 0)
+    user_ids = fields.List(fields.Str(), validate=lambda x: len(x) > 0)
+
+class RewardGrantSchema(Schema):
+    """Schema for bulk reward grants"""
+    selector = fields.Nested(RewardSelectorSchema, required=True)
+    pi_amount = fields.Decimal(places=2, missing=Decimal('0.00'), validate=lambda x: x >= 0)
+    experience = fields.Int(missing=0, validate=lambda x: x >= 0)
+    description = fields.Str(required=True, validate=lambda x: 0 < len(x) <= 255)
+
 class UserProfileSchema(Schema):
     """Schema for user profile updates"""
     username = fields.Str(validate=lambda x: len(x) >= 3 and len(x) <= 50)
@@ -38,6 +68,44 @@ def validate_quest_progress(data):
     except MarshmallowValidationError as e:
         raise ValidationError(f"Invalid progress data: {e.messages}")
 
+def validate_quest_progress_batch(data, max_entries=None):
+    """Validate batched quest progress data"""
+    schema = QuestProgressBatchSchema()
+    try:
+        batch = schema.load(data)
+    except MarshmallowValidationError as e:
+        raise ValidationError(f"Invalid progress batch: {e.messages}")
+    
+    if max_entries and len(batch['updates']) > max_entries:
+        raise ValidationError(f"Invalid progress batch: at most {max_entries} updates allowed")
+    
+    return batch
+
+def validate_reward_grant(data):
+    """Validate a bulk reward grant request"""
+    schema = RewardGrantSchema()
+    try:
+        grant = schema.load(data)
+    except MarshmallowValidationError as e:
+        raise ValidationError(f"Invalid reward grant: {e.messages}")
+    
+    if not grant['pi_amount'] and not grant['experience']:
+        raise ValidationError("Invalid reward grant: pi_amount or experience must be positive")
+    
+    criteria = set(grant['selector']) - {'all_players', 'quest_status'}
+    if not criteria and not grant['selector']['all_players']:
+        raise ValidationError("Invalid reward grant: selector matches every player; set all_players to confirm")
+    
+    return grant
+
+def dump_reward_selector(selector):
+    """Serialize a validated selector for storage"""
+    return RewardSelectorSchema().dump(selector)
+
+def load_reward_selector(data):
+    """Load a stored selector"""
+    return RewardSelectorSchema().load(data)
+
 def validate_user_profile(data):
     """Validate user profile data"""
     schema = UserProfileSchema()
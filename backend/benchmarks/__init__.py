@@ -0,0 +1,3 @@
+"""
+Benchmarks for the Palace of Quests API
+"""
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Endpoint benchmark: seeds synthetic data and measures every API route.
+
+Builds the app from ``TestingConfig`` against a file-backed SQLite database
+(or any ``--database-url``), seeds configurable volumes with bulk inserts,
+then replays each blueprint route through the test client and records
+latency percentiles and SQL statements per request. Results are written as
+JSON so runs can be diffed between commits.
+
+Usage:
+    python -m benchmarks.endpoints --users 100000 --quests 1000 \\
+        --items 5000 --transactions 10000000 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import event
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.models import User, Quest, QuestProgress, UserQuest, Item, Transaction, TransactionAggregate
+
+BLUEPRINTS = ('auth', 'users', 'quests', 'marketplace', 'transactions')
+
+RARITIES = ('Common', 'Uncommon', 'Rare', 'Epic', 'Legendary')
+ITEM_TYPES = ('weapon', 'armor', 'consumable', 'material', 'cosmetic')
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+TRANSACTION_TYPES = ('quest_reward', 'item_purchase', 'premium_subscription',
+                     'marketplace_sale', 'marketplace_purchase', 'pi_deposit')
+
+
+class StatementCounter:
+    """Counts SQL statements issued on an engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+class StubPiClient:
+    """Stands in for the Pi Network API during the login benchmark"""
+
+    def verify(self, access_token):
+        return {'uid': 'bench-subject', 'username': 'bench_subject'}
+
+
+def insert_chunks(model, rows, chunk_size):
+    """Bulk insert an iterable of row dicts in executemany chunks"""
+    table = model.__table__
+    chunk = []
+    total = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.session.execute(table.insert(), chunk)
+            db.session.commit()
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+        total += len(chunk)
+    return total
+
+
+def seed(args, rng):
+    """Seed synthetic data; returns ids used to build route URLs"""
+    now = datetime.utcnow()
+    base_exp = TestingConfig.LEVEL_UP_EXPERIENCE_BASE
+
+    subject_id = str(uuid.uuid4())
+    user_ids = [subject_id] + [str(uuid.uuid4()) for _ in range(args.users - 1)]
+
+    def users():
+        for n, user_id in enumerate(user_ids):
+            level = 60 if n == 0 else rng.randint(1, 60)
+            yield {
+                'id': user_id,
+                'pi_user_id': 'bench-subject' if n == 0 else f'bench-{n}',
+                'username': 'bench_subject' if n == 0 else f'player_{n}',
+                'level': level,
+                'experience': (level - 1) ** 2 * base_exp,
+                'pi_balance': 1_000_000 if n == 0 else round(rng.uniform(0, 500), 2),
+                'created_at': now - timedelta(days=rng.randint(0, 365)),
+                'last_active': now - timedelta(minutes=rng.randint(0, 10000))
+            }
+
+    quest_ids = [str(uuid.uuid4()) for _ in range(args.quests)]
+
+    def quests():
+        for n, quest_id in enumerate(quest_ids):
+            yield {
+                'id': quest_id,
+                'title': f'Quest {n}',
+                'description': f'Synthetic quest {n}',
+                'difficulty': rng.choice(DIFFICULTIES),
+                'quest_type': 'combat',
+                'pi_reward': round(rng.uniform(0.5, 25), 2),
+                'experience_reward': rng.randint(50, 2000),
+                'level_requirement': rng.randint(1, 60),
+                'max_progress': rng.randint(1, 20),
+                'is_repeatable': n % 4 == 0,
+                'cooldown_hours': 24
+            }
+
+    item_ids = [str(uuid.uuid4()) for _ in range(args.items)]
+
+    def items():
+        for n, item_id in enumerate(item_ids):
+            yield {
+                'id': item_id,
+                'name': f'Item {n}',
+                'description': f'Synthetic item {n}',
+                'item_type': rng.choice(ITEM_TYPES),
+                'rarity': rng.choice(RARITIES),
+                'stats': {'power': rng.randint(1, 100)},
+                'effects': [],
+                'pi_price': round(rng.uniform(0.5, 50), 2),
+                'level_requirement': rng.randint(1, 100),
+                'is_premium_only': n % 10 == 0,
+                'created_at': now - timedelta(minutes=n)
+            }
+
+    accepted = quest_ids[:min(args.user_quests, len(quest_ids))]
+
+    def user_quests():
+        for n, quest_id in enumerate(accepted):
+            yield {
+                'id': str(uuid.uuid4()),
+                'user_id': subject_id,
+                'quest_id': quest_id,
+                'status': 'completed' if n % 3 == 0 else 'in_progress',
+                'completed_at': now - timedelta(days=2) if n % 3 == 0 else None,
+                'expires_at': now + timedelta(days=1),
+                'pi_reward_amount': 1.0,
+                'experience_reward_amount': 100
+            }
+
+    def quest_progress():
+        for n, quest_id in enumerate(accepted):
+            yield {
+                'id': str(uuid.uuid4()),
+                'user_id': subject_id,
+                'quest_id': quest_id,
+                'current_progress': 1,
+                'is_completed': n % 3 == 0
+            }
+
+    def transactions():
+        subject_rows = min(args.subject_transactions, args.transactions)
+        for n in range(args.transactions):
+            owner = subject_id if n < subject_rows else user_ids[rng.randrange(len(user_ids))]
+            created_at = now - timedelta(seconds=n)
+            yield {
+                'id': str(uuid.uuid4()),
+                'user_id': owner,
+                'transaction_type': rng.choice(TRANSACTION_TYPES),
+                'amount': round(rng.uniform(0.1, 50), 2),
+                'status': 'completed' if n % 20 else 'pending',
+                'metadata': {},
+                'description': f'Synthetic transaction {n}',
+                'created_at': created_at,
+                'completed_at': created_at,
+                'updated_at': created_at
+            }
+
+    volumes = {}
+    started = time.perf_counter()
+    volumes['users'] = insert_chunks(User, users(), args.chunk_size)
+    volumes['quests'] = insert_chunks(Quest, quests(), args.chunk_size)
+    volumes['items'] = insert_chunks(Item, items(), args.chunk_size)
+    volumes['user_quests'] = insert_chunks(UserQuest, user_quests(), args.chunk_size)
+    volumes['quest_progress'] = insert_chunks(QuestProgress, quest_progress(), args.chunk_size)
+    volumes['transactions'] = insert_chunks(Transaction, transactions(), args.chunk_size)
+    TransactionAggregate.rebuild()
+
+    from app.utils.leaderboard import rebuild_from_database
+    rebuild_from_database(args.chunk_size)
+
+    volumes['seed_seconds'] = round(time.perf_counter() - started, 2)
+    return volumes
+
+
+def sample_ids():
+    """Pick existing rows for the subject user to build route URLs from"""
+    subject = User.query.filter_by(pi_user_id='bench-subject').one()
+    user_quest = UserQuest.query.filter_by(user_id=subject.id, status='in_progress').first()
+    completed = UserQuest.query.filter_by(user_id=subject.id, status='completed').first()
+    open_quest = Quest.query.filter(
+        ~Quest.id.in_(db.session.query(UserQuest.quest_id).filter(UserQuest.user_id == subject.id))
+    ).first()
+    item = Item.query.filter(Item.is_premium_only == False).first()
+    transaction = Transaction.query.filter_by(user_id=subject.id).first()
+    return {
+        'user_id': subject.id,
+        'progress_quest_id': user_quest.quest_id if user_quest else None,
+        'claim_quest_id': completed.quest_id if completed else None,
+        'open_quest_id': open_quest.id if open_quest else None,
+        'item_id': item.id if item else None,
+        'transaction_id': transaction.id if transaction else None
+    }
+
+
+def route_cases(ids):
+    """Requests to replay, keyed by endpoint name
+
+    Each case is (method, url, json body or None, token kind).
+    """
+    counter = iter(range(10 ** 9))
+    return {
+        'auth.login': lambda: ('POST', '/api/auth/login',
+                               {'access_token': 'bench-token', 'user': {}}, None),
+        'auth.refresh': lambda: ('POST', '/api/auth/refresh', None, 'refresh'),
+        'auth.verify_token': lambda: ('GET', '/api/auth/verify', None, 'access'),
+        'users.get_profile': lambda: ('GET', '/api/users/profile', None, 'access'),
+        'users.update_profile': lambda: ('PUT', '/api/users/profile',
+                                         {'avatar_url': 'https://example.com/a.png'}, 'access'),
+        'users.subscribe_premium': lambda: ('POST', '/api/users/premium/subscribe', None, 'access'),
+        'users.get_user_stats': lambda: ('GET', '/api/users/stats', None, 'access'),
+        'users.get_leaderboard': lambda: ('GET', '/api/users/leaderboard?per_page=50', None, None),
+        'users.get_my_leaderboard_rank': lambda: ('GET', '/api/users/leaderboard/me', None, 'access'),
+        'quests.get_available_quests': lambda: ('GET', '/api/quests/', None, 'access'),
+        'quests.accept_quest': lambda: ('POST', f"/api/quests/{ids['open_quest_id']}/accept", None, 'access'),
+        'quests.update_quest_progress': lambda: ('POST', f"/api/quests/{ids['progress_quest_id']}/progress",
+                                                 {'progress': 1}, 'access'),
+        'quests.update_quest_progress_batch': lambda: ('POST', '/api/quests/progress/batch',
+                                                       {'updates': [{'quest_id': ids['progress_quest_id'],
+                                                                     'progress': 1}]}, 'access'),
+        'quests.claim_quest_rewards': lambda: ('POST', f"/api/quests/{ids['claim_quest_id']}/claim", None, 'access'),
+        'quests.get_my_quests': lambda: ('GET', '/api/quests/my-quests', None, 'access'),
+        'marketplace.get_marketplace_items': lambda: ('GET', '/api/marketplace/items?per_page=100', None, 'access'),
+        'marketplace.purchase_item': lambda: ('POST', f"/api/marketplace/items/{ids['item_id']}/purchase",
+                                              None, 'access'),
+        'marketplace.get_item_categories': lambda: ('GET', '/api/marketplace/categories', None, None),
+        'marketplace.get_featured_items': lambda: ('GET', '/api/marketplace/featured', None, None),
+        'transactions.get_transaction_history': lambda: ('GET', '/api/transactions/history?per_page=100',
+                                                         None, 'access'),
+        'transactions.export_transactions': lambda: ('GET', '/api/transactions/export?format='
+                                                     + ('csv' if next(counter) % 2 else 'ndjson'), None, 'access'),
+        'transactions.get_transaction_summary': lambda: ('GET', '/api/transactions/summary', None, 'access'),
+        'transactions.get_transaction_details': lambda: ('GET', f"/api/transactions/{ids['transaction_id']}",
+                                                         None, 'access'),
+        'transactions.create_pi_deposit': lambda: ('POST', '/api/transactions/pi-deposit',
+                                                   {'amount': 1, 'pi_payment_id': f'bench-{next(counter)}-{uuid.uuid4()}'},
+                                                   'access')
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_route(client, counter, build_case, tokens, iterations, warmup):
+    latencies = []
+    statements = []
+    statuses = {}
+    for n in range(warmup + iterations):
+        method, url, body, token_kind = build_case()
+        headers = {}
+        if token_kind:
+            headers['Authorization'] = f'Bearer {tokens[token_kind]}'
+
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(url, method=method, json=body, headers=headers)
+        # Streamed bodies (the export) only run their queries when read
+        response.get_data()
+        elapsed = (time.perf_counter() - started) * 1000
+
+        if n < warmup:
+            continue
+        latencies.append(elapsed)
+        statements.append(counter.count)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    latencies.sort()
+    return {
+        'requests': iterations,
+        'status_codes': statuses,
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 3),
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p90': round(percentile(latencies, 0.90), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(latencies[-1], 3)
+        },
+        'sql_statements': {
+            'mean': round(statistics.mean(statements), 2),
+            'max': max(statements)
+        }
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed synthetic data and benchmark every API route')
+    parser.add_argument('--database-url', help='Database to seed (default: temporary SQLite file)')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--quests', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--user-quests', type=int, default=50, help='Quests accepted by the subject user')
+    parser.add_argument('--subject-transactions', type=int, default=10000,
+                        help='Transactions owned by the subject user')
+    parser.add_argument('--iterations', type=int, default=100, help='Timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per route')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per bulk insert')
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse an already seeded database')
+    parser.add_argument('--routes', nargs='*', help='Only run these endpoints (e.g. quests.get_my_quests)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'poq_bench.db')
+
+    class BenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+        RATE_LIMIT_ENABLED = False
+
+    app = create_app(BenchmarkConfig)
+    app.extensions['pi_client'] = StubPiClient()
+    rng = random.Random(args.seed)
+
+    with app.app_context():
+        volumes = None
+        if not args.skip_seed:
+            db.drop_all()
+            db.create_all()
+            volumes = seed(args, rng)
+
+        ids = sample_ids()
+        tokens = {
+            'access': create_access_token(identity=ids['user_id']),
+            'refresh': create_refresh_token(identity=ids['user_id'])
+        }
+        counter = StatementCounter(db.engine)
+
+    cases = route_cases(ids)
+    endpoints = sorted(
+        rule.endpoint for rule in app.url_map.iter_rules()
+        if rule.endpoint.split('.')[0] in BLUEPRINTS
+    )
+    selected = [endpoint for endpoint in endpoints if not args.routes or endpoint in args.routes]
+
+    results = {}
+    client = app.test_client()
+    for endpoint in selected:
+        if endpoint not in cases:
+            continue
+        results[endpoint] = run_route(client, counter, cases[endpoint], tokens,
+                                      args.iterations, args.warmup)
+
+    report = {
+        'benchmark': 'endpoints',
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'database': database_url.split(':', 1)[0],
+        'volumes': volumes,
+        'iterations': args.iterations,
+        'uncovered_routes': [endpoint for endpoint in selected if endpoint not in cases],
+        'routes': results
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Query plan check: asserts the hot queries use their composite indexes.
+
+Builds each hot query the way the API does, asks the database for its plan
+(``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN`` on PostgreSQL with sequential
+scans disabled so tiny tables still show index eligibility) and checks the
+expected index appears. Exits non-zero when one does not. The test suite runs
+the same check on SQLite (tests/test_query_plans.py); use this script to
+inspect the plans on another database.
+
+Usage:
+    python -m benchmarks.query_plans [--database-url postgresql://localhost/poq_bench]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.models import Item, Transaction, UserQuest
+from app.utils.serializers import ITEM_PROJECTION, TRANSACTION_PROJECTION
+
+USER_ID = '00000000-0000-0000-0000-000000000000'
+
+
+def hot_queries():
+    """(name, statement, expected index) for every indexed access path"""
+    history = TRANSACTION_PROJECTION.query().filter(Transaction.user_id == USER_ID)
+    return [
+        ('transaction_history',
+         history.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(21),
+         'ix_transactions_user_created_at'),
+        ('transaction_history_filtered_count',
+         history.filter(Transaction.transaction_type == 'quest_reward',
+                        Transaction.status == 'completed').order_by(None)
+         .with_entities(db.func.count(Transaction.id)),
+         'ix_transactions_user_type_status'),
+        ('pending_transactions',
+         db.session.query(Transaction.id).filter(Transaction.status == 'pending')
+         .order_by(Transaction.created_at).limit(100),
+         'ix_transactions_pending_created_at'),
+        ('user_quests_by_status',
+         db.session.query(UserQuest.id).filter(UserQuest.user_id == USER_ID,
+                                               UserQuest.status == 'in_progress'),
+         'ix_user_quests_user_status'),
+        ('items_by_rarity',
+         ITEM_PROJECTION.query().filter(Item.is_available == True, Item.rarity == 'Epic')
+         .order_by(Item.created_at.desc()).limit(20),
+         'ix_items_available_rarity_created_at'),
+        ('items_by_level',
+         ITEM_PROJECTION.query().filter(Item.is_available == True,
+                                        Item.level_requirement.between(5, 10)),
+         'ix_items_available_level')
+    ]
+
+
+def explain(statement):
+    """Plan lines of a statement on the current database"""
+    dialect = db.engine.dialect
+    sql = str(statement.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'sqlite':
+        rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).all()
+        return [row[-1] for row in rows]
+    db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+    return [row[0] for row in db.session.execute(db.text(f'EXPLAIN {sql}')).all()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that hot queries use their indexes')
+    parser.add_argument('--database-url', help='Database to inspect (default: temporary SQLite file)')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'poq_plans.db')
+
+    class PlanConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    app = create_app(PlanConfig)
+    results = {}
+    with app.app_context():
+        db.create_all()
+        for name, statement, index in hot_queries():
+            plan = explain(statement)
+            results[name] = {
+                'expected_index': index,
+                'uses_index': any(index in line for line in plan),
+                'plan': plan
+            }
+            db.session.rollback()
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if not all(result['uses_index'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
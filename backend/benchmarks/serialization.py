@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark: ORM ``to_dict`` + ``jsonify`` against the
+column-projection serializers used by list endpoints.
+
+Usage:
+    python -m benchmarks.serialization --rows 100 --iterations 200
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.models.user import User
+from app.models.transaction import Transaction
+from app.utils.serializers import TRANSACTION_PROJECTION, json_response
+
+
+def seed(rows):
+    """Create one user with ``rows`` transactions"""
+    user = User(pi_user_id='bench-user', username='bench_user', pi_balance=1000)
+    db.session.add(user)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(Transaction, [
+        {
+            'user_id': user.id,
+            'transaction_type': 'quest_reward',
+            'amount': 1.25 + i % 7,
+            'status': 'completed',
+            'metadata_': {'seq': i},
+            'description': f'Quest reward #{i}',
+            'created_at': now - timedelta(seconds=i),
+            'completed_at': now - timedelta(seconds=i),
+            'updated_at': now - timedelta(seconds=i)
+        }
+        for i in range(rows)
+    ])
+    db.session.commit()
+    return user.id
+
+
+def orm_path(user_id, rows):
+    transactions = Transaction.query.filter(
+        Transaction.user_id == user_id
+    ).order_by(Transaction.created_at.desc()).limit(rows).all()
+    return jsonify({
+        'success': True,
+        'transactions': [transaction.to_dict() for transaction in transactions]
+    }).get_data()
+
+
+def projection_path(user_id, rows):
+    transactions = TRANSACTION_PROJECTION.query().filter(
+        Transaction.user_id == user_id
+    ).order_by(Transaction.created_at.desc()).limit(rows).all()
+    return json_response({
+        'success': True,
+        'transactions': TRANSACTION_PROJECTION.serialize(transactions)
+    }).get_data()
+
+
+def measure(fn, iterations, *args):
+    timings = []
+    for _ in range(iterations):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'mean_ms': round(statistics.mean(timings), 4),
+        'p50_ms': round(timings[len(timings) // 2], 4),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 4),
+        'max_ms': round(timings[-1], 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100, help='Rows per page')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed runs per path')
+    args = parser.parse_args()
+
+    app = create_app(TestingConfig)
+    with app.app_context(), app.test_request_context():
+        db.create_all()
+        user_id = seed(args.rows)
+
+        orm_body = orm_path(user_id, args.rows)
+        projection_body = projection_path(user_id, args.rows)
+        if orm_body != projection_body:
+            raise SystemExit("Projection output differs from to_dict output")
+
+        orm = measure(orm_path, args.iterations, user_id, args.rows)
+        projection = measure(projection_path, args.iterations, user_id, args.rows)
+
+    print(json.dumps({
+        'benchmark': 'serialization',
+        'rows': args.rows,
+        'iterations': args.iterations,
+        'identical_output': True,
+        'orm_to_dict': orm,
+        'projection': projection,
+        'speedup_p50': round(orm['p50_ms'] / projection['p50_ms'], 2)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
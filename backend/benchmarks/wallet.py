@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Wallet contention benchmark: many threads debiting a single balance.
+
+Compares the conditional ``UPDATE ... RETURNING`` debit used by the API with
+a ``SELECT ... FOR UPDATE`` read-modify-write baseline. Every run checks that
+the final balance equals the starting balance minus the accepted debits (no
+lost updates) and never goes negative, then reports throughput.
+
+The wallet starts with enough for half of the attempted debits so both paths
+also have to refuse overdrafts. SQLite ignores ``FOR UPDATE``, so on the
+default database the baseline shows the lost updates the lock exists to
+prevent; pass a PostgreSQL ``--database-url`` to compare throughput.
+
+Usage:
+    python -m benchmarks.wallet --database-url postgresql://localhost/poq_bench \\
+        --threads 16 --operations 500
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.models import User
+from app.models.user import pi_amount
+
+
+def atomic_debit(user_id, amount):
+    return User.apply_balance_delta(user_id, -amount) is not None
+
+
+def locked_debit(user_id, amount):
+    balance = db.session.execute(
+        db.select(User.pi_balance).where(User.id == user_id).with_for_update()
+    ).scalar_one()
+    if balance < amount:
+        return False
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(pi_balance=balance - amount),
+        execution_options={'synchronize_session': False}
+    )
+    return True
+
+
+STRATEGIES = {
+    'atomic_update': atomic_debit,
+    'select_for_update': locked_debit
+}
+
+
+def reset_wallet(user_id, balance):
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(pi_balance=balance),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+
+
+def hammer(app, debit, user_id, amount, threads, operations):
+    counts = {'accepted': 0, 'refused': 0, 'errors': 0}
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker():
+        local = {'accepted': 0, 'refused': 0, 'errors': 0}
+        with app.app_context():
+            start.wait()
+            for _ in range(operations):
+                try:
+                    outcome = 'accepted' if debit(user_id, amount) else 'refused'
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    outcome = 'errors'
+                local[outcome] += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return counts, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent debits against one wallet')
+    parser.add_argument('--database-url', help='Database to use (default: temporary SQLite file)')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=200, help='Debits attempted per thread')
+    parser.add_argument('--amount', default='1.00', help='Pi debited per operation')
+    parser.add_argument('--strategies', nargs='*', choices=sorted(STRATEGIES), default=sorted(STRATEGIES))
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'poq_wallet.db')
+
+    class BenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': args.threads} if not database_url.startswith('sqlite') else {}
+        SQL_INSTRUMENTATION_ENABLED = False
+        METRICS_ENABLED = False
+
+    app = create_app(BenchmarkConfig)
+    amount = pi_amount(args.amount)
+    attempts = args.threads * args.operations
+    initial = amount * (attempts // 2)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(pi_user_id='wallet-bench', username='wallet_bench', pi_balance=initial)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    results = {}
+    for name in args.strategies:
+        with app.app_context():
+            reset_wallet(user_id, initial)
+
+        counts, elapsed = hammer(app, STRATEGIES[name], user_id, amount, args.threads, args.operations)
+
+        with app.app_context():
+            final = db.session.execute(
+                db.select(User.pi_balance).where(User.id == user_id)
+            ).scalar_one()
+
+        expected = initial - amount * counts['accepted']
+        results[name] = {
+            **counts,
+            'seconds': round(elapsed, 3),
+            'operations_per_second': round(attempts / elapsed, 1),
+            'final_balance': str(final),
+            'expected_balance': str(expected),
+            'lost_updates': int((Decimal(final) - expected) / amount),
+            'consistent': Decimal(final) == expected and final >= 0
+        }
+
+    report = {
+        'benchmark': 'wallet',
+        'timestamp': datetime.utcnow().isoformat(),
+        'database': database_url.split(':', 1)[0],
+        'threads': args.threads,
+        'operations_per_thread': args.operations,
+        'initial_balance': str(initial),
+        'results': results
+    }
+    if {'atomic_update', 'select_for_update'} <= results.keys():
+        report['speedup'] = round(
+            results['atomic_update']['operations_per_second']
+            / results['select_for_update']['operations_per_second'], 2
+        )
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
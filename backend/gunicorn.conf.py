@@ -0,0 +1,27 @@
+"""
+Gunicorn settings
+
+Threaded workers keep long-lived ``/api/events/stream`` connections from
+pinning a whole worker each. Workers share ``PROMETHEUS_MULTIPROC_DIR`` so
+``/metrics`` aggregates every worker's samples. The directory is emptied on
+startup and dead workers are dropped from the live gauges.
+"""
+
+import os
+import shutil
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+
+
+def on_starting(server):
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,47 @@
+"""Add composite indexes for hot query paths
+
+Existing databases were created by ``flask init-db`` (``db.create_all``), so
+this first revision only adds indexes to the existing tables. They are
+created IF NOT EXISTS because ``create_all`` now builds them as well.
+
+Revision ID: 3f9c2d7a1b64
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2d7a1b64'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+PENDING = sa.text("status = 'pending'")
+
+
+def upgrade():
+    op.create_index('ix_transactions_user_type_status', 'transactions',
+                    ['user_id', 'transaction_type', 'status'], if_not_exists=True)
+    op.create_index('ix_transactions_user_created_at', 'transactions',
+                    ['user_id', 'created_at', 'id'], if_not_exists=True)
+    op.create_index('ix_transactions_pending_created_at', 'transactions', ['created_at'],
+                    postgresql_where=PENDING, sqlite_where=PENDING, if_not_exists=True)
+    op.create_index('ix_user_quests_user_status', 'user_quests',
+                    ['user_id', 'status'], if_not_exists=True)
+    op.create_index('ix_items_available_rarity_created_at', 'items',
+                    ['is_available', 'rarity', 'created_at'], if_not_exists=True)
+    op.create_index('ix_items_available_level', 'items',
+                    ['is_available', 'level_requirement'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_items_available_level', table_name='items', if_exists=True)
+    op.drop_index('ix_items_available_rarity_created_at', table_name='items', if_exists=True)
+    op.drop_index('ix_user_quests_user_status', table_name='user_quests', if_exists=True)
+    op.drop_index('ix_transactions_pending_created_at', table_name='transactions', if_exists=True)
+    op.drop_index('ix_transactions_user_created_at', table_name='transactions', if_exists=True)
+    op.drop_index('ix_transactions_user_type_status', table_name='transactions', if_exists=True)
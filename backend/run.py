@@ -5,9 +5,12 @@ Web3 Metaverse Game Backend for Pi Network
 """
 
 import os
+import click
 from app import create_app
 from app.extensions import db
-from app.models import User, Quest, QuestProgress, UserQuest, Item, Transaction
+from app.models import (
+    User, Quest, QuestProgress, UserQuest, Item, Transaction, TransactionAggregate, RewardGrant, IdempotencyKey
+)
 
 app = create_app()
 
@@ -21,7 +24,10 @@ def make_shell_context():
         'QuestProgress': QuestProgress,
         'UserQuest': UserQuest,
         'Item': Item,
-        'Transaction': Transaction
+        'Transaction': Transaction,
+        'TransactionAggregate': TransactionAggregate,
+        'RewardGrant': RewardGrant,
+        'IdempotencyKey': IdempotencyKey
     }
 
 @app.cli.command()
@@ -101,6 +107,118 @@ def init_db():
     db.session.commit()
     print("✅ Database initialized with sample data!")
 
+@app.cli.command()
+@click.option('--chunk-size', default=1000, show_default=True, help='Users read per batch')
+def rebuild_leaderboard(chunk_size):
+    """Rebuild the Redis leaderboards from the users table"""
+    from app.utils.leaderboard import rebuild_from_database
+    
+    count = rebuild_from_database(chunk_size)
+    print(f"✅ Leaderboard rebuilt with {count} players!")
+
+@app.cli.command()
+@click.option('--verify', is_flag=True, help='Only compare stored aggregates with the ledger')
+def rebuild_economy_stats(verify):
+    """Recompute per-user transaction aggregates from the ledger"""
+    if verify:
+        mismatches = TransactionAggregate.verify()
+        for mismatch in mismatches:
+            print(f"❌ {mismatch['user_id']} {mismatch['transaction_type']}/{mismatch['status']}: "
+                  f"expected {mismatch['expected']}, stored {mismatch['stored']}")
+        if mismatches:
+            raise SystemExit(1)
+        print("✅ Transaction aggregates match the ledger!")
+        return
+    
+    count = TransactionAggregate.rebuild()
+    print(f"✅ Rebuilt {count} transaction aggregates!")
+
+@app.cli.command()
+@click.option('--chunk-size', default=10000, show_default=True, help='Users read and updated per batch')
+def relevel_users(chunk_size):
+    """Recompute every player's level and max stats from the current level curve"""
+    from app.utils.leveling import relevel_users as relevel
+    
+    scanned, updated = relevel(chunk_size)
+    print(f"✅ Re-leveled {updated} of {scanned} players!")
+
+@app.cli.command()
+def flush_quest_progress():
+    """Write every buffered quest progress increment to the database"""
+    from app.utils.progress_buffer import flush_dirty_progress
+    
+    count = flush_dirty_progress()
+    print(f"✅ Flushed buffered quest progress of {count} players!")
+
+@app.cli.command()
+def flush_activity():
+    """Write every unflushed last_active touch to the database"""
+    from app.utils.activity import flush_activity as flush
+    
+    count = flush()
+    print(f"✅ Flushed last activity of {count} players!")
+
+@app.cli.command()
+@click.option('--batch-size', default=10000, show_default=True, help='Keys deleted per commit')
+def purge_idempotency_keys(batch_size):
+    """Delete stored Idempotency-Key responses past their expiry"""
+    count = IdempotencyKey.purge_expired(batch_size)
+    print(f"✅ Purged {count} expired idempotency keys!")
+
+@app.cli.command()
+@click.option('--description', help='Shown on the players\' transactions')
+@click.option('--pi', 'pi_amount', default='0', show_default=True, help='Pi granted per player')
+@click.option('--xp', 'experience', default=0, show_default=True, help='Experience granted per player')
+@click.option('--quest-id', help='Players who have this quest in --quest-status')
+@click.option('--quest-title', help='Same as --quest-id, by quest title')
+@click.option('--quest-status', default='completed', show_default=True)
+@click.option('--completed-after', help='ISO timestamp; quest completed at or after')
+@click.option('--completed-before', help='ISO timestamp; quest completed before')
+@click.option('--min-level', type=int)
+@click.option('--max-level', type=int)
+@click.option('--all-players', is_flag=True, help='Grant to every player when no other filter is given')
+@click.option('--chunk-size', default=1000, show_default=True, help='Players granted per committed chunk')
+@click.option('--resume', 'grant_id', help='Continue an interrupted grant by id')
+def grant_rewards(description, pi_amount, experience, quest_id, quest_title, quest_status,
+                  completed_after, completed_before, min_level, max_level, all_players,
+                  chunk_size, grant_id):
+    """Grant Pi and experience to every player matching a selector"""
+    from app.utils.errors import ValidationError
+    from app.utils.validation import validate_reward_grant
+    
+    if grant_id:
+        reward_grant = db.session.get(RewardGrant, grant_id)
+        if not reward_grant:
+            raise click.ClickException(f"Reward grant {grant_id} not found")
+    else:
+        selector = {
+            'quest_id': quest_id,
+            'quest_title': quest_title,
+            'quest_status': quest_status,
+            'completed_after': completed_after,
+            'completed_before': completed_before,
+            'min_level': min_level,
+            'max_level': max_level,
+            'all_players': all_players
+        }
+        try:
+            grant = validate_reward_grant({
+                'description': description,
+                'pi_amount': pi_amount,
+                'experience': experience,
+                'selector': {key: value for key, value in selector.items() if value is not None}
+            })
+            reward_grant = RewardGrant.create(grant)
+        except ValidationError as e:
+            raise click.ClickException(str(e))
+        print(f"Created reward grant {reward_grant.id}")
+    
+    reward_grant.run(
+        chunk_size,
+        on_chunk=lambda g: print(f"  {g.granted_count} players granted (last {g.last_user_id})")
+    )
+    print(f"✅ Reward grant {reward_grant.id} completed for {reward_grant.granted_count} players!")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
@@ -0,0 +1,48 @@
+"""
+Shared fixtures for the API tests
+"""
+
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps on their own SQLite file database, with config overrides"""
+    apps = []
+
+    def factory(**overrides):
+        settings = {
+            # A file database, so threads get their own connections
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / f'test{len(apps)}.db'}",
+            'JWT_SECRET_KEY': 'test-secret-key-that-is-long-enough-for-hs256',
+            'METRICS_ENABLED': False,
+            'RATE_LIMIT_ENABLED': False,
+            'ACTIVITY_TRACKING_ENABLED': False,
+        }
+        settings.update(overrides)
+        app = create_app(type('Config', (TestingConfig,), settings))
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield factory
+
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,71 @@
+"""
+Data and request helpers shared by the tests
+"""
+
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models import Quest, QuestProgress, User, UserQuest
+from benchmarks.endpoints import StatementCounter
+
+_ids = itertools.count(1)
+
+
+def create_user(app, **fields):
+    """Insert a user and return its id"""
+    n = next(_ids)
+    fields.setdefault('pi_user_id', f'pi-user-{n}')
+    fields.setdefault('username', f'player_{n}')
+    with app.app_context():
+        user = User(**fields)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def create_quests(app, count, **fields):
+    """Insert quests and return their ids"""
+    with app.app_context():
+        quests = [Quest(title=f'Quest {next(_ids)}', description='Test quest', **fields) for _ in range(count)]
+        db.session.add_all(quests)
+        db.session.commit()
+        return [quest.id for quest in quests]
+
+
+def accept_quests(app, user_id, quest_ids, status='accepted'):
+    """Give a user accepted quests with progress rows"""
+    with app.app_context():
+        for quest_id in quest_ids:
+            db.session.add(UserQuest(user_id=user_id, quest_id=quest_id, status=status))
+            db.session.add(QuestProgress(user_id=user_id, quest_id=quest_id))
+        db.session.commit()
+
+
+def auth_headers(app, user_id):
+    """Authorization header with an access token for a user"""
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+
+def count_statements(app, send):
+    """Send a request; returns the statements it issued and the response"""
+    with app.app_context():
+        counter = StatementCounter(db.engine)
+    response = send()
+    return counter.count, response
+
+
+def run_concurrently(count, task):
+    """Run ``task(n)`` for n in range(count) on ``count`` threads released together"""
+    start = threading.Barrier(count)
+
+    def released(n):
+        start.wait()
+        return task(n)
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(released, range(count)))
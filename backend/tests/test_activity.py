@@ -0,0 +1,28 @@
+"""
+Activity tracking tests
+"""
+
+from app.utils.activity import flush_activity
+from tests.helpers import auth_headers, create_user
+
+
+def test_flushed_activity_changes_the_profile_etag(make_app):
+    app = make_app(ACTIVITY_TRACKING_ENABLED=True, ACTIVITY_FLUSH_INTERVAL=3600)
+    user_id = create_user(app)
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+
+    response = client.get('/api/users/profile', headers=headers)
+    etag = response.headers['ETag']
+    last_active = response.get_json()['user']['last_active']
+
+    # The request's touch is only buffered, so the stored profile is unchanged
+    assert client.get('/api/users/profile', headers={**headers, 'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        assert flush_activity() == 1
+
+    response = client.get('/api/users/profile', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['user']['last_active'] > last_active
@@ -0,0 +1,81 @@
+"""
+Catalog cache and ETag consistency tests
+"""
+
+from app.extensions import db
+from app.models import Item, Quest
+from app.utils.catalog_cache import VERSION_KEY
+from app.utils.quest_catalog import VERSION_KEY as QUEST_VERSION_KEY
+from app.utils.redis_store import get_redis
+from tests.helpers import auth_headers, create_quests, create_user
+
+
+def rename_on_another_worker(app, model, version_key, name_column, old, new):
+    """Change a row and bump the shared version without touching this worker's cache"""
+    with app.app_context():
+        table = model.__table__
+        db.session.execute(table.update().where(table.c[name_column] == old).values({name_column: new}))
+        db.session.commit()
+        get_redis().incr(version_key)
+
+
+def test_item_catalog_tag_and_body_change_together(make_app):
+    app = make_app()
+    cache = app.extensions['catalog_cache']
+    cache.version_check_interval = 3600
+    with app.app_context():
+        db.session.add(Item(name='Sword', description='Sharp', item_type='weapon', rarity='Epic'))
+        db.session.commit()
+    client = app.test_client()
+
+    def featured(etag=None):
+        response = client.get('/api/marketplace/featured', headers={'If-None-Match': etag} if etag else {})
+        body = response.get_json()
+        names = [item['name'] for item in body['featured']['legendary_items']] if body else None
+        return response.status_code, response.headers.get('ETag', '').strip('"'), names
+
+    status, etag, names = featured()
+    assert (status, names) == (200, ['Sword'])
+
+    rename_on_another_worker(app, Item, VERSION_KEY, 'name', 'Sword', 'Excalibur')
+
+    # This worker still serves its old snapshot, under the old snapshot's tag
+    assert featured() == (200, etag, ['Sword'])
+    assert featured(etag)[0] == 304
+
+    # Once the version is rechecked the new body comes with a new tag
+    cache.version_check_interval = 0
+    status, new_etag, names = featured(etag)
+    assert (status, names) == (200, ['Excalibur'])
+    assert new_etag != etag
+    assert featured(new_etag)[0] == 304
+
+
+def test_quest_catalog_tag_and_body_change_together(make_app):
+    app = make_app()
+    cache = app.extensions['quest_catalog']
+    cache.version_check_interval = 3600
+    user_id = create_user(app)
+    create_quests(app, 1)
+    with app.app_context():
+        title = Quest.query.one().title
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+
+    def available():
+        response = client.get('/api/quests/', headers=headers)
+        assert response.status_code == 200
+        return response.headers['ETag'], [quest['title'] for quest in response.get_json()['quests']]
+
+    etag, titles = available()
+    assert titles == [title]
+
+    rename_on_another_worker(app, Quest, QUEST_VERSION_KEY, 'title', title, 'Renamed')
+
+    # Every tag stays tied to one body, before and after the version recheck
+    seen = {etag: titles}
+    for interval in (3600, 0):
+        cache.version_check_interval = interval
+        etag, titles = available()
+        assert seen.setdefault(etag, titles) == titles
+    assert titles == ['Renamed']
@@ -0,0 +1,132 @@
+"""
+Cross-worker event delivery tests
+"""
+
+import fnmatch
+import itertools
+import queue
+import threading
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import User
+from app.utils.events import RedisBroker
+from tests.helpers import auth_headers, create_user
+
+
+class SharedPubSub:
+    """Redis pub/sub double shared by the brokers of several "workers"
+
+    Implements the part of the redis-py client ``RedisBroker`` uses:
+    ``publish`` and pattern subscriptions run with ``run_in_thread``.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        receivers = 0
+        for pubsub in subscribers:
+            receivers += pubsub.receive(channel, message)
+        return receivers
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return PubSub(self)
+
+    def attach(self, pubsub):
+        with self._lock:
+            self._subscribers.append(pubsub)
+
+    def detach(self, pubsub):
+        with self._lock:
+            if pubsub in self._subscribers:
+                self._subscribers.remove(pubsub)
+
+
+class PubSub:
+    def __init__(self, server):
+        self.server = server
+        self.handlers = {}
+        self.messages = queue.Queue()
+
+    def psubscribe(self, **handlers):
+        self.handlers.update(handlers)
+        self.server.attach(self)
+
+    def receive(self, channel, message):
+        patterns = [pattern for pattern in self.handlers if fnmatch.fnmatchcase(channel, pattern)]
+        for pattern in patterns:
+            self.messages.put((pattern, {'type': 'pmessage', 'pattern': pattern, 'channel': channel, 'data': message}))
+        return len(patterns)
+
+    def run_in_thread(self, sleep_time=0, daemon=False, exception_handler=None):
+        thread = ListenerThread(self, sleep_time)
+        thread.daemon = daemon
+        thread.start()
+        return thread
+
+    def close(self):
+        self.server.detach(self)
+
+
+class ListenerThread(threading.Thread):
+    def __init__(self, pubsub, sleep_time):
+        super().__init__()
+        self.pubsub = pubsub
+        self.sleep_time = sleep_time
+        self._running = threading.Event()
+        self._running.set()
+
+    def run(self):
+        while self._running.is_set():
+            try:
+                pattern, message = self.pubsub.messages.get(timeout=self.sleep_time)
+            except queue.Empty:
+                continue
+            self.pubsub.handlers[pattern](message)
+
+    def stop(self):
+        self._running.clear()
+
+
+def test_events_published_on_one_worker_reach_another(app):
+    server = SharedPubSub()
+    publisher, listener = RedisBroker(server), RedisBroker(server)
+    subscription = listener.subscribe('player-1')
+    other = listener.subscribe('player-2')
+
+    publisher.publish('player-1', 'event: balance\ndata: {}\n\n')
+
+    assert subscription.get(timeout=2) == 'event: balance\ndata: {}\n\n'
+    assert other.get(timeout=0.1) is None
+
+
+def test_stream_on_one_worker_receives_commits_from_another(make_app):
+    server = SharedPubSub()
+    writer = make_app()
+    reader = make_app(EVENT_STREAM_HEARTBEAT_SECONDS=0.05)
+    writer.extensions['event_broker'] = RedisBroker(server)
+    broker = reader.extensions['event_broker'] = RedisBroker(server)
+    user_id = create_user(writer)
+
+    response = reader.test_client().get('/api/events/stream', headers=auth_headers(reader, user_id), buffered=False)
+    assert response.status_code == 200
+    frames = response.response
+    assert next(frames).startswith(b'retry:')
+    assert next(frames) == b': keepalive\n\n'
+    assert user_id in broker._subscriptions
+
+    with writer.app_context():
+        db.session.get(User, user_id).add_pi(Decimal('5.00'))
+        db.session.commit()
+
+    # Keepalives every 50ms; give the event a few seconds to cross over
+    frame = next(frame for frame in itertools.islice(frames, 100) if not frame.startswith(b':'))
+    assert frame.startswith(b'event: balance')
+
+    # Disconnecting closes the stream and its subscription
+    response.close()
+    assert user_id not in broker._subscriptions
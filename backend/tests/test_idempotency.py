@@ -0,0 +1,139 @@
+"""
+Idempotency-Key tests
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.extensions import db
+from app.models import IdempotencyKey, Item, Transaction, User
+from app.utils.idempotency import cache_key, request_fingerprint
+from app.utils.redis_store import get_redis
+from tests.helpers import auth_headers, create_user, run_concurrently
+
+
+@pytest.fixture
+def shop(app):
+    """A buyer with 10 PI and a 1 PI item; returns (user_id, purchase url, headers)"""
+    user_id = create_user(app, pi_balance=Decimal('10.00'))
+    with app.app_context():
+        item = Item(name='Potion', description='Heals', item_type='consumable', pi_price=Decimal('1.00'))
+        db.session.add(item)
+        db.session.commit()
+        url = f'/api/marketplace/items/{item.id}/purchase'
+    return user_id, url, auth_headers(app, user_id)
+
+
+def purchases(app, user_id):
+    """(balance, recorded purchases) of a user"""
+    with app.app_context():
+        balance = db.session.get(User, user_id).pi_balance
+        return balance, Transaction.query.filter_by(user_id=user_id, transaction_type='item_purchase').count()
+
+
+def key_row(app, user_id, key):
+    with app.app_context():
+        return IdempotencyKey.find(user_id, key)
+
+
+def age_claim(app, user_id, key, seconds=3600):
+    """Move a claim's lock into the past, as if its worker had died"""
+    with app.app_context():
+        record = IdempotencyKey.query.filter_by(user_id=user_id, key=key).one()
+        record.locked_at = datetime.utcnow() - timedelta(seconds=seconds)
+        db.session.commit()
+
+
+def test_retries_replay_the_first_response(app, client, shop):
+    user_id, url, headers = shop
+    headers = {**headers, 'Idempotency-Key': 'buy-1'}
+
+    first = client.post(url, headers=headers)
+    assert first.status_code == 200
+    assert 'Idempotent-Replayed' not in first.headers
+
+    # From the Redis cache, then from the table once the cache is gone
+    for _ in range(2):
+        replay = client.post(url, headers=headers)
+        assert (replay.status_code, replay.data) == (200, first.data)
+        assert replay.headers['Idempotent-Replayed'] == 'true'
+        with app.app_context():
+            get_redis().delete(cache_key(user_id, 'buy-1'))
+
+    assert purchases(app, user_id) == (Decimal('9.00'), 1)
+    assert key_row(app, user_id, 'buy-1').status == 'completed'
+
+
+def test_reusing_a_key_for_another_request_is_rejected(app, client, shop):
+    user_id, url, headers = shop
+    headers = {**headers, 'Idempotency-Key': 'deposit-1'}
+
+    assert client.post('/api/transactions/pi-deposit', json={'amount': 5, 'pi_payment_id': 'pay-1'},
+                       headers=headers).status_code == 200
+    for send in (lambda: client.post('/api/transactions/pi-deposit', json={'amount': 50, 'pi_payment_id': 'pay-2'},
+                                     headers=headers),
+                 lambda: client.post(url, headers=headers)):
+        assert send().status_code == 422
+
+    assert purchases(app, user_id) == (Decimal('15.00'), 0)
+
+
+def test_concurrent_duplicates_apply_once(app, shop):
+    user_id, url, headers = shop
+    headers = {**headers, 'Idempotency-Key': 'buy-once'}
+
+    responses = run_concurrently(8, lambda n: app.test_client().post(url, headers=headers))
+
+    assert {(response.status_code, response.data) for response in responses} == {(200, responses[0].data)}
+    assert sum('Idempotent-Replayed' not in response.headers for response in responses) == 1
+    assert purchases(app, user_id) == (Decimal('9.00'), 1)
+
+
+def test_stale_claim_that_changed_nothing_is_taken_over(app, client, shop):
+    user_id, url, headers = shop
+    with app.test_request_context(url, method='POST'):
+        IdempotencyKey.claim(user_id, 'buy-2', 'marketplace.purchase_item', request_fingerprint(), 86400)
+
+    # A live claim makes duplicates wait, then give up
+    app.config['IDEMPOTENCY_WAIT_SECONDS'] = 0
+    assert client.post(url, headers={**headers, 'Idempotency-Key': 'buy-2'}).status_code == 409
+
+    age_claim(app, user_id, 'buy-2')
+    assert client.post(url, headers={**headers, 'Idempotency-Key': 'buy-2'}).status_code == 200
+    assert purchases(app, user_id) == (Decimal('9.00'), 1)
+    assert key_row(app, user_id, 'buy-2').status == 'completed'
+
+
+def test_claim_whose_writes_committed_is_never_run_again(app, client, shop, monkeypatch):
+    user_id, url, headers = shop
+    headers = {**headers, 'Idempotency-Key': 'buy-3'}
+
+    # The worker dies between the view's commit and storing its response
+    def crash(*args, **kwargs):
+        raise RuntimeError('worker died')
+    monkeypatch.setattr(IdempotencyKey, 'complete', classmethod(crash))
+    with pytest.raises(RuntimeError):
+        client.post(url, headers=headers)
+    monkeypatch.undo()
+
+    assert key_row(app, user_id, 'buy-3').status == 'applied'
+    assert purchases(app, user_id) == (Decimal('9.00'), 1)
+
+    age_claim(app, user_id, 'buy-3')
+    response = client.post(url, headers=headers)
+    assert response.status_code == 409
+    assert purchases(app, user_id) == (Decimal('9.00'), 1)
+
+
+def test_client_errors_are_replayed(app, client, shop):
+    user_id, url, headers = shop
+    with app.app_context():
+        db.session.get(User, user_id).pi_balance = Decimal('0.50')
+        db.session.commit()
+    headers = {**headers, 'Idempotency-Key': 'buy-4'}
+
+    assert client.post(url, headers=headers).status_code == 400
+    assert client.post(url, headers=headers).headers['Idempotent-Replayed'] == 'true'
+    assert purchases(app, user_id) == (Decimal('0.50'), 0)
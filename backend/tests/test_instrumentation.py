@@ -0,0 +1,29 @@
+"""
+SQL instrumentation tests
+"""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.extensions import db
+
+
+def test_failed_statement_does_not_leave_a_start_time_behind(app):
+    with app.app_context():
+        connection = db.session.connection()
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM missing_table'))
+        assert not connection.info.get('query_started')
+
+        db.session.rollback()
+        connection = db.session.connection()
+        connection.execute(text('SELECT 1'))
+        assert not connection.info.get('query_started')
+
+
+def test_requests_report_their_statement_count(app, client):
+    response = client.get('/api/users/leaderboard')
+
+    assert response.status_code == 200
+    assert any(value.startswith('db;') for value in response.headers.getlist('Server-Timing'))
@@ -0,0 +1,50 @@
+"""
+Leaderboard tests
+"""
+
+from app.utils.leaderboard import BACKFILL_LOCK_KEY, BOARDS, PROFILES_KEY, board_key
+from app.utils.redis_store import get_redis
+from tests.helpers import auth_headers, create_user
+
+
+def clear_boards(app):
+    """Drop the Redis boards, as after a deploy onto an empty Redis"""
+    with app.app_context():
+        get_redis().delete(*[board_key(board) for board in BOARDS], PROFILES_KEY)
+
+
+def test_empty_boards_are_backfilled_from_the_users_table(app, client):
+    user_ids = [create_user(app, level=level) for level in (3, 7, 5)]
+    clear_boards(app)
+
+    body = client.get('/api/users/leaderboard').get_json()
+    assert [entry['level'] for entry in body['leaderboard']] == [7, 5, 3]
+    assert body['pagination']['total'] == 3
+
+    with app.app_context():
+        assert get_redis().zcard(board_key('level')) == 3
+        assert get_redis().get(BACKFILL_LOCK_KEY) is None
+
+    clear_boards(app)
+    body = client.get('/api/users/leaderboard/me', headers=auth_headers(app, user_ids[0])).get_json()
+    assert (body['rank'], body['total']) == (3, 3)
+
+
+def test_leaderboard_is_served_from_the_database_during_a_rebuild(app, client):
+    for level in (2, 4):
+        create_user(app, level=level)
+    clear_boards(app)
+    with app.app_context():
+        get_redis().set(BACKFILL_LOCK_KEY, '1')
+
+    body = client.get('/api/users/leaderboard').get_json()
+    assert [entry['level'] for entry in body['leaderboard']] == [4, 2]
+    assert body['pagination']['total'] == 2
+
+    with app.app_context():
+        assert get_redis().zcard(board_key('level')) == 0
+
+
+def test_no_users_is_an_empty_leaderboard(client):
+    body = client.get('/api/users/leaderboard').get_json()
+    assert (body['leaderboard'], body['pagination']['total']) == ([], 0)
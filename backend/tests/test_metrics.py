@@ -0,0 +1,38 @@
+"""
+Prometheus metrics endpoint tests
+"""
+
+from tests.helpers import auth_headers, create_user
+
+
+def test_metrics_scrape_needs_the_metrics_token(make_app):
+    app = make_app(METRICS_ENABLED=True, METRICS_TOKEN='scrape-secret')
+    admin_id = create_user(app)
+    app.config['ADMIN_USER_IDS'] = frozenset([admin_id])
+    client = app.test_client()
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong-secret'}).status_code == 401
+    # A user token, even an admin's, is not a scrape credential
+    assert client.get('/metrics', headers=auth_headers(app, admin_id)).status_code == 401
+
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert b'palace_http_request_duration_seconds' in response.data
+
+
+def test_metrics_are_refused_without_a_configured_token(make_app):
+    client = make_app(METRICS_ENABLED=True).test_client()
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code == 401
+
+
+def test_missing_multiprocess_directory_is_created(make_app, tmp_path, monkeypatch):
+    metrics_dir = tmp_path / 'prometheus'
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(metrics_dir))
+
+    app = make_app(METRICS_ENABLED=True)
+
+    assert metrics_dir.is_dir()
+    assert app.test_client().get('/health').status_code == 200
@@ -0,0 +1,148 @@
+"""
+Pi Network client tests against a local stub of the Pi API
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.utils.pi_client import get_pi_client
+
+
+class StubPiAPI(ThreadingHTTPServer):
+    """Answers ``/v2/me`` for ``good-*`` tokens and rejects every other one"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubPiHandler)
+        self.calls = 0
+        self.connections = set()
+        self.delay = 0.0
+        # Seconds between the two halves of the body, to simulate a slow upstream
+        self.body_gap = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StubPiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.calls += 1
+            server.connections.add(self.client_address)
+        time.sleep(server.delay)
+
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not token.startswith('good-'):
+            self._send(401, b'{"error": "invalid token"}')
+            return
+        self._send(200, json.dumps({'uid': token, 'username': token}).encode(), server.body_gap)
+
+    def _send(self, status, body, gap=0.0):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        half = len(body) // 2
+        self.wfile.write(body[:half])
+        self.wfile.flush()
+        time.sleep(gap)
+        self.wfile.write(body[half:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api():
+    server = StubPiAPI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pi_app(make_app, stub_api):
+    return make_app(PI_API_URL=stub_api.url, PI_VERIFY_TIMEOUT=2)
+
+
+def verify(app, token):
+    with app.app_context():
+        return get_pi_client().verify(token)
+
+
+def test_accepted_and_rejected_tokens_are_cached(pi_app, stub_api):
+    assert verify(pi_app, 'good-alice') == {'uid': 'good-alice', 'username': 'good-alice'}
+    assert verify(pi_app, 'good-alice') == {'uid': 'good-alice', 'username': 'good-alice'}
+    assert verify(pi_app, 'forged') is None
+    assert verify(pi_app, 'forged') is None
+
+    assert stub_api.calls == 2
+    with pi_app.app_context():
+        stats = get_pi_client().stats()
+    assert (stats['hits'], stats['negative_hits'], stats['misses']) == (1, 1, 2)
+
+
+def test_concurrent_verifications_make_one_upstream_call(pi_app, stub_api):
+    stub_api.delay = 0.3
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        users = list(pool.map(lambda _: verify(pi_app, 'good-bob'), range(10)))
+
+    assert stub_api.calls == 1
+    assert users == [{'uid': 'good-bob', 'username': 'good-bob'}] * 10
+
+
+def test_followers_wait_for_a_slow_leader(make_app, stub_api):
+    # No single read exceeds the timeout, but the whole call does
+    app = make_app(PI_API_URL=stub_api.url, PI_VERIFY_TIMEOUT=0.5)
+    stub_api.delay = 0.3
+    stub_api.body_gap = 0.4
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(verify, app, 'good-carol')
+        time.sleep(0.1)
+        follower = pool.submit(verify, app, 'good-carol')
+        results = [leader.result(), follower.result()]
+
+    assert stub_api.calls == 1
+    assert results == [{'uid': 'good-carol', 'username': 'good-carol'}] * 2
+
+
+def test_followers_see_the_leaders_exception(pi_app, stub_api, monkeypatch):
+    client = pi_app.extensions['pi_client']
+    started = threading.Event()
+
+    def failing_fetch(access_token):
+        started.set()
+        time.sleep(0.2)
+        raise ValueError('malformed response')
+
+    monkeypatch.setattr(client, '_fetch', failing_fetch)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(verify, pi_app, 'good-dave')
+        started.wait()
+        follower = pool.submit(verify, pi_app, 'good-dave')
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_sequential_verifications_reuse_one_connection(pi_app, stub_api):
+    for n in range(5):
+        assert verify(pi_app, f'good-user-{n}') is not None
+
+    assert stub_api.calls == 5
+    assert len(stub_api.connections) == 1
@@ -0,0 +1,30 @@
+"""
+Index usage tests for the hot queries
+"""
+
+import pytest
+
+from benchmarks.query_plans import explain, hot_queries
+
+EXPECTED_INDEXES = {
+    'transaction_history': 'ix_transactions_user_created_at',
+    'transaction_history_filtered_count': 'ix_transactions_user_type_status',
+    'pending_transactions': 'ix_transactions_pending_created_at',
+    'user_quests_by_status': 'ix_user_quests_user_status',
+    'items_by_rarity': 'ix_items_available_rarity_created_at',
+    'items_by_level': 'ix_items_available_level',
+}
+
+
+def test_every_hot_query_is_covered(app):
+    with app.app_context():
+        assert {name: index for name, _, index in hot_queries()} == EXPECTED_INDEXES
+
+
+@pytest.mark.parametrize('name, index', sorted(EXPECTED_INDEXES.items()))
+def test_hot_query_uses_its_index(app, name, index):
+    with app.app_context():
+        statement = next(statement for query, statement, _ in hot_queries() if query == name)
+        plan = explain(statement)
+
+    assert any(index in line for line in plan), plan
@@ -0,0 +1,190 @@
+"""
+Quest endpoint tests
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models import QuestProgress, User, UserQuest
+from app.utils.events import get_event_broker
+from app.utils.progress_buffer import buffer_key
+from app.utils.redis_store import get_redis
+from tests.helpers import accept_quests, auth_headers, count_statements, create_quests, create_user
+
+
+def available_quests_statements(app, catalog_size):
+    user_id = create_user(app)
+    create_quests(app, catalog_size)
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+
+    cold, response = count_statements(app, lambda: client.get('/api/quests/', headers=headers))
+    assert response.status_code == 200
+    assert len(response.get_json()['quests']) == catalog_size
+
+    warm, response = count_statements(app, lambda: client.get('/api/quests/', headers=headers))
+    assert response.status_code == 200
+    return cold, warm
+
+
+def test_available_quests_statement_count_is_independent_of_catalog_size(make_app):
+    small = available_quests_statements(make_app(), 10)
+    large = available_quests_statements(make_app(), 300)
+
+    assert small == large
+    # Once the catalog and claims are cached only the user's quests are read
+    assert large[1] == 1
+
+
+def my_quests_statements(app, quest_count, query_string):
+    user_id = create_user(app)
+    quest_ids = create_quests(app, quest_count)
+    accept_quests(app, user_id, quest_ids[::2])
+    accept_quests(app, user_id, quest_ids[1::2], status='in_progress')
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+
+    # Warm the claims cache so only the endpoint's own statements are counted
+    assert client.get('/api/quests/my-quests', headers=headers).status_code == 200
+
+    statements, response = count_statements(
+        app, lambda: client.get('/api/quests/my-quests', query_string=query_string, headers=headers)
+    )
+    assert response.status_code == 200
+    return statements, len(response.get_json()['quests'])
+
+
+def test_my_quests_is_one_statement_regardless_of_quest_count(make_app):
+    for query_string in ({}, {'status': 'in_progress'}):
+        small, small_listed = my_quests_statements(make_app(), 4, query_string)
+        large, large_listed = my_quests_statements(make_app(), 200, query_string)
+
+        assert small == large == 1
+        assert (small_listed, large_listed) == ((4, 200) if not query_string else (2, 100))
+
+
+def test_rejected_accept_keeps_buffered_progress(make_app):
+    app = make_app(QUEST_PROGRESS_WRITE_BEHIND=True, QUEST_PROGRESS_FLUSH_INTERVAL=3600)
+    user_id = create_user(app)
+    quest_id, = create_quests(app, 1, max_progress=10)
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+
+    assert client.post(f'/api/quests/{quest_id}/accept', headers=headers).status_code == 200
+    for _ in range(3):
+        assert client.post(f'/api/quests/{quest_id}/progress', json={'progress': 1}, headers=headers).status_code == 200
+
+    response = client.post(f'/api/quests/{quest_id}/accept', headers=headers)
+    assert response.get_json() == {'error': 'Quest already accepted'}
+
+    # The increments are still buffered, not flushed and dropped
+    with app.app_context():
+        assert get_redis().hget(buffer_key(user_id), f'{quest_id}:pending') == '3'
+        assert QuestProgress.query.filter_by(user_id=user_id, quest_id=quest_id).one().current_progress == 0
+
+    response = client.post(f'/api/quests/{quest_id}/progress', json={'progress': 1}, headers=headers)
+    assert response.get_json()['quest_progress']['current_progress'] == 4
+
+
+def test_failed_accept_keeps_buffered_progress(make_app):
+    app = make_app(QUEST_PROGRESS_WRITE_BEHIND=True, QUEST_PROGRESS_FLUSH_INTERVAL=3600)
+    user_id = create_user(app)
+    quest_id, = create_quests(app, 1, max_progress=10, is_repeatable=True)
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+
+    assert client.post(f'/api/quests/{quest_id}/accept', headers=headers).status_code == 200
+    for _ in range(3):
+        assert client.post(f'/api/quests/{quest_id}/progress', json={'progress': 1}, headers=headers).status_code == 200
+    with app.app_context():
+        user_quest = UserQuest.query.filter_by(user_id=user_id, quest_id=quest_id).one()
+        user_quest.status = 'completed'
+        user_quest.completed_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+
+    # The old rows are still there, so inserting the new ones fails on commit
+    response = client.post(f'/api/quests/{quest_id}/accept', headers=headers)
+    assert response.status_code == 500
+
+    # The increments were flushed to the old row and their counters kept
+    with app.app_context():
+        assert get_redis().hget(buffer_key(user_id), f'{quest_id}:pending') == '3'
+        assert QuestProgress.query.filter_by(user_id=user_id, quest_id=quest_id).one().current_progress == 3
+
+    response = client.post(f'/api/quests/{quest_id}/progress', json={'progress': 1}, headers=headers)
+    assert response.get_json()['quest_progress']['current_progress'] == 4
+
+    # Once the replacement commits the counters are dropped
+    with app.app_context():
+        UserQuest.query.filter_by(user_id=user_id, quest_id=quest_id).delete()
+        QuestProgress.query.filter_by(user_id=user_id, quest_id=quest_id).delete()
+        db.session.commit()
+    assert client.post(f'/api/quests/{quest_id}/accept', headers=headers).status_code == 200
+    with app.app_context():
+        assert get_redis().hgetall(buffer_key(user_id)) == {}
+
+
+def drain_events(subscription):
+    """Rendered events queued on a subscription, parsed as (type, data)"""
+    events = []
+    while (message := subscription.get(timeout=0)) is not None:
+        event_type, data = message.strip().split('\n')
+        events.append((event_type[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def quest_state(app, user_id):
+    """A user's quest rows, balance and experience without ids and timestamps"""
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        return {
+            'user': (float(user.pi_balance), user.experience, user.level),
+            'user_quests': sorted(
+                (row.quest_id, row.status, row.completed_at is not None, row.rewards_claimed)
+                for row in UserQuest.query.filter_by(user_id=user_id)
+            ),
+            'progress': sorted(
+                (row.quest_id, row.current_progress, row.is_completed, row.completed_at is not None,
+                 row.completion_data)
+                for row in QuestProgress.query.filter_by(user_id=user_id)
+            )
+        }
+
+
+def test_batch_progress_matches_single_updates(app, client):
+    finished, partial = create_quests(app, 2, max_progress=3, pi_reward=2.5, experience_reward=150)
+    increments = [(finished, 1), (partial, 1), (finished, 2)]
+    results = {}
+
+    for path in ('single', 'batch'):
+        user_id = create_user(app)
+        headers = auth_headers(app, user_id)
+        for quest_id in (finished, partial):
+            assert client.post(f'/api/quests/{quest_id}/accept', headers=headers).status_code == 200
+
+        with app.app_context():
+            subscription = get_event_broker().subscribe(user_id)
+        if path == 'single':
+            for quest_id, progress in increments:
+                response = client.post(f'/api/quests/{quest_id}/progress', json={'progress': progress},
+                                       headers=headers)
+                assert response.status_code == 200
+        else:
+            updates = [{'quest_id': quest_id, 'progress': progress} for quest_id, progress in increments]
+            response = client.post('/api/quests/progress/batch', json={'updates': updates}, headers=headers)
+            assert response.get_json()['completed_quests'] == [finished]
+        events = drain_events(subscription)
+        subscription.close()
+
+        assert client.post(f'/api/quests/{finished}/claim', headers=headers).status_code == 200
+        assert client.post(f'/api/quests/{partial}/claim', headers=headers).status_code == 400
+
+        # The single path publishes every step; compare each quest's final event
+        last_events = {data['quest_id']: data for event_type, data in events if event_type == 'quest_progress'}
+        results[path] = quest_state(app, user_id), last_events
+
+    assert results['single'] == results['batch']
+    state, last_events = results['batch']
+    assert state['user'][0] == 2.5
+    assert last_events[finished]['quest_completed'] is True
@@ -0,0 +1,128 @@
+"""
+Rate limiting tests
+
+The Lua token-bucket script needs a real server: set ``REDIS_TEST_URL`` to
+run it. Everything else runs against the in-process buckets.
+"""
+
+import os
+import uuid
+
+import pytest
+
+from app.utils import rate_limit
+from app.utils.rate_limit import LocalTokenBuckets, RateLimiter
+from tests.helpers import auth_headers, count_statements, create_user
+
+
+class Clock:
+    """Stands in for ``time`` in the rate limit module"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+
+def test_local_buckets_allow_a_burst_then_refill_at_the_rate(clock):
+    buckets = LocalTokenBuckets()
+
+    assert [buckets.take('k', 3, 0.5)[0] for _ in range(3)] == [True] * 3
+    assert buckets.take('k', 3, 0.5) == (False, 2.0)
+
+    clock.now += 1.0
+    assert buckets.take('k', 3, 0.5) == (False, 1.0)
+    clock.now += 1.0
+    assert buckets.take('k', 3, 0.5) == (True, 0.0)
+
+    # A long idle period refills to capacity, never beyond it
+    clock.now += 3600
+    assert [buckets.take('k', 3, 0.5)[0] for _ in range(4)] == [True, True, True, False]
+
+    # Buckets are independent per key
+    assert buckets.take('other', 3, 0.5) == (True, 0.0)
+
+
+def test_full_buckets_are_pruned(clock):
+    buckets = LocalTokenBuckets(max_entries=2)
+    buckets.take('a', 2, 1.0)
+    buckets.take('b', 2, 1.0)
+    clock.now += 10
+    buckets.take('c', 2, 1.0)
+
+    assert set(buckets._buckets) == {'c'}
+
+
+def test_limited_requests_get_429_before_any_sql(make_app):
+    app = make_app(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'marketplace': {'capacity': 2, 'refill_rate': 0.5}})
+    user_id = create_user(app)
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+    purchase = lambda: client.post('/api/marketplace/items/missing/purchase', headers=headers)
+
+    assert [purchase().status_code for _ in range(2)] == [404, 404]
+
+    statements, response = count_statements(app, purchase)
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '2'
+    assert response.get_json() == {'error': 'Rate limit exceeded', 'retry_after': 2}
+    assert statements == 0
+
+    # Reads and other users are not limited
+    assert client.get('/api/marketplace/categories').status_code == 200
+    other = auth_headers(app, create_user(app))
+    assert client.post('/api/marketplace/items/missing/purchase', headers=other).status_code == 404
+
+
+class ScriptClient:
+    """Client whose registered script returns canned replies or fails"""
+
+    def __init__(self, reply=None, error=None):
+        self.reply = reply
+        self.error = error
+        self.calls = []
+
+    def register_script(self, source):
+        assert source == rate_limit.TOKEN_BUCKET_SCRIPT
+
+        def script(keys, args):
+            self.calls.append((keys, args))
+            if self.error is not None:
+                raise self.error
+            return self.reply
+        return script
+
+
+def test_limiter_uses_the_script_and_falls_back_to_local_buckets():
+    client = ScriptClient(reply=[0, '1.5'])
+    assert RateLimiter(client).take('k', 10, 0.5) == (False, 1.5)
+    assert client.calls == [(['k'], [10, 0.5])]
+
+    client = ScriptClient(error=ConnectionError('redis is down'))
+    limiter = RateLimiter(client)
+    assert [limiter.take('k', 2, 0.5)[0] for _ in range(3)] == [True, True, False]
+    assert len(client.calls) == 3
+
+
+@pytest.mark.skipif(not os.environ.get('REDIS_TEST_URL'), reason='REDIS_TEST_URL is not set')
+def test_token_bucket_script_on_redis():
+    import redis
+
+    client = redis.Redis.from_url(os.environ['REDIS_TEST_URL'], decode_responses=True)
+    key = f'ratelimit:test:{uuid.uuid4()}'
+    limiter = RateLimiter(client)
+    try:
+        assert [limiter.take(key, 3, 0.5)[0] for _ in range(3)] == [True] * 3
+        allowed, wait = limiter.take(key, 3, 0.5)
+        assert not allowed and 1.9 < wait <= 2.0
+        assert 0 < client.ttl(key) <= 7
+    finally:
+        client.delete(key)
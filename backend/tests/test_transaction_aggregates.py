@@ -0,0 +1,91 @@
+"""
+Transaction aggregate tests
+"""
+
+import importlib
+from decimal import Decimal
+
+import pytest
+
+from app.config import Config
+from app.extensions import db
+from app.models import Item, RewardGrant, Transaction, TransactionAggregate
+from app.utils.validation import validate_reward_grant
+from tests.helpers import auth_headers, create_user
+
+
+def run_mixed_workload(app, client):
+    """Deposits, purchases, status changes, deletes and a Core-inserted reward grant"""
+    buyer = create_user(app, pi_balance=Decimal('20.00'))
+    other = create_user(app)
+    with app.app_context():
+        item = Item(name='Potion', description='Heals', item_type='consumable', pi_price=Decimal('3.50'))
+        db.session.add(item)
+        db.session.commit()
+        item_id = item.id
+
+    for user_id, payment_ids in ((buyer, ('pay-1', 'pay-2')), (other, ('pay-3',))):
+        headers = auth_headers(app, user_id)
+        for payment_id in payment_ids:
+            response = client.post('/api/transactions/pi-deposit', json={'amount': 4.25, 'pi_payment_id': payment_id},
+                                   headers=headers)
+            assert response.status_code == 200
+    headers = auth_headers(app, buyer)
+    for _ in range(2):
+        assert client.post(f'/api/marketplace/items/{item_id}/purchase', headers=headers).status_code == 200
+
+    with app.app_context():
+        pending = [Transaction(user_id=other, transaction_type='pi_deposit', amount=Decimal(amount))
+                   for amount in ('1.10', '2.20', '3.30')]
+        db.session.add_all(pending)
+        db.session.commit()
+        pending[0].mark_failed('declined')
+        pending[1].mark_completed()
+        pending[1].amount = Decimal('2.75')
+        db.session.delete(pending[2])
+        db.session.commit()
+
+        grant = RewardGrant.create(validate_reward_grant({
+            'description': 'Launch bonus',
+            'selector': {'user_ids': [buyer, other]},
+            'pi_amount': '1.50',
+            'experience': 25
+        }))
+        grant.run(chunk_size=1)
+
+
+def test_incremental_aggregates_match_the_ledger(app, client):
+    run_mixed_workload(app, client)
+
+    with app.app_context():
+        assert TransactionAggregate.verify() == []
+        assert db.session.query(db.func.sum(TransactionAggregate.count)).scalar() == Transaction.query.count() == 9
+
+
+@pytest.fixture
+def cli(app, monkeypatch):
+    """The run.py commands, invoked against the test app"""
+    # Importing run builds its own app from Config; keep it off real services
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setattr(Config, 'REDIS_URL', 'memory://')
+    monkeypatch.setattr(Config, 'METRICS_ENABLED', False)
+    run = importlib.import_module('run')
+    runner = app.test_cli_runner()
+    return lambda command, *args: runner.invoke(getattr(run, command), list(args))
+
+
+def test_verify_exits_nonzero_on_a_corrupted_aggregate(app, client, cli):
+    run_mixed_workload(app, client)
+    assert cli('rebuild_economy_stats', '--verify').exit_code == 0
+
+    with app.app_context():
+        row = TransactionAggregate.query.filter_by(transaction_type='item_purchase').one()
+        row.count += 1
+        db.session.commit()
+
+    result = cli('rebuild_economy_stats', '--verify')
+    assert result.exit_code == 1
+    assert 'item_purchase/completed' in result.output
+
+    assert cli('rebuild_economy_stats').exit_code == 0
+    assert cli('rebuild_economy_stats', '--verify').exit_code == 0
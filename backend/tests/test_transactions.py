@@ -0,0 +1,101 @@
+"""
+Transaction endpoint tests
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import Transaction
+from tests.helpers import auth_headers, create_user
+
+
+def add_transactions(app, user_id, count):
+    with app.app_context():
+        db.session.add_all([
+            Transaction(user_id=user_id, transaction_type='pi_deposit', amount=Decimal('1.00'), status='completed')
+            for _ in range(count)
+        ])
+        db.session.commit()
+
+
+def test_history_without_cursor_keeps_page_total_and_pages(app, client):
+    user_id = create_user(app)
+    add_transactions(app, user_id, 45)
+    headers = auth_headers(app, user_id)
+
+    for query_string in ({}, {'page': 1}):
+        pagination = client.get('/api/transactions/history', query_string=query_string,
+                                headers=headers).get_json()['pagination']
+        assert (pagination['page'], pagination['total'], pagination['pages']) == (1, 45, 3)
+        assert pagination['has_more'] is True
+
+    body = client.get('/api/transactions/history', query_string={'page': 3}, headers=headers).get_json()
+    assert len(body['transactions']) == 5
+    assert (body['pagination']['page'], body['pagination']['total'], body['pagination']['pages']) == (3, 45, 3)
+
+
+def test_history_cursor_pages_count_only_on_request(app, client):
+    user_id = create_user(app)
+    add_transactions(app, user_id, 45)
+    headers = auth_headers(app, user_id)
+    cursor = client.get('/api/transactions/history', headers=headers).get_json()['pagination']['next_cursor']
+
+    pagination = client.get('/api/transactions/history', query_string={'cursor': cursor},
+                            headers=headers).get_json()['pagination']
+    assert 'total' not in pagination and 'page' not in pagination
+
+    pagination = client.get('/api/transactions/history', query_string={'cursor': cursor, 'include_total': 'true'},
+                            headers=headers).get_json()['pagination']
+    assert pagination['total'] == 45
+
+
+def history_pages(client, headers):
+    """Every transaction from the paginated history, following the cursors"""
+    transactions = []
+    query_string = {'per_page': 7}
+    while True:
+        body = client.get('/api/transactions/history', query_string=query_string, headers=headers).get_json()
+        transactions.extend(body['transactions'])
+        if not body['pagination']['has_more']:
+            return transactions
+        query_string['cursor'] = body['pagination']['next_cursor']
+
+
+def csv_value(value):
+    """A serialized transaction field as csv_lines writes it"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return '' if value is None else str(value)
+
+
+def test_export_matches_the_paginated_history(app, client):
+    user_id = create_user(app)
+    other_id = create_user(app)
+    created_at = datetime(2024, 1, 1)
+    with app.app_context():
+        db.session.add_all([
+            Transaction(user_id=user_id, transaction_type=('pi_deposit', 'quest_reward', 'item_purchase')[n % 3],
+                        amount=Decimal('1.25') * n, status='completed' if n % 4 else 'pending',
+                        description=f'Transaction "{n}", with a comma', metadata_={'n': n, 'tags': ['a', 'b']},
+                        # Pairs share a timestamp, so the id tie-break decides their order
+                        created_at=created_at + timedelta(minutes=n // 2))
+            for n in range(30)
+        ] + [Transaction(user_id=other_id, transaction_type='pi_deposit', amount=Decimal('5.00'))])
+        db.session.commit()
+    headers = auth_headers(app, user_id)
+
+    history = history_pages(client, headers)
+    assert len(history) == 30
+
+    response = client.get('/api/transactions/export', query_string={'format': 'ndjson'}, headers=headers)
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == history
+
+    response = client.get('/api/transactions/export', query_string={'format': 'csv'}, headers=headers)
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert rows == [{key: csv_value(value) for key, value in record.items()} for record in history]
@@ -0,0 +1,77 @@
+"""
+Concurrency tests for balance changes against a single wallet
+"""
+
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import Item, Transaction, User
+from tests.helpers import auth_headers, create_user, run_concurrently
+
+
+def balance_of(app, user_id):
+    with app.app_context():
+        return db.session.execute(db.select(User.pi_balance).where(User.id == user_id)).scalar_one()
+
+
+def test_concurrent_purchases_debit_exactly_what_the_balance_covers(app):
+    initial, price = Decimal('10.50'), Decimal('1.00')
+    user_id = create_user(app, pi_balance=initial)
+    with app.app_context():
+        item = Item(name='Potion', description='Heals', item_type='consumable', pi_price=price)
+        db.session.add(item)
+        db.session.commit()
+        item_id = item.id
+    headers = auth_headers(app, user_id)
+
+    statuses = run_concurrently(
+        24, lambda n: app.test_client().post(f'/api/marketplace/items/{item_id}/purchase', headers=headers).status_code
+    )
+
+    purchases = statuses.count(200)
+    assert purchases == int(initial // price)
+    assert statuses.count(400) == len(statuses) - purchases
+
+    final = balance_of(app, user_id)
+    assert final == initial - price * purchases
+    assert final >= 0
+    with app.app_context():
+        recorded = Transaction.query.filter_by(user_id=user_id, transaction_type='item_purchase').count()
+    assert recorded == purchases
+
+
+def test_concurrent_credits_and_debits_lose_no_updates(app):
+    initial, amount = Decimal('100.00'), Decimal('2.50')
+    user_id = create_user(app, pi_balance=initial)
+
+    def change(n):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            if n % 2:
+                user.add_pi(amount)
+                applied = 1
+            else:
+                applied = -1 if user.deduct_pi(amount) else 0
+            db.session.commit()
+            return applied
+
+    outcomes = run_concurrently(32, change)
+
+    assert outcomes.count(0) == 0
+    assert balance_of(app, user_id) == initial + amount * sum(outcomes)
+
+
+def test_debits_never_overdraw_under_contention(app):
+    initial, amount = Decimal('7.00'), Decimal('3.00')
+    user_id = create_user(app, pi_balance=initial)
+
+    def debit(n):
+        with app.app_context():
+            accepted = db.session.get(User, user_id).deduct_pi(amount)
+            db.session.commit()
+            return accepted
+
+    accepted = run_concurrently(16, debit)
+
+    assert accepted.count(True) == int(initial // amount)
+    assert balance_of(app, user_id) == initial - amount * accepted.count(True)